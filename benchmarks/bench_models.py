@@ -0,0 +1,143 @@
+"""Compares the memory of a large product listing kept as model objects.
+
+Three layouts are measured, each in a fresh process:
+    copies     dict-backed objects that each hold a copy of their HTML, the layout before the models used slots
+    handles    dict-backed objects that hold Element handles, which keep the parsed tree of the page alive
+    fragments  the current Product objects, with slots and Fragments of the shared page source
+
+python_bytes_per_product is the Python heap kept per product, measured with tracemalloc. The parsed tree that
+the handles keep alive is allocated outside the Python heap, so tree_mb reports how much parsing the page grows
+the resident memory. retained_mb is the sum of what each layout keeps: the products, plus the parsed tree for
+handles and the page source for fragments.
+
+Run from the repository root:
+    python benchmarks/bench_models.py --products 100000
+"""
+import argparse
+import gc
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import Document, ElementSelector  # noqa: E402
+from scrape_models import WebStore  # noqa: E402
+
+VARIANTS = ('copies', 'handles', 'fragments')
+
+
+class LegacyProduct:
+    """A product laid out like the models before they used slots: every attribute in the instance dict."""
+
+    def __init__(self, name, url, scraper, html_content, detail_url):
+        self.name = name
+        self.url = url
+        self.html_content = html_content
+        self.scraper = scraper
+        self.content = ""
+        self.detail_url = detail_url
+        self.detail_fields = None
+
+
+class StaticScraper:
+    def __init__(self, html):
+        self.html = html
+
+    def scrape(self, url, data_type):
+        return self.html
+
+
+def make_listing(products):
+    items = ''.join(f'<div class="product-item" data-id="{number}" data-category="{number % 40}">'
+                    f'<a href="/product/{number}"><img src="/images/{number}.jpg" alt="Product {number}" '
+                    f'width="240" height="240"></a><h2 class="title">Product {number}</h2>'
+                    f'<span class="price">{number % 1000}.99</span>'
+                    f'<p class="summary">A short description of product {number}, as shown in the listing.</p>'
+                    f'<ul class="features"><li>Colour {number % 7}</li><li>Size {number % 5}</li>'
+                    f'<li>In stock</li></ul><button class="add-to-cart">Add to cart</button></div>\n'
+                    for number in range(products))
+    return f'<html><body><div id="listing">\n{items}</div></body></html>'
+
+
+def resident_mb():
+    """Returns the resident memory of the process in MB."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return float('nan')
+
+
+def build(variant, html):
+    url = 'https://shop.example.com/'
+    if variant == 'fragments':
+        store = WebStore(name='Shop', url=url, scraper=StaticScraper(html))
+        store.scrape_products('.product-item')
+        return store.products
+    document = Document(html, url=url)
+    elements = ElementSelector.extract_elements(document, '.product-item')
+    products = []
+    for element in elements:
+        links = element.links()
+        html_content = element.html if variant == 'copies' else element
+        products.append(LegacyProduct('Product', url, None, html_content, links[0] if links else None))
+    return products
+
+
+def measure(variant, products):
+    html = make_listing(products)
+    before = resident_mb()
+    document = Document(html)
+    tree_mb = resident_mb() - before
+    del document
+    gc.collect()
+
+    start = time.perf_counter()
+    items = build(variant, html)
+    seconds = time.perf_counter() - start
+    del items
+    gc.collect()
+
+    tracemalloc.start()
+    items = build(variant, html)
+    gc.collect()
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Reading a field from every product materializes it on demand
+    start = time.perf_counter()
+    for item in items:
+        str(item.html_content)
+    read_seconds = time.perf_counter() - start
+    retained_mb = python_bytes / 2 ** 20
+    if variant == 'handles':
+        retained_mb += tree_mb
+    elif variant == 'fragments':
+        retained_mb += len(html) / 2 ** 20
+    return {'variant': variant, 'products': len(items), 'page_mb': len(html) / 2 ** 20, 'build_seconds': seconds,
+            'read_seconds': read_seconds, 'python_bytes_per_product': python_bytes / len(items),
+            'tree_mb': tree_mb, 'retained_mb': retained_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--variant', choices=VARIANTS, help='Measure one layout in this process')
+    args = parser.parse_args()
+
+    if args.variant:
+        result = measure(args.variant, args.products)
+        print(' '.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                       for key, value in result.items()))
+        return
+
+    for variant in VARIANTS:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--products', str(args.products),
+                        '--variant', variant], check=True)
+
+
+if __name__ == '__main__':
+    main()
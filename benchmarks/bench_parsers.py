@@ -0,0 +1,52 @@
+"""Measures HTML parse and select throughput in MB/s for each installed parser backend.
+
+Run from the repository root:
+    python benchmarks/bench_parsers.py --products 2000 --rounds 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import Document  # noqa: E402
+from scrape_parsers import BACKENDS  # noqa: E402
+
+
+def make_page(products):
+    items = ''.join(
+        f'<div class="product" data-id="{i}"><h2>Product {i}</h2><p class="price">{i}.99</p>'
+        f'<div class="product-description">Description of product {i} with <b>bold</b> text.</div>'
+        f'<a href="/product/{i}">Details</a></div>'
+        for i in range(products))
+    return f'<html><head><title>Shop</title></head><body><div id="listing">{items}</div></body></html>'
+
+
+def bench(backend, html, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        document = Document(html, url='https://example.com', backend=backend)
+        for product in document.select('#listing .product'):
+            product.select_one('h2').text
+            product.attr('data-id')
+        document.select('//div[@class="product-description"]')
+        document.links()
+    seconds = time.perf_counter() - start
+    return len(html.encode('utf-8')) * rounds / seconds / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    html = make_page(args.products)
+    print(f"page size: {len(html) / 2 ** 20:.2f} MB")
+    for name in sorted(BACKENDS):
+        print(f"  {name:12} {bench(name, html, args.rounds):8.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
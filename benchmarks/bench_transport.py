@@ -0,0 +1,50 @@
+"""Compares pages/sec of a new requests.Session per call against a shared HttpTransport.
+
+Run from the repository root:
+    python benchmarks/bench_transport.py --requests 2000 --threads 8
+"""
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import HttpTransport, Scraper  # noqa: E402
+from synthetic_site import SyntheticSite  # noqa: E402
+
+
+def session_per_call(url):
+    with requests.Session() as session:
+        return session.get(url, timeout=30).content
+
+
+def run(fetch, url, total, threads):
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(lambda _: fetch(url), range(total)):
+            pass
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with SyntheticSite(pages=1, page_size=1024) as site:
+        baseline = run(session_per_call, site.url, args.requests, args.threads)
+        with HttpTransport(pool_maxsize=args.threads) as transport:
+            scraper = Scraper(transport)
+            pooled = run(lambda u: scraper.scrape(u, 'html'), site.url, args.requests, args.threads)
+
+    print(f"session per call: {baseline:10.1f} pages/sec")
+    print(f"shared transport: {pooled:10.1f} pages/sec ({pooled / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
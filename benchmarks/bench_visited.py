@@ -0,0 +1,71 @@
+"""Compares memory per entry and throughput of the visited URL stores.
+
+Run from the repository root:
+    python benchmarks/bench_visited.py --sizes 1000000,10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape_stores import ExactVisitedStore, FingerprintVisitedStore, BloomVisitedStore  # noqa: E402
+
+
+def make_url(i):
+    return f"https://shop{i % 1000}.example.com/category/{i % 97}/product/{i}?ref=listing"
+
+
+def bench(store, size, lookups):
+    start = time.perf_counter()
+    for i in range(size):
+        store.add(make_url(i))
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        make_url(i) in store
+    hit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    false_positives = 0
+    for i in range(size, size + lookups):
+        false_positives += make_url(i) in store
+    miss_seconds = time.perf_counter() - start
+
+    return {
+        'bytes_per_entry': store.bytes_per_entry(),
+        'memory_mb': store.memory_bytes() / 2 ** 20,
+        'inserts_per_sec': size / insert_seconds,
+        'hits_per_sec': lookups / hit_seconds,
+        'misses_per_sec': lookups / miss_seconds,
+        'false_positive_rate': false_positives / lookups,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000000,10000000', help='Comma-separated numbers of URLs')
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--error-rate', type=float, default=0.001)
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(',')):
+        print(f"{size} URLs")
+        for name in ('exact', 'fingerprint', 'bloom'):
+            if name == 'exact':
+                store = ExactVisitedStore()
+            elif name == 'fingerprint':
+                store = FingerprintVisitedStore(capacity=size)
+            else:
+                store = BloomVisitedStore(capacity=size, error_rate=args.error_rate)
+            result = bench(store, size, min(args.lookups, size))
+            del store
+            print(f"  {name:12} {result['bytes_per_entry']:7.1f} B/entry {result['memory_mb']:9.1f} MB "
+                  f"{result['inserts_per_sec']:10.0f} inserts/s {result['hits_per_sec']:10.0f} hits/s "
+                  f"{result['misses_per_sec']:10.0f} misses/s  fp rate {result['false_positive_rate']:.5f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Runs the crawler, scraper, selector and export benchmarks against a local synthetic site.
+
+Results are printed and can be written as JSON with --output. Passing an earlier result file with
+--compare reports every metric that got worse by more than --threshold and exits with status 1, so
+the suite can guard against regressions.
+
+Run from the repository root:
+    python benchmarks/suite.py --pages 500 --fanout 8 --latency 0.002 --output results.json
+    python benchmarks/suite.py --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # resource is Unix only, peak RSS is not reported without it
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import ElementSelector, HttpTransport, Scraper, WebCrawler  # noqa: E402
+from scrape_parsers import get_backend  # noqa: E402
+from synthetic_site import SyntheticSite, render_page  # noqa: E402
+
+# Whether a larger value of a metric is better, used by --compare
+HIGHER_IS_BETTER = {
+    'crawl_pages_per_sec': True,
+    'scrape_p50_ms': False,
+    'scrape_p90_ms': False,
+    'scrape_p99_ms': False,
+    'select_mb_per_sec': True,
+    'select_elements_per_sec': True,
+    'export_rows_per_sec': True,
+    'peak_rss_mb': False,
+}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def bench_crawl(site, max_depth, threads, engine):
+    with HttpTransport(pool_maxsize=threads) as transport:
+        crawler = WebCrawler(transport)
+        start = time.perf_counter()
+        crawled_urls = crawler.crawl(site.url, max_depth=max_depth, num_threads=threads, engine=engine)
+        seconds = time.perf_counter() - start
+    return {'crawl_pages': len(crawled_urls), 'crawl_pages_per_sec': len(crawled_urls) / seconds}
+
+
+def bench_scrape(site, requests):
+    urls = site.page_urls()
+    latencies = []
+    with HttpTransport() as transport:
+        scraper = Scraper(transport)
+        for i in range(requests):
+            start = time.perf_counter()
+            try:
+                scraper.scrape(urls[i % len(urls)], 'html')
+            except Exception:
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {'scrape_p50_ms': percentiles[49], 'scrape_p90_ms': percentiles[89], 'scrape_p99_ms': percentiles[98]}
+
+
+def bench_select(site, pages):
+    documents = [render_page(number, site.pages, site.fanout, site.page_size).decode('utf-8')
+                 for number in range(min(pages, site.pages))]
+    elements = 0
+    start = time.perf_counter()
+    for html in documents:
+        elements += len(ElementSelector.extract_elements(html, '.product'))
+        elements += len(ElementSelector.extract_elements_by_xpath(html, '//p[@class="price"]'))
+    seconds = time.perf_counter() - start
+    size = sum(len(html.encode('utf-8')) for html in documents)
+    return {'select_mb_per_sec': size / seconds / 2 ** 20, 'select_elements_per_sec': elements / seconds}
+
+
+def bench_export(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rows.csv')
+        start = time.perf_counter()
+        Scraper.export_to_file(({'id': i, 'name': f'Product {i}', 'price': f'{i}.99'} for i in range(rows)), path)
+        seconds = time.perf_counter() - start
+    return {'export_rows_per_sec': rows / seconds}
+
+
+def compare(results, baseline, threshold):
+    """Returns a line for every metric that is more than threshold worse than in baseline."""
+    regressions = []
+    for name, higher_is_better in HIGHER_IS_BETTER.items():
+        old, new = baseline.get(name), results.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(f"{name}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help='number of pages on the site')
+    parser.add_argument('--fanout', type=int, default=8, help='new links on every page')
+    parser.add_argument('--page-size', type=int, default=20000, help='approximate page size in bytes')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of pages answering 500')
+    parser.add_argument('--depth', type=int, default=4, help='crawl depth')
+    parser.add_argument('--threads', type=int, default=8, help='crawler threads')
+    parser.add_argument('--engine', default='threads', choices=['threads', 'asyncio', 'pipeline'], help='crawl engine')
+    parser.add_argument('--requests', type=int, default=500, help='sequential Scraper.scrape calls')
+    parser.add_argument('--select-pages', type=int, default=100, help='pages parsed by the selector benchmark')
+    parser.add_argument('--rows', type=int, default=100000, help='rows written by the export benchmark')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='an earlier JSON result file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, 0.10 is 10%%')
+    args = parser.parse_args()
+
+    results = {}
+    with SyntheticSite(args.pages, args.fanout, args.page_size, args.latency, args.error_rate) as site:
+        results.update(bench_crawl(site, args.depth, args.threads, args.engine))
+        results.update(bench_scrape(site, args.requests))
+        results.update(bench_select(site, args.select_pages))
+    results.update(bench_export(args.rows))
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    for name, value in results.items():
+        print(f"{name:24} {value:12.2f}" if value is not None else f"{name:24} {'n/a':>12}")
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': get_backend().name,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parameters': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"regression {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
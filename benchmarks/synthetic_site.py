@@ -0,0 +1,119 @@
+"""A generated website served from localhost, for benchmarking the crawler and scrapers.
+
+Page n links to pages n * fanout + 1 ... n * fanout + fanout, so the site is a tree that a crawl of
+enough depth visits completely, plus one link back to the front page. Every page is a product listing
+padded to about page_size bytes.
+"""
+import hashlib
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def render_page(number, pages, fanout, page_size):
+    """Returns the HTML of page number as bytes."""
+    links = ''.join(f'<a href="/page/{child}">Page {child}</a>'
+                    for child in range(number * fanout + 1, min(number * fanout + fanout, pages - 1) + 1))
+    head = (f'<html><head><title>Page {number}</title></head><body><h1>Page {number}</h1>'
+            f'<nav>{links}<a href="/">Home</a></nav><div id="listing">')
+    tail = '</div></body></html>'
+    products = []
+    size = len(head) + len(tail)
+    i = 0
+    while size < page_size:
+        product = (f'<div class="product" data-id="{number}-{i}"><h2>Product {number}-{i}</h2>'
+                   f'<p class="price">{i}.99</p><div class="product-description">Description of '
+                   f'product {i} on page {number}.</div></div>')
+        products.append(product)
+        size += len(product)
+        i += 1
+    return (head + ''.join(products) + tail).encode('utf-8')
+
+
+class SyntheticSite:
+    """Serves a generated site on a local port.
+
+    Example:
+        with SyntheticSite(pages=500, fanout=8, page_size=20000, latency=0.005) as site:
+            WebCrawler().crawl(site.url, max_depth=4)
+    """
+
+    def __init__(self, pages=1000, fanout=10, page_size=20000, latency=0.0, error_rate=0.0):
+        """
+        Initializes the site.
+
+        Args:
+            pages (int, optional): The number of pages. Defaults to 1000.
+            fanout (int, optional): The number of new pages each page links to. Defaults to 10.
+            page_size (int, optional): The approximate size of each page in bytes. Defaults to 20000.
+            latency (float, optional): Seconds to wait before answering each request. Defaults to 0.
+            error_rate (float, optional): The fraction of pages that answer with a 500 error. Defaults to 0.
+        """
+        self.pages = pages
+        self.fanout = fanout
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._cache = {}
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                site.requests += 1
+                status, body = site.respond(self.path)
+                if site.latency:
+                    time.sleep(site.latency)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+
+    def respond(self, path):
+        """Returns the (status, body) answer for a path."""
+        if path == '/':
+            number = 0
+        elif path.startswith('/page/') and path[6:].isdigit() and int(path[6:]) < self.pages:
+            number = int(path[6:])
+        else:
+            return 404, b'not found'
+        if number and self.error_rate and self._failing(path):
+            return 500, b'server error'
+        body = self._cache.get(number)
+        if body is None:
+            body = self._cache[number] = render_page(number, self.pages, self.fanout, self.page_size)
+        return 200, body
+
+    def _failing(self, path):
+        digest = hashlib.blake2b(path.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') / 2 ** 64 < self.error_rate
+
+    def page_urls(self):
+        """Returns the URLs of all pages."""
+        return [self.url] + [f'{self.url}page/{number}' for number in range(1, self.pages)]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,17 +1,391 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import bisect
+import codecs
 import concurrent.futures
-from urllib.parse import urljoin
+import html
+import json
+import functools
+from urllib.parse import urljoin, urlsplit
+from collections import deque
+import collections.abc
+import heapq
+import os
+from queue import Queue
 import re
 import threading
+import time
+import types
 import csv
 
 from bs4 import BeautifulSoup
 
+from scrape_checkpoint import CrawlCheckpoint
+from scrape_dedup import DuplicateIndex
+from scrape_export import ExportSink
+from scrape_metrics import NULL_METRICS, MetricsRegistry, print_hook
+from scrape_parsers import get_backend
+from scrape_retry import CircuitBreaker, CircuitOpenError, HTTPStatusError, RetryPolicy
+from scrape_scope import BINARY_EXTENSIONS, CrawlScope
+from scrape_urls import UrlCanonicalizer
+from scrape_stores import ExactVisitedStore, make_visited_store
+
+
+def _timed_pool_classes(metrics):
+    """Returns urllib3 connection pool classes whose connections report their connect time to metrics."""
+    def timed(connection_class):
+        class TimedConnection(connection_class):
+            def connect(self):
+                start = metrics.clock()
+                super().connect()
+                host = self.host if self.port in (None, self.default_port) else f"{self.host}:{self.port}"
+                metrics.observe_since('connect', start, host.lower())
+                metrics.inc('connections', host=host.lower())
+        return TimedConnection
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = timed(HTTPConnection)
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = timed(HTTPSConnection)
+
+    return {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _timed_pool_classes(self.metrics)
+
+
+class HttpTransport:
+    """A long-lived HTTP transport that can be shared by scrapers and crawlers.
+
+    The transport keeps one requests.Session with a pooled HTTPAdapter, so TCP/TLS
+    connections are kept alive and reused between requests to the same host instead
+    of doing a new handshake for every page. The connection pools are thread-safe, so
+    a single transport can be used from all of the crawler's worker threads.
+    """
+
+    def __init__(self, pool_maxsize=10, pool_connections=10, headers=None, timeout=(5, 30), keep_alive=True,
+                 metrics=None):
+        """
+        Initializes the transport.
+
+        Args:
+            pool_maxsize (int, optional): The number of connections to keep open per host. Defaults to 10.
+            pool_connections (int, optional): The number of hosts to keep connection pools for. Defaults to 10.
+            headers (dict, optional): Default headers sent with every request.
+            timeout (float or tuple, optional): Default (connect, read) timeout in seconds. Defaults to (5, 30).
+            keep_alive (bool, optional): Keep connections open between requests. Defaults to True.
+            metrics (MetricsRegistry, optional): A registry that the time to open each connection is recorded
+                in, as the 'connect' histogram and the 'connections' counter.
+
+        Example:
+            transport = HttpTransport(pool_maxsize=20, headers={'User-Agent': 'ScrapePy/1.0'})
+            scraper = WebScraper(transport=transport)
+            crawler = WebCrawler(transport=transport)
+        """
+        self.timeout = timeout
+        self.session = requests.Session()
+        if metrics is not None and metrics.enabled:
+            adapter = _TimedHTTPAdapter(metrics, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def get(self, url, **kwargs):
+        """Sends a GET request over the pooled session, using the default timeout unless one is given."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """Returns the process-wide HttpTransport used when no transport is given, creating it on first use."""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
+
+
+# The content types the crawler fetches
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+class BodyTooLargeError(Exception):
+    """Raised when a response body is larger than the maximum body size."""
+
+    def __init__(self, url, size, limit):
+        super().__init__(f"Response body of {url} is larger than {limit} bytes")
+        self.url = url
+        self.size = size
+        self.limit = limit
+
+
+class UnsupportedContentTypeError(Exception):
+    """Raised when a response has a content type that is not accepted."""
+
+    def __init__(self, url, content_type):
+        super().__init__(f"Unsupported content type {content_type!r} of {url}")
+        self.url = url
+        self.content_type = content_type
+
+
+class FetchResult:
+    """A fetched page: the URL after redirects, the status code, the headers and the body as bytes."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+def _scrape_many(scrape, urls, data_type, concurrency, ordered):
+    """Runs scrape(url, data_type) for every URL on a thread pool and yields (url, result or error) pairs.
+
+    At most concurrency URLs are taken from urls at a time, so urls can be a long or endless iterator. With
+    ordered, the results are yielded in the order of urls and a slow URL holds back the ones after it.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    urls = iter(urls)
+    pending = deque()
+
+    def submit():
+        for url in urls:
+            pending.append((url, executor.submit(scrape, url, data_type)))
+            return True
+        return False
+
+    def outcome(url, future):
+        error = future.exception()
+        return url, (future.result() if error is None else error)
+
+    try:
+        while len(pending) < concurrency and submit():
+            pass
+        while pending:
+            if ordered:
+                url, future = pending.popleft()
+                concurrent.futures.wait([future])
+                yield outcome(url, future)
+            else:
+                concurrent.futures.wait([future for _, future in pending],
+                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for item in [item for item in pending if item[1].done()]:
+                    pending.remove(item)
+                    yield outcome(*item)
+            while len(pending) < concurrency and submit():
+                pass
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+class _DefaultInstanceMethod:
+    """A method that, when called on the class instead of an instance, runs on a new default instance.
+
+    Scraper.scrape used to be a static method, so Scraper.scrape(url, 'html') keeps working.
+    """
+
+    def __init__(self, function):
+        functools.update_wrapper(self, function)
+        self.function = function
+
+    def __get__(self, instance, owner=None):
+        return types.MethodType(self.function, instance if instance is not None else owner())
+
 
 class Scraper:
-    @staticmethod
-    def scrape(url, data_type):
+    def __init__(self, transport=None, limiter=None, retry=None, breaker=None, timeout=None, metrics=None,
+                 cache=None, max_body_size=None, content_types=None):
+        """
+        Initializes the scraper.
+
+        Args:
+            transport (HttpTransport, optional): The transport to send requests with. Defaults to the shared
+                default transport.
+            limiter (HostLimiter, optional): A limiter that every request waits for, and that adapts the
+                number of concurrent requests per host to the responses.
+            retry (RetryPolicy, optional): The policy for retrying failed requests. Defaults to no retries.
+            breaker (CircuitBreaker, optional): A circuit breaker that stops requests to failing hosts.
+            timeout (float or tuple, optional): The (connect, read) timeout in seconds. Defaults to the timeout
+                of the transport.
+            metrics (MetricsRegistry, optional): A registry for the 'requests', 'responses', 'bytes' and
+                'retries' counters and the 'ttfb' and 'download' histograms.
+            cache (ResponseCache, optional): A cache that pages are served from while they are fresh, and
+                revalidated with conditional requests when they are not.
+            max_body_size (int, optional): The largest body in bytes that is downloaded. A larger Content-Length
+                is rejected before the body is read, and a body without one is read until it gets too large.
+                Defaults to no limit.
+            content_types (tuple, optional): The media types that are accepted, like HTML_CONTENT_TYPES. Other
+                bodies are rejected as soon as the headers arrive. A response without a Content-Type is
+                accepted. Defaults to all types.
+
+        Example:
+            scraper = Scraper(retry=RetryPolicy(max_retries=3), breaker=CircuitBreaker(), timeout=(3, 10))
+        """
+        self.transport = transport if transport is not None else get_default_transport()
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.timeout = timeout
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.cache = cache
+        self.max_body_size = max_body_size
+        self.content_types = frozenset(content_types) if content_types is not None else None
+
+    def _check_headers(self, url, headers, size=None):
+        """Rejects a response by its Content-Type and Content-Length headers, or by size if the body is known.
+
+        Raises:
+            UnsupportedContentTypeError: If the content type is not accepted.
+            BodyTooLargeError: If the Content-Length is larger than the maximum body size.
+        """
+        if self.content_types is not None:
+            content_type = headers.get('Content-Type')
+            if content_type and content_type.split(';', 1)[0].strip().lower() not in self.content_types:
+                raise UnsupportedContentTypeError(url, content_type)
+        if self.max_body_size is not None:
+            if size is None:
+                length = headers.get('Content-Length', '')
+                size = int(length) if length.isdigit() else 0
+            if size > self.max_body_size:
+                raise BodyTooLargeError(url, size, self.max_body_size)
+
+    def _read_body(self, url, response, chunk_size=65536):
+        """Reads the body of a streamed response, stopping as soon as it is larger than the maximum body size.
+
+        Raises:
+            BodyTooLargeError: If the body is larger than the maximum body size.
+        """
+        if self.max_body_size is None:
+            return response.content
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size):
+            size += len(chunk)
+            if size > self.max_body_size:
+                raise BodyTooLargeError(url, size, self.max_body_size)
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _fetch_cached(self, url):
+        """Returns a CachedResponse for url from the cache, sending a (conditional) request if needed.
+
+        A new body is streamed through the same header check and size limit as an uncached fetch, so a rejected
+        response is neither downloaded nor stored.
+        """
+        def send(headers):
+            return self._get(url, headers=headers, stream=True) if headers else self._get(url, stream=True)
+
+        def read(response):
+            try:
+                self._check_headers(url, response.headers)
+                return self._read_body(url, response)
+            except BaseException:
+                response.close()
+                raise
+        return self.cache.fetch(url, send, read)
+
+    def _get(self, url, **kwargs):
+        """Sends a GET request, retrying failures with the retry policy and checking the circuit breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the host is open.
+            requests.RequestException: If the request fails after all retries.
+        """
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.allow(url)
+            try:
+                response = self._send(url, **kwargs)
+            except requests.RequestException as e:
+                if self.breaker is not None:
+                    self.breaker.record_failure(url)
+                delay = self.retry.next_delay(attempt, error=e) if self.retry is not None else None
+                if delay is None:
+                    raise
+            else:
+                if self.breaker is not None:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure(url)
+                    else:
+                        self.breaker.record_success(url)
+                delay = None
+                if self.retry is not None:
+                    delay = self.retry.next_delay(attempt, response.status_code, response.headers.get('Retry-After'))
+                if delay is None:
+                    return response
+                response.close()
+            self.metrics.inc('retries', host=urlsplit(url).netloc.lower() if self.metrics.enabled else None)
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, url, **kwargs):
+        """Sends a GET request over the transport, through the limiter if there is one."""
+        if self.metrics.enabled:
+            host = urlsplit(url).netloc.lower()
+            self.metrics.inc('requests', host=host)
+            response = self._send_limited(url, **kwargs)
+            self.metrics.inc('responses', host=host)
+            self.metrics.observe('ttfb', response.elapsed.total_seconds(), host)
+            return response
+        return self._send_limited(url, **kwargs)
+
+    def _send_limited(self, url, **kwargs):
+        if self.limiter is None:
+            return self.transport.get(url, **kwargs)
+        self.limiter.acquire(url)
+        start = time.monotonic()
+        try:
+            response = self.transport.get(url, **kwargs)
+        except requests.RequestException:
+            self.limiter.release(url, error=True)
+            raise
+        except BaseException:
+            self.limiter.release(url)
+            raise
+        self.limiter.release(url, time.monotonic() - start, response.status_code, response.headers.get('Retry-After'))
+        return response
+
+    @_DefaultInstanceMethod
+    def scrape(self, url, data_type):
         """Use the requested URL to scrape data.
+
+        It can also be called on the class, as Scraper.scrape(url, data_type), to scrape with a default Scraper
+        over the shared default transport.
+
         Args:
             url (string): The URL to scrape.
             data_type (string): The type of data to scrape if it is html or json).
@@ -21,32 +395,146 @@ class Scraper:
 
         Raises:
             ValueError: If an unsupported data type is provided.
-            Exception: If the request fails with a non-200 status code.
+            HTTPStatusError: If the request fails with a non-200 status code.
+            CircuitOpenError: If the circuit breaker of the host is open.
+        """
+        if data_type not in ('html', 'json'):
+            raise ValueError(f"Unsupported data type: {data_type}")
+
+        content = self.fetch(url).content
+        if data_type == 'html':
+            return content
+        return json.loads(content)
+
+    def fetch(self, url):
+        """Fetches a page with its final URL, status code and headers.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            FetchResult: The fetched page.
+
+        Raises:
+            HTTPStatusError: If the request fails with a non-200 status code.
+            CircuitOpenError: If the circuit breaker of the host is open.
+            UnsupportedContentTypeError: If the content type is not accepted.
+            BodyTooLargeError: If the body is larger than the maximum body size.
+        """
+        if self.cache is not None:
+            cached = self._fetch_cached(url)
+            self._check_headers(url, cached.headers, len(cached.body))
+            return FetchResult(cached.url, 200, cached.headers, cached.body)
+
+        # The body is streamed, so it can be rejected by its headers before it is downloaded, and the download
+        # is timed apart from the time to the first byte
+        response = self._get(url, stream=True)
+        try:
+            if response.status_code != 200:
+                raise HTTPStatusError(url, response.status_code)
+            self._check_headers(url, response.headers)
+            start = self.metrics.clock()
+            content = self._read_body(url, response)
+        except BaseException:
+            response.close()
+            raise
+        if self.metrics.enabled:
+            host = urlsplit(url).netloc.lower()
+            self.metrics.observe_since('download', start, host)
+            self.metrics.inc('bytes', len(content), host)
+        return FetchResult(response.url, response.status_code, response.headers, content)
+
+    def scrape_many(self, urls, data_type, concurrency=10, ordered=False):
+        """Scrapes many URLs concurrently over the pooled connections of the transport.
+
+        Only concurrency URLs are taken from urls at a time, so memory stays bounded however long urls is.
+        A failed URL does not stop the others; its error is yielded in place of the result.
+
+        Args:
+            urls (iterable): The URLs to scrape, for example from a sitemap or an earlier crawl.
+            data_type (str): The type of data to scrape ('html' or 'json').
+            concurrency (int, optional): The number of requests in flight. Defaults to 10, the number of
+                connections the default transport keeps per host.
+            ordered (bool, optional): Yield the results in the order of urls instead of as they complete.
+                Defaults to False.
+
+        Yields:
+            tuple: The URL and its result, see scrape, or the exception it failed with.
+
+        Raises:
+            ValueError: If an unsupported data type is provided.
+
+        Example:
+            scraper = Scraper(transport=HttpTransport(pool_maxsize=20))
+            for url, result in scraper.scrape_many(product_urls, 'html', concurrency=20):
+                if isinstance(result, Exception):
+                    print(f"{url} failed: {result}")
+        """
+        if data_type not in ('html', 'json'):
+            raise ValueError(f"Unsupported data type: {data_type}")
+        return _scrape_many(self.scrape, urls, data_type, concurrency, ordered)
+
+    def scrape_links(self, url, chunk_size=65536):
+        """Streams a page and yields the absolute URLs of its links as the body arrives.
+
+        The page is fed to a LinkExtractor chunk by chunk and never held in memory as a whole, unless the
+        scraper has a cache, which needs the whole page.
+
+        Args:
+            url (str): The URL to scrape.
+            chunk_size (int, optional): The number of bytes to read at a time. Defaults to 65536.
+
+        Yields:
+            str: The absolute URLs of the links on the page.
+
+        Raises:
+            HTTPStatusError: If the request fails with a non-200 status code.
+            CircuitOpenError: If the circuit breaker of the host is open.
+            UnsupportedContentTypeError: If the content type is not accepted.
+            BodyTooLargeError: If the body is larger than the maximum body size.
         """
-        with requests.Session() as session:
-            response = session.get(url)
+        if self.cache is not None:
+            cached = self._fetch_cached(url)
+            self._check_headers(url, cached.headers, len(cached.body))
+            extractor = LinkExtractor(cached.url, encoding=charset_from_content_type(cached.headers.get('Content-Type')))
+            yield from extractor.feed(cached.body)
+            yield from extractor.close()
+            return
+
+        with self._get(url, stream=True) as response:
             if response.status_code != 200:
-                raise Exception(f"Request failed: status code {response.status_code}")
+                raise HTTPStatusError(url, response.status_code)
+            self._check_headers(url, response.headers)
+            extractor = LinkExtractor(response.url, encoding=charset_from_content_type(response.headers.get('Content-Type')))
+            size = 0
+            for chunk in response.iter_content(chunk_size):
+                size += len(chunk)
+                if self.max_body_size is not None and size > self.max_body_size:
+                    raise BodyTooLargeError(url, size, self.max_body_size)
+                yield from extractor.feed(chunk)
+            yield from extractor.close()
 
-            if data_type == 'html':
-                return response.content
-            elif data_type == 'json':
-                return response.json()
-            else:
-                raise ValueError(f"Unsupported data type: {data_type}")
-        
     @staticmethod
     def export_to_file(data, file_path, fields=None):
         """Exports the scraped data to a file.
 
     Args:
-        data (bytes, str, list, or dict): The data to export.
+        data (bytes, str, list, dict or iterator of dicts): The data to export. An iterator of dicts is streamed
+            to the file without holding all rows in memory, as CSV or, for a '.jsonl', '.ndjson' or '.json' path,
+            as JSON Lines, compressed if the path ends with '.gz' or '.zst'. See ExportSink for appending.
         file_path (str): The path to the output file.
-        fields (list, optional): The fields to include in the CSV output file. This is only used if data is a dict or list of dicts.
+        fields (list, optional): For a dict or list of dicts, the fields to include in the CSV output file. For an
+            iterator, the first columns of the CSV header: fields of the rows that are not listed are added after
+            them, not left out.
 
     Raises:
         ValueError: If the data type is unsupported or if fields are not provided for a dict.
     """
+        if isinstance(data, collections.abc.Iterator):
+            with ExportSink(file_path, append=False, fields=fields) as sink:
+                sink.write_many(data)
+            return
+
         if isinstance(data, bytes):
             data = data.decode('utf-8')  # Decode bytes to string assuming UTF-8 encoding
 
@@ -72,14 +560,19 @@ class Scraper:
 
     @staticmethod
     def extract_text(element):
-        """Extracts the text content from an HTML element."""
+        """Extracts the text content from an HTML element, given as a string, an Element handle or a Fragment."""
+        if isinstance(element, (Element, Fragment)):
+            return element.text
         soup = BeautifulSoup(element, 'html.parser')
         return soup.get_text(strip=True)
 
 
     @staticmethod
     def extract_attribute(element, attribute):
-        """Extracts the value of the specified attribute from an HTML element."""
+        """Extracts the value of the specified attribute from an HTML element, given as a string, an Element handle or
+        a Fragment."""
+        if isinstance(element, (Element, Fragment)):
+            return element.attr(attribute)
         soup = BeautifulSoup(element, 'html.parser')
         tag = soup.find()
         if tag and tag.has_attr(attribute):
@@ -87,6 +580,115 @@ class Scraper:
         return ""
 
 
+def charset_from_content_type(content_type, default='utf-8'):
+    """Returns the charset declared in a Content-Type header, or default if there is none."""
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type or '', re.IGNORECASE)
+    return match.group(1) if match else default
+
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def sniff_charset(content, content_type=None, default='utf-8'):
+    """Returns the charset of an HTML body.
+
+    A byte order mark wins, then the charset of the Content-Type header, then a <meta charset> or
+    <meta http-equiv="Content-Type"> tag in the first 1024 bytes of the body. Unknown charsets give default.
+
+    Args:
+        content (bytes): The body.
+        content_type (str, optional): The Content-Type header of the response.
+        default (str, optional): The charset when none is declared. Defaults to 'utf-8'.
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    charset = charset_from_content_type(content_type, None)
+    if charset is None:
+        match = _META_CHARSET.search(content, 0, 1024)
+        charset = match.group(1).decode('ascii') if match else default
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return default
+
+
+def decode_html(content, content_type=None):
+    """Decodes an HTML body with its sniffed charset, see sniff_charset. Invalid bytes are replaced."""
+    return content.decode(sniff_charset(content, content_type), errors='replace')
+
+
+class LinkExtractor:
+    """Extracts absolute link URLs from HTML in a single pass, chunk by chunk as it arrives.
+
+    Only an unfinished <a> or <base> tag at the end of a chunk is kept between feeds, so the page is never held in
+    memory and every character is scanned once. href values can be double-quoted, single-quoted or
+    unquoted, and a <base href> changes the base URL of the links after it.
+
+    Example:
+        extractor = LinkExtractor('https://example.com')
+        for chunk in response.iter_content(65536):
+            for url in extractor.feed(chunk):
+                print(url)
+        extractor.close()
+    """
+
+    _TAG = re.compile(r'<(a|base)(?=[\s/>])([^>]*)>', re.IGNORECASE)
+    # The start of an <a> or <base> tag, or of its name, that is not closed before the end of the chunk
+    _OPEN_TAG = re.compile(r'<(?:(?:a|base)(?:[\s/][^>]*)?|b|ba|bas)?\Z', re.IGNORECASE)
+    _HREF = re.compile(r'''(?:^|[\s/])href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+    def __init__(self, base_url, encoding='utf-8', max_tag_size=65536):
+        """
+        Initializes the extractor.
+
+        Args:
+            base_url (str): The URL of the page.
+            encoding (str, optional): The encoding of byte chunks. Defaults to 'utf-8'.
+            max_tag_size (int, optional): The longest unfinished tag kept between chunks. Defaults to 65536.
+        """
+        self.base_url = base_url
+        self.max_tag_size = max_tag_size
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._buffer = ''
+
+    def feed(self, chunk):
+        """Feeds the next chunk of the page (str or bytes) and returns the absolute URLs completed by it."""
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        buffer = self._buffer + chunk if self._buffer else chunk
+        urls = []
+        position = 0
+        for match in self._TAG.finditer(buffer):
+            position = match.end()
+            href = self._HREF.search(match.group(2))
+            if href is None:
+                continue
+            href = html.unescape(next(value for value in href.groups() if value is not None)).strip()
+            if match.group(1).lower() == 'base':
+                self.base_url = urljoin(self.base_url, href)
+            else:
+                urls.append(urljoin(self.base_url, href))
+
+        # An unfinished tag starts after the last '>', and a '<' in one of its attribute values is not its start
+        tag = self._OPEN_TAG.search(buffer, max(position, buffer.rfind('>') + 1))
+        if tag is None or len(buffer) - tag.start() > self.max_tag_size:
+            self._buffer = ''
+        else:
+            self._buffer = buffer[tag.start():]
+        return urls
+
+    def close(self):
+        """Feeds the end of the page and returns the last URLs."""
+        urls = self.feed(self._decoder.decode(b'', final=True))
+        self._buffer = ''
+        return urls
+
+
 def extract_urls(html_content, base_url):
     """Extracts URLs from the HTML content.
 
@@ -97,22 +699,55 @@ def extract_urls(html_content, base_url):
     Returns:
         list: A list of extracted URLs.
     """
-    pattern = r'<a\s+(?:[^>]*?\s+)?href=(["\'])(.*?)\1'
-    urls = []
+    extractor = LinkExtractor(base_url)
+    return extractor.feed(html_content) + extractor.close()
+
 
-    for match in re.finditer(pattern, html_content):
-        href = match.group(2)
-        absolute_url = urljoin(base_url, href)
-        urls.append(absolute_url)
+def parse_page(html_content, url, fields=None):
+    """Extracts the links and fields of a page. Used by the parse stage of the pipeline crawl engine, which
+    runs it in worker processes.
 
-    return urls
+    Args:
+        html_content (str or bytes): The HTML content of the page.
+        url (str): The URL of the page.
+        fields (dict, optional): Field names mapped to selectors. Each field gets the text of the first
+            element matching its selector, or an empty string.
+
+    Returns:
+        tuple: A (urls, values) tuple with the list of extracted URLs and a dict of field values.
+    """
+    urls = extract_urls(html_content, url)
+    values = {}
+    if fields:
+        document = Document(html_content, url=url)
+        for name, selector in fields.items():
+            element = document.select_one(selector)
+            values[name] = element.text if element is not None else ''
+    return urls, values
 
 
 class WebScraper:
     """A web crawler for scraping and extracting URLs from web pages."""
 
-    def __init__(self):
-        self.scraper = Scraper()
+    def __init__(self, transport=None, limiter=None, retry=None, breaker=None, timeout=None, metrics=None,
+                 cache=None, max_body_size=None, content_types=None):
+        """
+        Initializes the web scraper.
+
+        Args:
+            transport (HttpTransport, optional): The transport to send requests with. Defaults to the shared
+                default transport.
+            limiter (HostLimiter, optional): A limiter for the requests, see Scraper.
+            retry (RetryPolicy, optional): The policy for retrying failed requests, see Scraper.
+            breaker (CircuitBreaker, optional): A circuit breaker for failing hosts, see Scraper.
+            timeout (float or tuple, optional): The (connect, read) timeout in seconds, see Scraper.
+            metrics (MetricsRegistry, optional): A registry for request metrics and the 'decode' histogram.
+            cache (ResponseCache, optional): A cache for the fetched pages, see Scraper.
+            max_body_size (int, optional): The largest body in bytes that is downloaded, see Scraper.
+            content_types (tuple, optional): The media types that are accepted, see Scraper.
+        """
+        self.scraper = Scraper(transport, limiter, retry, breaker, timeout, metrics, cache, max_body_size,
+                               content_types)
 
     def scrape(self, url, data_type):
         """Scrapes data from a given URL.
@@ -122,18 +757,43 @@ class WebScraper:
             data_type (str): The type of data to scrape ('html' or 'json').
 
         Returns:
-            str or dict: The scraped data as a string (HTML) or a dictionary (JSON).
+            str or dict: The scraped data as a string (HTML) or a dictionary (JSON). HTML is decoded with the
+                declared or sniffed charset, see sniff_charset.
 
         Example:
             web_scraper = WebScraper()
             html_content = web_scraper.scrape('https://example.com', 'html')
             json_data = web_scraper.scrape('https://example.com/api', 'json')
         """
-        content = self.scraper.scrape(url, data_type)
-        if data_type == 'html':
-            return content.decode('utf-8')  # Decode content into a string
+        if data_type != 'html':
+            return self.scraper.scrape(url, data_type)
+        page = self.scraper.fetch(url)
+        metrics = self.scraper.metrics
+        start = metrics.clock()
+        content = decode_html(page.content, page.headers.get('Content-Type'))
+        metrics.observe_since('decode', start, urlsplit(url).netloc.lower() if metrics.enabled else None)
         return content
 
+    def scrape_many(self, urls, data_type, concurrency=10, ordered=False):
+        """Scrapes many URLs concurrently and yields (url, result or error) pairs, see Scraper.scrape_many.
+
+        Example:
+            web_scraper = WebScraper()
+            for url, html_content in web_scraper.scrape_many(article_urls, 'html', ordered=True):
+                print(url, len(html_content))
+        """
+        if data_type not in ('html', 'json'):
+            raise ValueError(f"Unsupported data type: {data_type}")
+        return _scrape_many(self.scrape, urls, data_type, concurrency, ordered)
+
+    def scrape_links(self, url):
+        """Streams a page and yields the absolute URLs of its links, see Scraper.scrape_links."""
+        return self.scraper.scrape_links(url)
+
+    def fetch(self, url):
+        """Fetches a page with its final URL, status code and headers, see Scraper.fetch."""
+        return self.scraper.fetch(url)
+
 
 def parse_html(url, html_content):
     """Parses the HTML content and extracts URLs.
@@ -152,59 +812,278 @@ def parse_html(url, html_content):
                for url in urls:
                    print(url)
            """
-    start_tag = '<a'
-    end_tag = '</a>'
-    href_attr = 'href='
-    url_prefixes = ('http://', 'https://')
+    return extract_urls(html_content, url)
 
-    urls = []
 
-    while True:
-        start_index = html_content.find(start_tag)
-        if start_index == -1:
-            break
+class CrawlFrontier:
+    """A thread-safe crawl frontier that schedules URLs per host.
 
-        end_index = html_content.find(end_tag, start_index)
-        if end_index == -1:
-            break
+    Every host has its own FIFO queue, and a heap orders the hosts by the time they may be
+    fetched from again. get() always hands out a URL whose host is allowed to be hit now, so a
+    burst of links to one host does not starve the others. Admission is atomic: add() checks
+    and records a URL as seen under the same lock, so each URL is handed out at most once.
+    """
 
-        anchor_content = html_content[start_index:end_index]
-        href_index = anchor_content.find(href_attr)
-        if href_index == -1:
-            continue
+    def __init__(self, crawl_delay=0.0, host_delays=None, seen=None, metrics=None, checkpoint=None,
+                 url_filter=None, max_per_host=None, canonicalizer=None):
+        """
+        Initializes the frontier.
 
-        href_start = anchor_content.find('"', href_index) + 1
-        href_end = anchor_content.find('"', href_start)
-        href = anchor_content[href_start:href_end]
+        Args:
+            crawl_delay (float, optional): The minimum number of seconds between two fetches from the same
+                host. Defaults to 0.
+            host_delays (dict, optional): Crawl delays for specific hosts, overriding crawl_delay.
+            seen (object, optional): The visited store that records admitted URLs, see scrape_stores.
+                Defaults to an ExactVisitedStore.
+            metrics (MetricsRegistry, optional): A registry for the time URLs wait in the frontier, the 'queue'
+                histogram.
+            checkpoint (CrawlCheckpoint, optional): A checkpoint that every admitted URL is recorded in.
+            url_filter (callable, optional): Called with every added URL, returns the URL to admit, which may
+                be rewritten, or None for URLs that are not admitted and counted as 'skipped', like a CrawlScope.
+                Defaults to admitting every URL as it is.
+            max_per_host (int, optional): The most URLs admitted per host, later URLs of the host are counted
+                as 'skipped'. Defaults to no limit.
+            canonicalizer (UrlCanonicalizer, optional): Rewrites every added URL to its canonical form before
+                it is filtered and checked against seen. Links that were only rejected because of it are counted
+                as 'saved_fetches'. Defaults to admitting URLs as they are written.
 
-        if href.startswith(url_prefixes):
-            urls.append(href)
-        else:
-            absolute_url = urljoin(url, href)
-            urls.append(absolute_url)
+        Example:
+            frontier = CrawlFrontier(crawl_delay=1.0, host_delays={'example.com': 5.0})
+            frontier.add('https://example.com', 0)
+            url, depth = frontier.get()
+        """
+        self.crawl_delay = crawl_delay
+        self.host_delays = dict(host_delays or {})
+        self.seen = seen if seen is not None else ExactVisitedStore()
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.checkpoint = checkpoint
+        self.url_filter = url_filter
+        self.max_per_host = max_per_host
+        self.canonicalizer = canonicalizer
+        self._admitted = collections.Counter()
+        self._queues = {}
+        self._ready = []
+        self._next_fetch = {}
+        self._size = 0
+        self._in_progress = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def add(self, url, depth=0, canonicalize=True):
+        """Adds a URL to the frontier unless it has been seen before.
+
+        The URL is canonicalized first, unless canonicalize is False, so different spellings of a URL are
+        admitted once.
 
-        html_content = html_content[end_index:]
+        Returns:
+            bool: True if the URL was admitted, False if it was already seen, filtered out or its host has
+                reached max_per_host.
+        """
+        link = url
+        new_link = True
+        if self.canonicalizer is not None and canonicalize:
+            url, cached = self.canonicalizer.lookup(url)
+            new_link = not cached
+        if self.url_filter is not None:
+            filtered_url = self.url_filter(url)
+            if filtered_url is None:
+                self.metrics.inc('skipped', host=urlsplit(url).netloc.lower() if self.metrics.enabled else None)
+                return False
+            url = filtered_url
+        host = urlsplit(url).netloc.lower()
+        with self._condition:
+            if self.max_per_host is not None and self._admitted[host] >= self.max_per_host:
+                if url not in self.seen:
+                    self.metrics.inc('skipped', host=host if self.metrics.enabled else None)
+                    return False
+                admitted = False
+            else:
+                admitted = self.seen.add(url)
+            if not admitted:
+                # A link seen for the first time whose canonical URL was admitted before would be fetched again
+                if new_link and url != link and self.canonicalizer is not None:
+                    self.canonicalizer.duplicate()
+                    self.metrics.inc('saved_fetches', host=host if self.metrics.enabled else None)
+                return False
+            if self.max_per_host is not None:
+                self._admitted[host] += 1
+            queue = self._queues.get(host)
+            if queue is None:
+                queue = self._queues[host] = deque()
+                heapq.heappush(self._ready, (self._next_fetch.get(host, 0.0), host))
+            queue.append((url, depth, self.metrics.clock()))
+            if self.checkpoint is not None:
+                self.checkpoint.added(url, depth)
+            self._size += 1
+            self._condition.notify()
+            return True
+
+    def count_admitted(self, url):
+        """Counts a URL admitted before, like one crawled before a resume, towards the max_per_host of its host."""
+        if self.max_per_host is not None:
+            with self._condition:
+                self._admitted[urlsplit(url).netloc.lower()] += 1
+
+    def get(self):
+        """Takes the next URL whose host may be fetched now, waiting for its crawl delay if needed.
+
+        Every URL returned by get() must be followed by a call to task_done() once it has been processed.
+
+        Returns:
+            tuple or None: A (url, depth) tuple, or None when the frontier is empty and no URL is being
+                processed anymore, or the frontier was closed.
+        """
+        with self._condition:
+            while not self._closed:
+                if self._ready:
+                    ready_time, host = self._ready[0]
+                    now = time.monotonic()
+                    if ready_time <= now:
+                        heapq.heappop(self._ready)
+                        queue = self._queues[host]
+                        url, depth, queued = queue.popleft()
+                        self.metrics.observe_since('queue', queued, host)
+                        self._size -= 1
+                        self._in_progress += 1
+                        self._next_fetch[host] = now + self.host_delays.get(host, self.crawl_delay)
+                        if queue:
+                            heapq.heappush(self._ready, (self._next_fetch[host], host))
+                        else:
+                            del self._queues[host]
+                        return url, depth
+                    self._condition.wait(ready_time - now)
+                elif self._in_progress == 0:
+                    return None
+                else:
+                    self._condition.wait()
+            return None
 
-    return urls
+    def task_done(self):
+        """Marks a URL returned by get() as processed."""
+        with self._condition:
+            self._in_progress -= 1
+            if self._in_progress == 0 and self._size == 0:
+                self._condition.notify_all()
+
+    def close(self):
+        """Stops the frontier, get() returns None from now on."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        return self._size
 
 
 class WebCrawler:
     """A web crawler for scraping and extracting URLs from web pages."""
 
-    def __init__(self):
+    def __init__(self, transport=None, crawl_delay=0.0, host_delays=None, visited_store='exact', limiter=None,
+                 retry=None, breaker=None, metrics=None, cache=None, max_body_size=10 * 2 ** 20,
+                 content_types=HTML_CONTENT_TYPES, skip_extensions=BINARY_EXTENSIONS, canonicalizer=True,
+                 dedup=False):
+        """
+        Initializes the web crawler.
+
+        Args:
+            transport (HttpTransport, optional): The transport all worker threads fetch pages with. Defaults to
+                the shared default transport.
+            crawl_delay (float, optional): The minimum number of seconds between two fetches from the same
+                host. Defaults to 0.
+            host_delays (dict, optional): Crawl delays for specific hosts (like 'example.com'), overriding
+                crawl_delay.
+            visited_store (str or object, optional): How visited URLs are stored: 'exact' keeps every URL,
+                'fingerprint' keeps a 64-bit hash per URL and 'bloom' keeps a few bits per URL with a small
+                false positive rate. A store instance like BloomVisitedStore(error_rate=0.0001) can also be
+                given. Defaults to 'exact'.
+            limiter (HostLimiter, optional): A limiter that adapts the number of concurrent requests and the
+                request rate per host. Workers wait for it, so with a limiter num_threads is the upper bound on
+                the requests in flight over all hosts.
+            retry (RetryPolicy, optional): The policy for retrying failed requests, see Scraper.
+            breaker (CircuitBreaker, optional): A circuit breaker that makes requests to failing hosts fail at
+                once, so they stop taking up workers.
+            metrics (MetricsRegistry, optional): A registry for the crawl metrics, and the hooks that get the
+                'fetch', 'page' and 'error' events. Nothing is printed or measured without one; add print_hook
+                to the registry to print the progress.
+            cache (ResponseCache, optional): A cache for the fetched pages, so a repeated crawl only sends
+                conditional requests for pages that are not fresh anymore.
+            max_body_size (int, optional): The largest page in bytes that is downloaded, larger pages fail with
+                a BodyTooLargeError. None means no limit. Defaults to 10 MB.
+            content_types (tuple, optional): The media types that are crawled, other pages fail with an
+                UnsupportedContentTypeError as soon as their headers arrive. None means all types. Defaults to
+                HTML_CONTENT_TYPES.
+            skip_extensions (frozenset, optional): Links whose path ends with one of these extensions are never
+                fetched, see CrawlScope. None means no links are skipped. Defaults to
+                BINARY_EXTENSIONS. A scope given to crawl has its own skip_extensions.
+            canonicalizer (UrlCanonicalizer or bool, optional): Rewrites discovered links to their canonical URL
+                before they are checked against the visited URLs, so a page linked as '/a', '/a#top' and
+                '/a?utm_source=x' is fetched, cached and stored once. True uses a UrlCanonicalizer with the
+                default rules, and False crawls URLs as they are written. Defaults to True.
+            dedup (DuplicateIndex or bool, optional): An index of page fingerprints. Pages with the same body
+                or nearly the same text as a page crawled before, like the same page under a session ID, sort
+                order or printer view URL, are counted as 'duplicates' and get a 'duplicate' event, and their
+                links are not extracted and no row is written for them. They are still in the crawled URLs.
+                True uses a DuplicateIndex with the default settings. Not used with streaming. Defaults to False.
+
+        Example:
+            crawler = WebCrawler(visited_store='fingerprint')
+            crawler.crawl('https://example.com')
+            print(crawler.visited_urls.bytes_per_entry())
+        """
         self.visited_urls = set()
         self.queue = []
-
-    def crawl(self, url, max_depth=3, num_threads=5):
+        self.web_scraper = WebScraper(transport, limiter, retry, breaker, metrics=metrics, cache=cache,
+                                      max_body_size=max_body_size, content_types=content_types)
+        self.skip_extensions = skip_extensions
+        self.canonicalizer = UrlCanonicalizer() if canonicalizer is True else canonicalizer or None
+        self.dedup = DuplicateIndex() if dedup is True else dedup or None
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.limiter = limiter
+        self.crawl_delay = crawl_delay
+        self.host_delays = host_delays
+        self.visited_store = visited_store
+
+    def crawl(self, url, max_depth=3, num_threads=5, engine='threads', sink=None, streaming=False,
+              parse_workers=None, queue_size=100, fields=None, checkpoint=None, resume=False, page_store=None,
+              scope=None):
         """Crawl the web starting from a given URL.
 
         Args:
             url (str): The starting URL to crawl.
             max_depth (int, optional): The maximum depth to crawl. Defaults to 3.
             num_threads (int, optional): The number of threads to use for concurrent crawling. Defaults to 5.
+                With the asyncio engine this is the number of fetches in flight, and with the pipeline engine
+                the number of fetch threads.
+            engine (str, optional): 'threads' to crawl on a thread pool, 'asyncio' to crawl with an
+                AsyncWebCrawler, or 'pipeline' to fetch on threads and parse on a process pool, see
+                crawl_pipeline. Defaults to 'threads'.
+            sink (ExportSink, optional): A sink that a {'url', 'depth'} row is written to for every crawled page,
+                as the crawl goes.
+            streaming (bool, optional): Extract links from each page while it downloads with scrape_links, instead
+                of downloading the whole page first. Defaults to False. Not used by the pipeline engine.
+            parse_workers (int, optional): The number of parse processes of the pipeline engine. Defaults to the
+                number of CPUs.
+            queue_size (int, optional): The capacity of the queues between the pipeline stages. Defaults to 100.
+            fields (dict, optional): Field names mapped to selectors, extracted by the pipeline engine and added
+                to the rows written to sink.
+            checkpoint (str or CrawlCheckpoint, optional): A file that the frontier, the visited URLs and their
+                depths are continuously recorded in. Not supported by the asyncio engine.
+            resume (bool, optional): Continue the crawl recorded in checkpoint instead of starting at url.
+                URLs that were crawled or failed are not fetched again, and still count towards the page limit
+                per host of scope. Defaults to False.
+            page_store (PageStore, optional): A store that every fetched page is added to with its final URL,
+                status, headers and depth, for extracting data from the pages later without fetching them again.
+                Not supported by the asyncio engine or with streaming.
+            scope (CrawlScope, optional): The rules for the links that are followed, like the allowed domains and
+                a page limit per host. Links are checked when they are discovered, so out of scope links are
+                never queued. Defaults to all http and https links without a skip_extensions extension.
 
         Returns:
-            list: A list of crawled URLs.
+            list: A list of crawled URLs, including the URLs crawled before a resume.
+
+        Raises:
+            ValueError: If an unsupported engine is provided, a checkpoint or page store with the asyncio engine,
+                or a page store with streaming.
 
         Example:
             crawler = WebCrawler()
@@ -212,65 +1091,378 @@ class WebCrawler:
             for url in crawled_urls:
                 print(url)
         """
-        crawled_urls = []
-        visited_urls = set()
-        queue = [(url, 0)]
-        active_threads = 0
-        active_threads_lock = threading.Lock()
+        if engine == 'asyncio':
+            if checkpoint is not None:
+                raise ValueError("The asyncio engine does not support checkpoints")
+            if page_store is not None:
+                raise ValueError("The asyncio engine does not support page stores")
+            from scrape_async import AsyncWebCrawler
+            scraper = self.web_scraper.scraper
+            async_crawler = AsyncWebCrawler(concurrency=num_threads, transport=scraper.transport, metrics=self.metrics,
+                                            cache=scraper.cache, max_body_size=scraper.max_body_size,
+                                            content_types=scraper.content_types, skip_extensions=self.skip_extensions,
+                                            canonicalizer=self.canonicalizer, dedup=self.dedup, limiter=self.limiter,
+                                            retry=scraper.retry, breaker=scraper.breaker, crawl_delay=self.crawl_delay,
+                                            host_delays=self.host_delays, visited_store=self.visited_store)
+            crawled_urls = async_crawler.crawl(url, max_depth, sink=sink, scope=scope)
+            self.visited_urls = async_crawler.visited_urls
+            return crawled_urls
+        elif engine == 'pipeline':
+            return self.crawl_pipeline(url, max_depth, num_threads, parse_workers, queue_size, sink, fields,
+                                       checkpoint, resume, page_store, scope)
+        elif engine != 'threads':
+            raise ValueError(f"Unsupported engine: {engine}")
+        if streaming and page_store is not None:
+            raise ValueError("Streaming crawls do not support page stores")
+
+        metrics = self.metrics
+        checkpoint = CrawlCheckpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        frontier, crawled_urls = self._start_crawl(url, checkpoint, resume, scope)
 
         def crawl_worker():
-            nonlocal active_threads
-            with active_threads_lock:
-                active_threads += 1
-
-
             while True:
-                try:
-                    current_url, depth = queue.pop(0)
-                except IndexError:
+                item = frontier.get()
+                if item is None:
                     break
+                current_url, depth = item
+                host = urlsplit(current_url).netloc.lower() if metrics.enabled else None
+                metrics.emit('fetch', url=current_url, depth=depth)
+
+                try:
+                    duplicate = False
+                    if streaming:
+                        parsed_urls = []
+                        for parsed_url in self.scrape_links(current_url):
+                            parsed_urls.append(parsed_url)
+                            if depth < max_depth:
+                                frontier.add(parsed_url, depth + 1)
+                    else:
+                        html_content = self._fetch_page(current_url, depth, page_store)
+                        parsed_urls = []
+                        duplicate = self._is_duplicate(current_url, depth, html_content)
+                        if not duplicate:
+                            start = metrics.clock()
+                            parsed_urls = extract_urls(html_content, current_url)
+                            metrics.observe_since('extract', start, host)
+                        if depth < max_depth:
+                            for parsed_url in parsed_urls:
+                                frontier.add(parsed_url, depth + 1)
+
+                    crawled_urls.append(current_url)
+                    if sink is not None and not duplicate:
+                        start = metrics.clock()
+                        sink.write({'url': current_url, 'depth': depth})
+                        metrics.observe_since('export', start, host)
+                    if checkpoint is not None:
+                        checkpoint.crawled(current_url)
+                    metrics.inc('pages', host=host)
+                    metrics.inc('links', len(parsed_urls), host)
+                    metrics.emit('page', url=current_url, depth=depth, links=len(parsed_urls))
+                except Exception as e:
+                    if checkpoint is not None:
+                        checkpoint.failed(current_url)
+                    metrics.inc('errors', host=host)
+                    metrics.emit('error', url=current_url, depth=depth, error=e)
+                finally:
+                    frontier.task_done()
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+                workers = [executor.submit(crawl_worker) for _ in range(num_threads)]
+                for worker in workers:
+                    worker.result()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            if page_store is not None:
+                page_store.flush()
 
-                if depth > max_depth:
-                    continue
+        return crawled_urls
 
-                if current_url in visited_urls:
-                    continue
+    def _start_crawl(self, url, checkpoint, resume, scope):
+        """Creates the visited store and the frontier of a crawl, restoring them from the checkpoint on resume.
 
-                visited_urls.add(current_url)
-                print(f"Crawling {current_url} at depth {depth}")
+        Returns:
+            tuple: The CrawlFrontier and the list of crawled URLs.
+        """
+        self.visited_urls = make_visited_store(self.visited_store)
+        if scope is None:
+            scope = CrawlScope(skip_extensions=self.skip_extensions)
+        frontier = CrawlFrontier(self.crawl_delay, self.host_delays, seen=self.visited_urls, metrics=self.metrics,
+                                 url_filter=scope, max_per_host=scope.max_pages_per_host,
+                                 canonicalizer=self.canonicalizer)
+        crawled_urls = []
+        state = checkpoint.open(resume) if checkpoint is not None else None
+        if state:
+            # Every recorded URL was admitted once, so the page limits per host carry over to the resumed crawl
+            for visited_url in state.crawled + state.failed:
+                self.visited_urls.add(visited_url)
+                frontier.count_admitted(visited_url)
+            crawled_urls.extend(state.crawled)
+            for pending_url, depth in state.pending.items():
+                frontier.add(pending_url, depth)
+        # The pending URLs are already in the compacted checkpoint, so only URLs admitted from now on are recorded
+        frontier.checkpoint = checkpoint
+        if not state:
+            # The start URL is crawled as it is given, and its canonical URL is marked as seen for the links to it
+            frontier.add(url, 0, canonicalize=False)
+            if self.canonicalizer is not None:
+                self.visited_urls.add(self.canonicalizer(url))
+        return frontier, crawled_urls
+
+    def _is_duplicate(self, url, depth, html_content):
+        """Checks a page against the duplicate index, counting duplicates and emitting a 'duplicate' event."""
+        if self.dedup is None:
+            return False
+        kind = self.dedup.check(html_content)
+        if kind is None:
+            return False
+        metrics = self.metrics
+        metrics.inc('duplicates', host=urlsplit(url).netloc.lower() if metrics.enabled else None)
+        metrics.emit('duplicate', url=url, depth=depth, kind=kind)
+        return True
+
+    def _fetch_page(self, url, depth, page_store):
+        """Returns the HTML of a page as a string, adding the page to page_store if there is one."""
+        if page_store is None:
+            return self.scrape(url, 'html')
+        page = self.fetch(url)
+        page_store.add(url, page.content, page.status_code, page.headers, depth, final_url=page.url)
+        return decode_html(page.content, page.headers.get('Content-Type'))
+
+    def crawl_pipeline(self, url, max_depth=3, fetch_workers=5, parse_workers=None, queue_size=100, sink=None,
+                       fields=None, checkpoint=None, resume=False, page_store=None, scope=None):
+        """Crawl the web starting from a given URL, with fetching, parsing and writing in separate stages.
+
+        Fetch threads download pages and put them on a bounded queue. Parse threads each hand pages to a
+        ProcessPoolExecutor, where parse_page extracts links and fields outside the GIL, and put the results on
+        a second bounded queue. A single writer thread adds the links to the frontier and writes rows to the
+        sink. When a later stage falls behind, the full queue blocks the stage before it.
 
-                try:
-                    html_content = self.scrape(current_url, 'html')
-                    parsed_urls = extract_urls(html_content, current_url)
-                    crawled_urls.append(current_url)
+        Args:
+            url (str): The starting URL to crawl.
+            max_depth (int, optional): The maximum depth to crawl. Defaults to 3.
+            fetch_workers (int, optional): The number of fetch threads. Defaults to 5.
+            parse_workers (int, optional): The number of parse processes. Defaults to the number of CPUs.
+            queue_size (int, optional): The capacity of the queues between the stages. Defaults to 100.
+            sink (ExportSink, optional): A sink that a {'url', 'depth'} row, plus the fields, is written to for
+                every crawled page.
+            fields (dict, optional): Field names mapped to selectors, see parse_page.
+            checkpoint (str or CrawlCheckpoint, optional): A file the crawl is recorded in, see crawl.
+            resume (bool, optional): Continue the crawl recorded in checkpoint. Defaults to False.
+            page_store (PageStore, optional): A store that every fetched page is added to, see crawl.
+            scope (CrawlScope, optional): The rules for the links that are followed, see crawl.
 
-                    for parsed_url in parsed_urls:
-                        queue.append((parsed_url, depth + 1))
+        Returns:
+            list: A list of crawled URLs.
+
+        Example:
+            crawler = WebCrawler()
+            with ExportSink('titles.csv') as sink:
+                crawler.crawl('https://example.com', engine='pipeline', num_threads=20, parse_workers=8,
+                              sink=sink, fields={'title': 'title'})
+        """
+        parse_workers = parse_workers or os.cpu_count() or 1
+        metrics = self.metrics
+        checkpoint = CrawlCheckpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        frontier, crawled_urls = self._start_crawl(url, checkpoint, resume, scope)
+        pages = Queue(maxsize=queue_size)
+        results = Queue(maxsize=queue_size)
+
+        def fetch_worker():
+            while True:
+                item = frontier.get()
+                if item is None:
+                    break
+                current_url, depth = item
+                metrics.emit('fetch', url=current_url, depth=depth)
+                try:
+                    html_content = self._fetch_page(current_url, depth, page_store)
+                    if self._is_duplicate(current_url, depth, html_content):
+                        # Duplicate pages skip the parse stage, the writer only records them as crawled
+                        results.put((current_url, depth, None, None))
+                    else:
+                        pages.put((current_url, depth, html_content, None))
                 except Exception as e:
-                    print(f"Error occurred while crawling {current_url}: {str(e)}")
+                    results.put((current_url, depth, None, e))
 
-            with active_threads_lock:
-                active_threads -= 1
+        def parse_worker(executor):
+            while True:
+                item = pages.get()
+                if item is None:
+                    break
+                current_url, depth, html_content, _ = item
+                host = urlsplit(current_url).netloc.lower() if metrics.enabled else None
+                try:
+                    start = metrics.clock()
+                    parsed = executor.submit(parse_page, html_content, current_url, fields).result()
+                    metrics.observe_since('parse', start, host)
+                    results.put((current_url, depth, parsed, None))
+                except Exception as e:
+                    results.put((current_url, depth, None, e))
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-            while queue:
-                with active_threads_lock:
-                    if active_threads < num_threads:
-                        executor.submit(crawl_worker)
+        def writer():
+            while True:
+                item = results.get()
+                if item is None:
+                    break
+                current_url, depth, parsed, error = item
+                host = urlsplit(current_url).netloc.lower() if metrics.enabled else None
+                try:
+                    if error is not None:
+                        raise error
+                    parsed_urls, values = parsed if parsed is not None else ([], None)
+                    if depth < max_depth:
+                        for parsed_url in parsed_urls:
+                            frontier.add(parsed_url, depth + 1)
+                    crawled_urls.append(current_url)
+                    if sink is not None and parsed is not None:
+                        start = metrics.clock()
+                        sink.write({'url': current_url, 'depth': depth, **values})
+                        metrics.observe_since('export', start, host)
+                    if checkpoint is not None:
+                        checkpoint.crawled(current_url)
+                    metrics.inc('pages', host=host)
+                    metrics.inc('links', len(parsed_urls), host)
+                    metrics.emit('page', url=current_url, depth=depth, links=len(parsed_urls))
+                except Exception as e:
+                    if checkpoint is not None:
+                        checkpoint.failed(current_url)
+                    metrics.inc('errors', host=host)
+                    metrics.emit('error', url=current_url, depth=depth, error=e)
+                finally:
+                    frontier.task_done()
+
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) as processes, \
+                    concurrent.futures.ThreadPoolExecutor(max_workers=fetch_workers + parse_workers + 1) as threads:
+                writer_future = threads.submit(writer)
+                parsers = [threads.submit(parse_worker, processes) for _ in range(parse_workers)]
+                fetchers = [threads.submit(fetch_worker) for _ in range(fetch_workers)]
+                for future in fetchers:
+                    future.result()
+                for _ in parsers:
+                    pages.put(None)
+                for future in parsers:
+                    future.result()
+                results.put(None)
+                writer_future.result()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            if page_store is not None:
+                page_store.flush()
 
         return crawled_urls
 
     def scrape(self, url, data_type):
-        web_scraper = WebScraper()
-        return web_scraper.scrape(url, data_type)
+        return self.web_scraper.scrape(url, data_type)
+
+    def scrape_links(self, url):
+        return self.web_scraper.scrape_links(url)
+
+    def fetch(self, url):
+        return self.web_scraper.fetch(url)
+
+
+class CompiledSelector:
+    """A selector that has been compiled once for a parser backend and can be run over many pages.
+
+    Compiled selectors are immutable and can be shared between threads. Use ElementSelector.compile
+    to get one from the shared cache.
+    """
+
+    def __init__(self, selector, backend=None):
+        """
+        Compiles a selector.
+
+        Args:
+            selector (str): A CSS selector, an HTML tag like '<p>' or an XPath selector like '//p'.
+            backend (str, optional): The parser backend to compile for. Defaults to the default backend.
+        """
+        self.selector = selector
+        self.backend = get_backend(backend)
+        if selector.startswith(("//", "./", "(")):
+            self._match = self.backend.compile('xpath', selector)
+        elif selector.startswith("<"):
+            self._match = self.backend.compile('tag', selector.strip('<>'))
+        else:
+            self._match = self.backend.compile('css', selector)
+
+    def select(self, html):
+        """Returns the elements that match the selector.
+
+        Args:
+            html (str, bytes, Document or Element): The HTML, or a parsed Document or Element to search below.
+
+        Returns:
+            list: Element handles for a Document or Element, or HTML strings for HTML input.
+        """
+        if not isinstance(html, Element):
+            return [str(element) for element in self.select(Document(html, backend=self.backend.name))]
+        if html.document.backend is not self.backend:
+            return ElementSelector.compile(self.selector, html.document.backend.name).select(html)
+        return [Element(node, html.document) if not isinstance(node, str) else node for node in self._match(html.node)]
+
+    def __repr__(self):
+        return f"<CompiledSelector {self.selector!r} ({self.backend.name})>"
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_selector(selector, backend):
+    return CompiledSelector(selector, backend)
+
+
+@functools.lru_cache(maxsize=256)
+def _xpath_pattern(tag):
+    return re.compile(rf"<{tag}[^>]*>.*?</{tag}>", re.DOTALL)
 
 
 class ElementSelector:
     """ Class to extract elements from HTML content based on different selectors. """
 
+    @staticmethod
+    def compile(selector, backend=None):
+        """Compiles a selector into a reusable, thread-safe CompiledSelector.
+
+        Compiled selectors are kept in a bounded LRU cache, which the string-based methods share.
+
+        Args:
+            selector (str): A CSS selector, an HTML tag like '<p>' or an XPath selector like '//p'.
+            backend (str, optional): The parser backend to compile for. Defaults to the default backend.
+
+        Example:
+            product_names = ElementSelector.compile('.product h2')
+            for html in pages:
+                names = [element.text for element in product_names.select(Document(html))]
+        """
+        return _compile_selector(selector, get_backend(backend).name)
+
+    @staticmethod
+    def cache_info():
+        """Returns the hits, misses, maxsize and currsize of the compiled selector cache."""
+        return _compile_selector.cache_info()
+
+    @staticmethod
+    def set_cache_size(maxsize):
+        """Sets the number of compiled selectors to keep, and empties the cache."""
+        global _compile_selector
+        _compile_selector = functools.lru_cache(maxsize=maxsize)(_compile_selector.__wrapped__)
+
+    @staticmethod
+    def clear_cache():
+        """Empties the compiled selector cache and resets its counters."""
+        _compile_selector.cache_clear()
+
     @staticmethod
     def extract_elements(html, selector):
-        """Determines the method of extraction based on the type of selector."""
+        """Determines the method of extraction based on the type of selector.
+
+        If html is a Document (or an Element of one, or a Fragment), the already parsed tree is queried and Element
+        handles are returned instead of HTML strings.
+        """
+        if isinstance(html, (Element, Fragment)):
+            return html.select(selector)
         if selector.startswith("//"):
             # Extract using XPath-like syntax (if you want to implement this, consider using lxml)
             return ElementSelector.extract_elements_by_xpath(html, selector)
@@ -284,43 +1476,46 @@ class ElementSelector:
 
     @staticmethod
     def extract_elements_by_xpath(html, selector):
-        """Extracts elements using a simulated XPath selector."""
-        tag = selector.split("//")[1]
-        pattern = rf"<{tag}[^>]*>.*?</{tag}>"
-        elements = re.findall(pattern, html, re.DOTALL)
-        return elements
+        """Extracts elements using an XPath selector.
+
+        With the lxml backend this is a real XPath 1.0 engine. Other backends translate the XPath subset of
+        simple_xpath_to_css into a CSS selector, and only '//tag' selectors outside that subset are matched with a
+        regular expression.
+        """
+        try:
+            return ElementSelector.compile(selector).select(html)
+        except ValueError:
+            tag = selector.split("//")[1]
+            return _xpath_pattern(tag).findall(html)
 
     @staticmethod
     def extract_elements_by_tag(html, selector):
         # Assuming direct tag use without angle brackets
-        tag = selector.strip('<>')
-        soup = BeautifulSoup(html, 'html.parser')
-        return [str(element) for element in soup.find_all(tag)]
+        return ElementSelector.compile('<' + selector.strip('<>') + '>').select(html)
 
     @staticmethod
     def extract_elements_by_css_selector(html, selector):
-        soup = BeautifulSoup(html, 'html.parser')
-        selected_elements = soup.select(selector)
-        # Convert elements back to string for comparison in tests
-        return [str(element) for element in selected_elements]
+        # Elements are converted back to strings for comparison in tests
+        return ElementSelector.compile(selector).select(html)
 
     @staticmethod
     def filter_elements_by_attribute(elements, attr_name, attr_value):
         """Filters a list of HTML elements, returning only those that have a specific attribute with a specified value.
 
         Args:
-            elements (list of str): HTML elements to filter.
+            elements (list of str, Element or Fragment): HTML elements to filter.
             attr_name (str): The attribute name to filter by.
             attr_value (str): The attribute value to match.
 
         Returns:
-            list of str: Filtered HTML elements.
+            list of str or Element: Filtered HTML elements, as Element handles for Element and Fragment input.
         """
         filtered_elements = []
         for element in elements:
-            soup = BeautifulSoup(element, 'html.parser')
-            for tag in soup.find_all(attrs={attr_name: attr_value}):
-                filtered_elements.append(str(tag))
+            if isinstance(element, (Element, Fragment)):
+                filtered_elements.extend(element.filter_by_attribute(attr_name, attr_value))
+            else:
+                filtered_elements.extend(str(tag) for tag in Document(element).filter_by_attribute(attr_name, attr_value))
 
         return filtered_elements
 
@@ -335,12 +1530,321 @@ class ElementSelector:
         Returns:
             list: A list of extracted URLs.
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        urls = []
+        return Document(html_content, url=base_url).links()
 
-        for tag in soup.find_all('a', href=True):
-            href = tag['href']
-            absolute_url = urljoin(base_url, href)
-            urls.append(absolute_url)
 
-        return urls
+class Element:
+    """A handle to an element of a parsed Document.
+
+    Selector, text, attribute and link queries run against the already parsed tree, and str(element)
+    gives the HTML of the element.
+    """
+
+    __slots__ = ('node', 'document')
+
+    def __init__(self, node, document):
+        self.node = node
+        self.document = document
+
+    @property
+    def name(self):
+        """The tag name of the element."""
+        return self.document.backend.tag_name(self.node)
+
+    @property
+    def text(self):
+        """The text content of the element, stripped of surrounding whitespace."""
+        return self.document.backend.text(self.node)
+
+    @property
+    def html(self):
+        """The HTML of the element."""
+        return self.document.backend.html(self.node)
+
+    def attr(self, name, default=""):
+        """Returns the value of an attribute of the element, or default if the element does not have it."""
+        value = self.document.backend.attr(self.node, name)
+        return default if value is None else value
+
+    def select(self, selector):
+        """Returns the elements below this element that match a selector.
+
+        XPath selectors are evaluated by a real XPath engine with the lxml backend, so they follow XPath
+        semantics: '//p' searches the whole document and './/p' searches below this element. Results that are
+        not elements, like '//a/@href', are returned as they are.
+
+        Args:
+            selector (str): A CSS selector, an HTML tag like '<p>' or an XPath selector like '//p'.
+
+        Returns:
+            list of Element: The matching elements.
+        """
+        return ElementSelector.compile(selector, self.document.backend.name).select(self)
+
+    def select_one(self, selector):
+        """Returns the first element below this element that matches a selector, or None."""
+        elements = self.select(selector)
+        return elements[0] if elements else None
+
+    def filter_by_attribute(self, attr_name, attr_value):
+        """Returns this element and the elements below it whose attribute attr_name has the value attr_value."""
+        nodes = self.document.backend.filter_by_attribute(self.node, attr_name, attr_value)
+        return [Element(node, self.document) for node in nodes]
+
+    def links(self):
+        """Returns the absolute URLs of the links below this element."""
+        base_url = self.document.base_url or ''
+        return [urljoin(base_url, href) for href in self.document.backend.hrefs(self.node)]
+
+    def __str__(self):
+        return self.html
+
+    def __repr__(self):
+        return f"<Element {self.name}>"
+
+    def __eq__(self, other):
+        return isinstance(other, Element) and self.document.backend.node_id(self.node) == \
+            other.document.backend.node_id(other.node)
+
+    def __hash__(self):
+        return self.document.backend.node_id(self.node)
+
+
+class Document(Element):
+    """An HTML page that is parsed once and can then answer many selector, text, attribute and link queries.
+
+    Example:
+        document = Document(web_scraper.scrape('https://example.com', 'html'), url='https://example.com')
+        for product in document.select('.product'):
+            print(product.select_one('h2').text, product.attr('data-id'), product.links())
+    """
+
+    __slots__ = ('backend', 'url', 'base_url')
+
+    def __init__(self, html, url=None, backend=None):
+        """
+        Parses an HTML page.
+
+        Args:
+            html (str or bytes): The HTML to parse.
+            url (str, optional): The URL of the page, used to make links absolute.
+            backend (str, optional): The parser backend, 'lxml', 'selectolax' or 'soup'. Defaults to the
+                fastest installed backend, see scrape_parsers.get_backend.
+        """
+        self.backend = get_backend(backend)
+        super().__init__(self.backend.parse(html), self)
+        self.url = url
+        base_href = self.backend.base_href(self.node)
+        self.base_url = urljoin(url or '', base_href) if base_href else url
+
+
+# Elements that have no end tag
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+                        'track', 'wbr'))
+
+
+# Comments and the raw text of scripts and styles, which can hold tags that the parser does not see
+_RAW_TEXT = r'<!--.*?(?:-->|\Z)|<(script|style)(?=[\s/>]).*?(?:</\1\s*>|\Z)'
+_RAW_TEXT_PATTERNS = {False: re.compile(_RAW_TEXT, re.IGNORECASE | re.DOTALL),
+                      True: re.compile(_RAW_TEXT.encode('ascii'), re.IGNORECASE | re.DOTALL)}
+
+
+@functools.lru_cache(maxsize=256)
+def _tag_pattern(tag, binary):
+    pattern = r'<(/?)' + re.escape(tag) + r'(?=[\s/>])'
+    return re.compile(pattern.encode('ascii') if binary else pattern, re.IGNORECASE)
+
+
+class _SourceIndex:
+    """Finds the offsets of parsed elements in the source of a page."""
+
+    def __init__(self, source, line_limit=None):
+        """
+        Args:
+            source (str or bytes): The HTML the page was parsed from.
+            line_limit (int, optional): The last line number the parser counts to. Elements after it are
+                reported on that line.
+        """
+        self.source = source
+        self.binary = isinstance(source, bytes)
+        self.line_starts = [0] + [match.end() for match in re.finditer(b'\n' if self.binary else '\n', source)]
+        self.line_limit = line_limit
+        self._starts = {}
+        self._raw_text = None
+
+    def _is_raw_text(self, position):
+        """Returns whether a position is inside a comment, a script or a style."""
+        if self._raw_text is None:
+            spans = [match.span() for match in _RAW_TEXT_PATTERNS[self.binary].finditer(self.source)]
+            self._raw_text = ([start for start, _ in spans], [end for _, end in spans])
+        starts, ends = self._raw_text
+        index = bisect.bisect_right(starts, position) - 1
+        return index >= 0 and position < ends[index]
+
+    def _line_starts(self, pattern, line):
+        """Returns the offsets of the start tags that begin on a line, or after it for the last counted line."""
+        key = (pattern, line)
+        starts = self._starts.get(key)
+        if starts is None:
+            last = line >= len(self.line_starts) or line == self.line_limit
+            end = len(self.source) if last else self.line_starts[line]
+            matches = pattern.finditer(self.source, self.line_starts[line - 1], end)
+            starts = self._starts[key] = [match.start() for match in matches
+                                          if not match.group(1) and not self._is_raw_text(match.start())]
+        return starts
+
+    def span(self, tag, position):
+        """Returns the (start, end) offsets of an element, or None if they are unknown.
+
+        The start tag is found from the position the parser recorded, and the end by counting the start and
+        end tags with the same name after it. Elements whose end tag was left out are not found.
+
+        Args:
+            tag (str): The tag name of the element.
+            position (tuple): The line, the column or None, and the number of elements with the same tag that
+                start before it on the line, see the source_positions method of the parser backends.
+        """
+        line, column, index = position
+        if not isinstance(tag, str) or not 0 < line <= len(self.line_starts):
+            return None
+        source = self.source
+        pattern = _tag_pattern(tag, self.binary)
+        if column is not None:
+            start = self.line_starts[line - 1] + column
+            match = pattern.match(source, start)
+            if match is None or match.group(1):
+                return None
+        else:
+            starts = self._line_starts(pattern, line)
+            if index >= len(starts):
+                return None
+            start = starts[index]
+
+        close = b'>' if self.binary else '>'
+        if tag.lower() in _VOID_TAGS:
+            end = source.find(close, start)
+            return (start, end + 1) if end != -1 else None
+        depth = 0
+        for match in pattern.finditer(source, start):
+            if match.start() != start and self._is_raw_text(match.start()):
+                continue
+            if not match.group(1):
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 0:
+                end = source.find(close, match.end())
+                return (start, end + 1) if end != -1 else None
+        return None
+
+
+class Fragment:
+    """The HTML of an element, kept as offsets into the source of the page it was parsed from.
+
+    Fragments of one page share its source, so keeping many of them takes a few bytes each instead of a copy of
+    their HTML or the parsed tree of the whole page. The HTML is sliced out, and parsed, only when it is used, and
+    the parsed element is then kept until the fragment is freed. Fragments answer the same queries as an Element,
+    and are accepted wherever one is.
+
+    Example:
+        fragments = Fragment.from_elements(html, document, document.select('.product'))
+        del document  # The parsed tree can be freed, the fragments only keep html
+        print(fragments[0].select_one('h2').text)
+    """
+
+    __slots__ = ('source', 'start', 'end', 'url', '_element')
+
+    def __init__(self, source, start=0, end=None, url=None):
+        """
+        Initializes a fragment.
+
+        Args:
+            source (str or bytes): The HTML of the page, or of the element itself.
+            start (int, optional): The offset where the element starts. Defaults to 0.
+            end (int, optional): The offset where the element ends. Defaults to the end of source.
+            url (str, optional): The URL of the page, used to make links absolute.
+        """
+        self.source = source
+        self.start = start
+        self.end = len(source) if end is None else end
+        self.url = url
+        self._element = None
+
+    @staticmethod
+    def from_elements(source, document, elements):
+        """Returns a Fragment for every element of a Document parsed from source.
+
+        Elements that cannot be found in the source, for example because the parser backend does not record
+        where they start, get a Fragment over a copy of their HTML.
+
+        Args:
+            source (str or bytes): The HTML the document was parsed from.
+            document (Document): The parsed document.
+            elements (list): Elements of the document.
+
+        Returns:
+            list: The fragments, in the order of elements.
+        """
+        positions = document.backend.source_positions(document.node, [element.node for element in elements])
+        index = _SourceIndex(source, document.backend.source_line_limit)
+        fragments = []
+        for element, position in zip(elements, positions):
+            span = index.span(element.name, position) if position is not None else None
+            if span is None:
+                fragments.append(Fragment(element.html, url=document.base_url))
+            else:
+                fragments.append(Fragment(source, span[0], span[1], document.base_url))
+        return fragments
+
+    @property
+    def html(self):
+        """The HTML of the element."""
+        html = self.source[self.start:self.end]
+        return html.decode('utf-8', errors='replace') if isinstance(html, bytes) else html
+
+    @property
+    def element(self):
+        """The element parsed from its HTML, parsed on first use."""
+        if self._element is None:
+            html = self.html
+            document = Document(html, url=self.url)
+            match = re.match(r'<([\w-]+)', html)
+            element = document.select_one(match.group(1)) if match else None
+            self._element = element if element is not None else document
+        return self._element
+
+    @property
+    def name(self):
+        """The tag name of the element."""
+        return self.element.name
+
+    @property
+    def text(self):
+        """The text content of the element, stripped of surrounding whitespace."""
+        return self.element.text
+
+    def attr(self, name, default=""):
+        """Returns the value of an attribute of the element, or default if it has none."""
+        return self.element.attr(name, default)
+
+    def select(self, selector):
+        """Returns the Elements below this element that match a selector."""
+        return self.element.select(selector)
+
+    def select_one(self, selector):
+        """Returns the first Element below this element that matches a selector, or None."""
+        return self.element.select_one(selector)
+
+    def filter_by_attribute(self, attr_name, attr_value):
+        """Returns this element and the Elements below it whose attribute attr_name has the value attr_value."""
+        return self.element.filter_by_attribute(attr_name, attr_value)
+
+    def links(self):
+        """Returns the absolute URLs of the links below this element."""
+        return self.element.links()
+
+    def __str__(self):
+        return self.html
+
+    def __repr__(self):
+        return f"<Fragment {self.start}:{self.end}>"
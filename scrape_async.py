@@ -0,0 +1,373 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import collections
+
+import requests
+
+from scrape import BodyTooLargeError, WebScraper, decode_html, extract_urls
+from scrape_scope import CrawlScope
+from scrape_metrics import NULL_METRICS
+from scrape_retry import HTTPStatusError
+from scrape_stores import make_visited_store
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional, fetches fall back to the shared transport on worker threads
+    aiohttp = None
+
+
+def _retry_error(error):
+    """Returns the requests exception that the retry policy classifies an aiohttp error as."""
+    if isinstance(error, asyncio.TimeoutError):
+        return requests.Timeout(error)
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return requests.ConnectionError(error)
+    return error
+
+
+class AsyncWebCrawler:
+    """An asyncio web crawler that can keep thousands of fetches in flight.
+
+    Pages are fetched with aiohttp when it is installed. Without aiohttp the crawler still runs on the
+    event loop, but every fetch is handed to a worker thread that uses the shared HttpTransport.
+    """
+
+    def __init__(self, concurrency=100, limit_per_host=0, headers=None, timeout=None, transport=None, metrics=None,
+                 cache=None, max_body_size=None, content_types=None, skip_extensions=None, canonicalizer=None,
+                 dedup=None, limiter=None, retry=None, breaker=None, crawl_delay=0.0, host_delays=None,
+                 visited_store='exact'):
+        """
+        Initializes the async web crawler.
+
+        Args:
+            concurrency (int, optional): The maximum number of fetches in flight. Defaults to 100.
+            limit_per_host (int, optional): The maximum number of open connections per host, 0 means no limit.
+                Defaults to 0.
+            headers (dict, optional): Default headers sent with every request, on top of the headers set on the
+                transport.
+            timeout (float, optional): The total timeout of each fetch in seconds. Defaults to no total timeout
+                with a transport, and to 30 seconds without one.
+            transport (HttpTransport, optional): The transport used when aiohttp is not installed. With aiohttp
+                the session sends the headers set on the transport, and uses its (connect, read) timeout.
+            metrics (MetricsRegistry, optional): A registry for the crawl metrics and event hooks, see WebCrawler.
+            cache (ResponseCache, optional): A cache for the fetched pages. The cache is not asynchronous, so with
+                a cache every fetch runs on a worker thread.
+            max_body_size (int, optional): The largest page in bytes that is downloaded, see Scraper.
+            content_types (tuple, optional): The media types that are crawled, see Scraper.
+            skip_extensions (frozenset, optional): Links whose path ends with one of these extensions are never
+                fetched, see WebCrawler.
+            canonicalizer (UrlCanonicalizer, optional): Rewrites links to their canonical URL before they are
+                checked against the visited URLs, see WebCrawler.
+            dedup (DuplicateIndex, optional): An index of page fingerprints, the links of duplicate pages are not
+                extracted and no row is written for them, see WebCrawler.
+            limiter (HostLimiter, optional): A limiter for the request rate and the concurrent requests per host.
+                Fetches wait for it on the event loop, so concurrency is the upper bound over all hosts.
+            retry (RetryPolicy, optional): The policy for retrying failed requests, see Scraper.
+            breaker (CircuitBreaker, optional): A circuit breaker that makes requests to failing hosts fail at
+                once, see Scraper.
+            crawl_delay (float, optional): The minimum number of seconds between two fetches from the same
+                host. Defaults to 0.
+            host_delays (dict, optional): Crawl delays for specific hosts (like 'example.com'), overriding
+                crawl_delay.
+            visited_store (str or object, optional): How visited URLs are stored, 'exact', 'fingerprint', 'bloom'
+                or a store instance, see WebCrawler. The store of the last crawl is kept as visited_urls.
+                Defaults to 'exact'.
+
+        Example:
+            crawler = AsyncWebCrawler(concurrency=500)
+            crawled_urls = crawler.crawl('https://example.com', max_depth=2)
+        """
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.headers = headers
+        self.timeout = timeout
+        self.transport = transport
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.skip_extensions = skip_extensions
+        self.canonicalizer = canonicalizer
+        self.dedup = dedup
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.crawl_delay = crawl_delay
+        self.host_delays = dict(host_delays or {})
+        self.visited_store = visited_store
+        self.visited_urls = set()
+        self.web_scraper = WebScraper(transport, limiter, retry, breaker, metrics=metrics, cache=cache,
+                                      max_body_size=max_body_size, content_types=content_types)
+        self.session = None
+        self._released = None
+
+    def crawl(self, url, max_depth=3, concurrency=None, sink=None, scope=None):
+        """Crawl the web starting from a given URL, see crawl_async.
+
+        Returns:
+            list: A list of crawled URLs.
+        """
+        return asyncio.run(self.crawl_async(url, max_depth, concurrency, sink, scope))
+
+    async def crawl_async(self, url, max_depth=3, concurrency=None, sink=None, scope=None):
+        """Crawl the web starting from a given URL.
+
+        URLs are admitted to the frontier once, when they are first discovered at a depth of at most
+        max_depth. The crawl is finished when the frontier is empty and no fetch is in flight.
+
+        Args:
+            url (str): The starting URL to crawl.
+            max_depth (int, optional): The maximum depth to crawl. Defaults to 3.
+            concurrency (int, optional): Overrides the number of fetches in flight for this crawl.
+            sink (ExportSink, optional): A sink that a {'url', 'depth'} row is written to for every crawled page.
+            scope (CrawlScope, optional): The rules for the links that are followed, see WebCrawler.crawl.
+
+        Returns:
+            list: A list of crawled URLs.
+
+        Example:
+            crawled_urls = await AsyncWebCrawler().crawl_async('https://example.com', max_depth=2)
+        """
+        concurrency = concurrency or self.concurrency
+        metrics = self.metrics
+        if scope is None:
+            scope = CrawlScope(skip_extensions=self.skip_extensions)
+        crawled_urls = []
+        visited_urls = self.visited_urls = make_visited_store(self.visited_store)
+        admitted = collections.Counter()
+        queue = asyncio.Queue()
+
+        def add(new_url, depth, canonicalize=True):
+            canonical_url, cached = (new_url, True)
+            if self.canonicalizer is not None and canonicalize:
+                canonical_url, cached = self.canonicalizer.lookup(new_url)
+            scoped_url = scope.filter(canonical_url)
+            if scoped_url is None:
+                metrics.inc('skipped', host=urlsplit(new_url).netloc.lower() if metrics.enabled else None)
+                return
+            host = urlsplit(scoped_url).netloc.lower()
+            if scoped_url in visited_urls:
+                if not cached and scoped_url != new_url:
+                    self.canonicalizer.duplicate()
+                    metrics.inc('saved_fetches', host=host if metrics.enabled else None)
+                return
+            if scope.max_pages_per_host is not None:
+                if admitted[host] >= scope.max_pages_per_host:
+                    metrics.inc('skipped', host=host if metrics.enabled else None)
+                    return
+                admitted[host] += 1
+            visited_urls.add(scoped_url)
+            queue.put_nowait((scoped_url, depth))
+
+        # The time each host may be fetched from again, reserved when a fetch is started
+        next_fetch = {}
+
+        async def wait_for_host(current_url):
+            host = urlsplit(current_url).netloc.lower()
+            delay = self.host_delays.get(host, self.crawl_delay)
+            if not delay:
+                return
+            now = time.monotonic()
+            ready = max(now, next_fetch.get(host, now))
+            next_fetch[host] = ready + delay
+            if ready > now:
+                await asyncio.sleep(ready - now)
+
+        # The start URL is crawled as it is given, and its canonical URL is marked as seen for the links to it
+        add(url, 0, canonicalize=False)
+        if self.canonicalizer is not None:
+            visited_urls.add(self.canonicalizer(url))
+
+        async def crawl_worker():
+            while True:
+                current_url, depth = await queue.get()
+                host = urlsplit(current_url).netloc.lower() if metrics.enabled else None
+                try:
+                    await wait_for_host(current_url)
+                    metrics.emit('fetch', url=current_url, depth=depth)
+                    html_content = await self.scrape(current_url)
+                    crawled_urls.append(current_url)
+                    duplicate = self.dedup.check(html_content) if self.dedup is not None else None
+                    if duplicate is not None:
+                        metrics.inc('duplicates', host=host)
+                        metrics.emit('duplicate', url=current_url, depth=depth, kind=duplicate)
+                    elif sink is not None:
+                        start = metrics.clock()
+                        sink.write({'url': current_url, 'depth': depth})
+                        metrics.observe_since('export', start, host)
+                    parsed_urls = []
+                    if depth < max_depth and duplicate is None:
+                        start = metrics.clock()
+                        parsed_urls = extract_urls(html_content, current_url)
+                        metrics.observe_since('extract', start, host)
+                        for parsed_url in parsed_urls:
+                            add(parsed_url, depth + 1)
+                    metrics.inc('pages', host=host)
+                    metrics.inc('links', len(parsed_urls), host)
+                    metrics.emit('page', url=current_url, depth=depth, links=len(parsed_urls))
+                except Exception as e:
+                    metrics.inc('errors', host=host)
+                    metrics.emit('error', url=current_url, depth=depth, error=e)
+                finally:
+                    queue.task_done()
+
+        await self.open()
+        workers = [asyncio.create_task(crawl_worker()) for _ in range(concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.close()
+
+        return crawled_urls
+
+    def _session_headers(self):
+        """Returns the headers set on the transport, without the defaults of requests, updated with headers."""
+        headers = {}
+        if self.transport is not None:
+            defaults = requests.utils.default_headers()
+            headers.update((name, value) for name, value in self.transport.session.headers.items()
+                           if defaults.get(name) != value)
+        headers.update(self.headers or {})
+        return headers
+
+    def _client_timeout(self):
+        """Returns the aiohttp timeout of a fetch: the (connect, read) timeout of the transport and the total
+        timeout."""
+        if self.transport is None:
+            return aiohttp.ClientTimeout(total=self.timeout if self.timeout is not None else 30)
+        connect = read = self.transport.timeout
+        if isinstance(connect, tuple):
+            connect, read = connect
+        return aiohttp.ClientTimeout(total=self.timeout, connect=connect, sock_read=read)
+
+    async def open(self):
+        """Opens the aiohttp session used by scrape, if aiohttp is installed."""
+        if aiohttp is not None and self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.limit_per_host)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self._session_headers(),
+                                                 timeout=self._client_timeout())
+            self._released = asyncio.Event()
+
+    async def close(self):
+        """Closes the aiohttp session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def scrape(self, url):
+        """Fetches a page and returns its HTML as a string.
+
+        Raises:
+            HTTPStatusError: If the request fails with a non-200 status code.
+            UnsupportedContentTypeError: If the content type is not accepted.
+            BodyTooLargeError: If the body is larger than the maximum body size.
+        """
+        if self.session is None or self.web_scraper.scraper.cache is not None:
+            return await asyncio.to_thread(self.web_scraper.scrape, url, 'html')
+
+        metrics = self.metrics
+        host = urlsplit(url).netloc.lower() if metrics.enabled else None
+        response = await self._get(url)
+        async with response:
+            if response.status != 200:
+                raise HTTPStatusError(url, response.status)
+            scraper = self.web_scraper.scraper
+            scraper._check_headers(url, response.headers)
+            start = metrics.clock()
+            if scraper.max_body_size is None:
+                body = await response.read()
+            else:
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(65536):
+                    size += len(chunk)
+                    if size > scraper.max_body_size:
+                        raise BodyTooLargeError(url, size, scraper.max_body_size)
+                    chunks.append(chunk)
+                body = b''.join(chunks)
+            metrics.observe_since('download', start, host)
+            metrics.inc('bytes', len(body), host)
+            start = metrics.clock()
+            text = decode_html(body, response.headers.get('Content-Type'))
+            metrics.observe_since('decode', start, host)
+            return text
+
+    async def _get(self, url):
+        """Sends a GET request with the aiohttp session, retrying failures with the retry policy and checking the
+        circuit breaker, like Scraper._get.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the host is open.
+            aiohttp.ClientError: If the request fails after all retries.
+        """
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.allow(url)
+            try:
+                response = await self._send(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if self.breaker is not None:
+                    self.breaker.record_failure(url)
+                delay = self.retry.next_delay(attempt, error=_retry_error(e)) if self.retry is not None else None
+                if delay is None:
+                    raise
+            else:
+                if self.breaker is not None:
+                    if response.status >= 500:
+                        self.breaker.record_failure(url)
+                    else:
+                        self.breaker.record_success(url)
+                delay = None
+                if self.retry is not None:
+                    delay = self.retry.next_delay(attempt, response.status, response.headers.get('Retry-After'))
+                if delay is None:
+                    return response
+                response.release()
+            self.metrics.inc('retries', host=urlsplit(url).netloc.lower() if self.metrics.enabled else None)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, url):
+        """Sends a GET request with the aiohttp session, through the limiter if there is one."""
+        metrics = self.metrics
+        host = urlsplit(url).netloc.lower() if metrics.enabled else None
+        if self.limiter is not None:
+            await self._acquire(url)
+        metrics.inc('requests', host=host)
+        start = metrics.clock()
+        sent = time.monotonic()
+        try:
+            response = await self.session.get(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._release(url, error=True)
+            raise
+        except BaseException:
+            self._release(url)
+            raise
+        metrics.observe_since('ttfb', start, host)
+        metrics.inc('responses', host=host)
+        self._release(url, time.monotonic() - sent, response.status, response.headers.get('Retry-After'))
+        return response
+
+    async def _acquire(self, url):
+        """Waits on the event loop until the limiter lets a request to the host of url be sent."""
+        while True:
+            wait = self.limiter.try_acquire(url)
+            if wait == 0:
+                return
+            # Woken by the next release of this crawler, or after a while for releases from other threads
+            try:
+                await asyncio.wait_for(self._released.wait(), wait if wait is not None else 0.05)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, url, *args, **kwargs):
+        """Reports the outcome of a request to the limiter, and wakes the fetches that wait for it."""
+        if self.limiter is None:
+            return
+        self.limiter.release(url, *args, **kwargs)
+        released, self._released = self._released, asyncio.Event()
+        released.set()
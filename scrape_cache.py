@@ -0,0 +1,249 @@
+import email.utils
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from requests.structures import CaseInsensitiveDict
+
+from scrape_retry import HTTPStatusError
+from scrape_urls import UrlCanonicalizer
+
+# Cache keys keep the query as it is, a reordered or shortened query could be a different response
+_cache_keys = UrlCanonicalizer(strip_params=None, sort_query=False)
+
+
+def normalize_url(url):
+    """Returns the cache key of a URL: the canonical URL without a fragment, with the query as it is, see
+    UrlCanonicalizer.
+
+    Example:
+        normalize_url('HTTPS://Example.com:443?q=1#top')  # 'https://example.com/?q=1'
+    """
+    return _cache_keys(url)
+
+
+def parse_cache_control(value):
+    """Parses a Cache-Control header into a dict of lower case directives, with None for directives without value."""
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+class CachedResponse:
+    """A response stored in a ResponseCache."""
+
+    def __init__(self, url, headers, body, expires, etag=None, last_modified=None):
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self):
+        """Whether the response may be used without asking the server."""
+        return self.expires > time.time()
+
+    def validators(self):
+        """Returns the If-None-Match and If-Modified-Since headers for revalidating the response."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """A persistent HTTP response cache in an SQLite file.
+
+    Responses are stored by normalized URL with zlib compressed bodies. A response is fresh for the max-age
+    of its Cache-Control header (or until its Expires header), and used without a request while it is fresh.
+    A stale response with an ETag or Last-Modified header is revalidated with a conditional request, and a
+    304 Not Modified answer is served from the cache. Responses with Cache-Control: no-store are not stored.
+    When the bodies take more than max_size bytes, the least recently used responses are evicted.
+
+    The cache is thread-safe and can be shared by all scrapers and crawlers.
+
+    Example:
+        cache = ResponseCache('responses.db', max_size=500 * 2 ** 20)
+        scraper = WebScraper(cache=cache)
+        news_site = NewsSite(name='News', url='https://example.com', scraper=scraper)
+        news_site.scrape_articles('article')
+        print(cache.stats())
+    """
+
+    def __init__(self, path, max_size=256 * 2 ** 20, default_ttl=0, compression_level=6):
+        """
+        Initializes the cache, creating the file if it does not exist.
+
+        Args:
+            path (str): The path to the SQLite file, or ':memory:'.
+            max_size (int, optional): The maximum size of the compressed bodies in bytes. Defaults to 256 MB.
+            default_ttl (float, optional): The number of seconds a response without Cache-Control max-age or
+                Expires header is fresh. Defaults to 0, always revalidate.
+            compression_level (int, optional): The zlib compression level of the bodies. Defaults to 6.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, url TEXT, headers TEXT, body BLOB, size INTEGER, expires REAL,
+            etag TEXT, last_modified TEXT, accessed REAL)''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._connection.commit()
+        self.size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url):
+        """Returns the stored response for a URL, fresh or not, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT url, headers, body, expires, etag, last_modified FROM responses WHERE key = ?',
+                (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        final_url, headers, body, expires, etag, last_modified = row
+        return CachedResponse(final_url, CaseInsensitiveDict(json.loads(headers)), zlib.decompress(body), expires, etag,
+                              last_modified)
+
+    def fetch(self, url, send, read=None):
+        """Returns a response from the cache, revalidating or fetching it when needed.
+
+        Args:
+            url (str): The URL.
+            send (callable): Sends a GET request for url, called as send(headers) with the conditional
+                headers, and returns a requests.Response.
+            read (callable, optional): Reads the body of a 200 response, called as read(response). It can raise
+                to reject the response, which is then not stored. Defaults to response.content.
+
+        Returns:
+            CachedResponse: The response.
+
+        Raises:
+            HTTPStatusError: If the request fails with a status code other than 200 or 304.
+        """
+        cached = self.get(url)
+        if cached is not None and cached.fresh:
+            self._touch(url)
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        response = send(cached.validators() if cached is not None else {})
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            cached.expires = self._expires(response.headers) or time.time()
+            cached.etag = response.headers.get('ETag', cached.etag)
+            cached.last_modified = response.headers.get('Last-Modified', cached.last_modified)
+            with self._lock:
+                self._connection.execute(
+                    'UPDATE responses SET expires = ?, etag = ?, last_modified = ?, accessed = ? WHERE key = ?',
+                    (cached.expires, cached.etag, cached.last_modified, time.time(), normalize_url(url)))
+                self._connection.commit()
+                self.revalidated += 1
+            return cached
+        if response.status_code != 200:
+            response.close()
+            raise HTTPStatusError(url, response.status_code)
+
+        with self._lock:
+            self.misses += 1
+        headers = response.headers
+        body = read(response) if read is not None else response.content
+        cached = CachedResponse(response.url, headers, body, self._expires(headers) or time.time(),
+                                headers.get('ETag'), headers.get('Last-Modified'))
+        if 'no-store' not in parse_cache_control(headers.get('Cache-Control')):
+            self.store(url, cached)
+        return cached
+
+    def _expires(self, headers):
+        """Returns the time a response stops being fresh, or None if its headers do not say."""
+        now = time.time()
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-cache' in directives:
+            return now
+        max_age = directives.get('max-age')
+        if max_age is not None and max_age.isdigit():
+            age = headers.get('Age', '0')
+            return now + int(max_age) - (int(age) if age.isdigit() else 0)
+        if headers.get('Expires'):
+            try:
+                return email.utils.parsedate_to_datetime(headers['Expires']).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now + self.default_ttl if self.default_ttl else None
+
+    def store(self, url, response):
+        """Stores a CachedResponse for a URL, evicting the least recently used responses if the cache is full."""
+        body = zlib.compress(response.body, self.compression_level)
+        key = normalize_url(url)
+        with self._lock:
+            old = self._connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, json.dumps(dict(response.headers)), body, len(body), response.expires,
+                 response.etag, response.last_modified, time.time()))
+            self.size += len(body) - (old[0] if old else 0)
+            if self.size > self.max_size:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        while self.size > self.max_size:
+            rows = self._connection.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 64').fetchall()
+            if not rows:
+                self.size = 0
+                return
+            for key, size in rows:
+                if self.size <= self.max_size:
+                    return
+                self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.size -= size
+                self.evictions += 1
+
+    def _touch(self, url):
+        with self._lock:
+            self._connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), normalize_url(url)))
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def stats(self):
+        """Returns the number of 'hits', 'misses' and 'revalidated' responses, 'evictions', the number of
+        'entries' and the 'size' of the stored bodies in bytes."""
+        entries = len(self)
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated,
+                    'evictions': self.evictions, 'entries': entries, 'size': self.size}
+
+    def clear(self):
+        """Removes all stored responses."""
+        with self._lock:
+            self._connection.execute('DELETE FROM responses')
+            self._connection.commit()
+            self.size = 0
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
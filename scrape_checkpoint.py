@@ -0,0 +1,184 @@
+import os
+import struct
+import threading
+import zlib
+
+# Record types: a URL was admitted to the frontier, was crawled, or failed
+ADDED = b'A'
+CRAWLED = b'D'
+FAILED = b'E'
+
+# type, depth, URL length, followed by the URL and a CRC32 of both
+_HEADER = struct.Struct('<cII')
+_CRC = struct.Struct('<I')
+
+
+class CheckpointState:
+    """The state of a crawl read from a checkpoint file."""
+
+    def __init__(self):
+        self.pending = {}
+        self.crawled = []
+        self.failed = []
+
+    def __len__(self):
+        return len(self.pending) + len(self.crawled) + len(self.failed)
+
+
+def _record(kind, url, depth):
+    payload = url.encode('utf-8')
+    data = _HEADER.pack(kind, depth, len(payload)) + payload
+    return data + _CRC.pack(zlib.crc32(data))
+
+
+def read_checkpoint(path):
+    """Reads a checkpoint file.
+
+    Reading stops at the first record that is incomplete or fails its checksum, the tail that a crash can
+    leave behind.
+
+    Args:
+        path (str): The path to the checkpoint file.
+
+    Returns:
+        tuple: The CheckpointState and the number of bytes of valid records.
+    """
+    state = CheckpointState()
+    if not os.path.exists(path):
+        return state, 0
+    with open(path, 'rb') as file:
+        data = file.read()
+    seen = set()
+    position = 0
+    while position + _HEADER.size <= len(data):
+        kind, depth, length = _HEADER.unpack_from(data, position)
+        end = position + _HEADER.size + length
+        if end + _CRC.size > len(data) or _CRC.unpack_from(data, end)[0] != zlib.crc32(data[position:end]):
+            break
+        url = data[position + _HEADER.size:end].decode('utf-8')
+        if kind == ADDED:
+            if url not in seen:
+                state.pending[url] = depth
+        elif kind in (CRAWLED, FAILED):
+            state.pending.pop(url, None)
+            (state.crawled if kind == CRAWLED else state.failed).append(url)
+        else:
+            break
+        seen.add(url)
+        position = end + _CRC.size
+    return state, position
+
+
+class CrawlCheckpoint:
+    """Records the progress of a crawl in an append-only file, so an interrupted crawl can be resumed.
+
+    Every URL admitted to the frontier is recorded with its depth, and every crawled or failed URL is recorded
+    once it has been processed. Workers only append the records to a buffer in memory; a background thread
+    writes the buffer to the file every flush_interval seconds, so the workers never wait for the disk. Each
+    record has a checksum and the records are written in the order they happened, so after a crash the file
+    is a consistent checkpoint up to its last complete record.
+
+    Example:
+        crawler = WebCrawler()
+        crawler.crawl('https://example.com', checkpoint='crawl.ckpt')
+        # After a crash or restart:
+        crawler.crawl('https://example.com', checkpoint='crawl.ckpt', resume=True)
+    """
+
+    def __init__(self, path, flush_interval=1.0, fsync=True):
+        """
+        Initializes the checkpoint.
+
+        Args:
+            path (str): The path to the checkpoint file.
+            flush_interval (float, optional): The number of seconds between two writes. Defaults to 1.
+            fsync (bool, optional): Force every write to disk. Defaults to True.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._buffer = []
+        self._file = None
+        self._thread = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def open(self, resume=False):
+        """Opens the file and starts the background writer.
+
+        Args:
+            resume (bool, optional): Continue from the records in the file instead of starting a new checkpoint.
+                The file is rewritten with one record per URL first. Defaults to False.
+
+        Returns:
+            CheckpointState: The state to resume from, empty if resume is False.
+        """
+        state = CheckpointState()
+        if resume:
+            state, _ = read_checkpoint(self.path)
+            self._compact(state)
+        self._file = open(self.path, 'ab' if resume else 'wb')
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='crawl-checkpoint', daemon=True)
+        self._thread.start()
+        return state
+
+    def _compact(self, state):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.writelines(_record(CRAWLED, url, 0) for url in state.crawled)
+            file.writelines(_record(FAILED, url, 0) for url in state.failed)
+            file.writelines(_record(ADDED, url, depth) for url, depth in state.pending.items())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def added(self, url, depth):
+        """Records that a URL was admitted to the frontier."""
+        self._append(_record(ADDED, url, depth))
+
+    def crawled(self, url):
+        """Records that a URL was crawled."""
+        self._append(_record(CRAWLED, url, 0))
+
+    def failed(self, url):
+        """Records that crawling a URL failed. Failed URLs are not crawled again on resume."""
+        self._append(_record(FAILED, url, 0))
+
+    def _append(self, record):
+        with self._condition:
+            self._buffer.append(record)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed:
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+        with self._write_lock:
+            with self._condition:
+                records, self._buffer = self._buffer, []
+            if records and self._file is not None:
+                self._file.write(b''.join(records))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+
+    def close(self):
+        """Writes the remaining records, stops the background writer and closes the file."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,167 @@
+import hashlib
+import re
+import sys
+import threading
+from array import array
+
+from scrape_stores import FingerprintVisitedStore
+
+# Comments, and whitespace between tags, which never changes the page
+_INSIGNIFICANT = re.compile(rb'\s*<!--.*?-->\s*|\s+(?=<)|(?<=>)\s+', re.DOTALL)
+_SPACE = re.compile(rb'\s+')
+_MARKUP = re.compile(rb'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->|<[^>]*>', re.IGNORECASE | re.DOTALL)
+# Translation tables that map a byte to 1 if it has a bit set, and to 0 if not
+_BIT_TABLES = [bytes(value >> bit & 1 for value in range(256)) for bit in range(8)]
+
+
+def _fingerprint(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def content_fingerprint(body):
+    """Returns a 64-bit hash of a page body with its comments removed and its whitespace collapsed, so bodies
+    that only differ in formatting get the same fingerprint."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return _fingerprint(_SPACE.sub(b' ', _INSIGNIFICANT.sub(b'', body)).strip())
+
+
+def _words(body):
+    return _MARKUP.sub(b' ', body).lower().split()
+
+
+def simhash(body, shingle_size=3):
+    """Returns the 64-bit SimHash of the visible text of a page, or None if the page has no text.
+
+    The text is split into overlapping shingles of shingle_size words, and every bit of the SimHash is the
+    majority vote of that bit over the hashes of the shingles. Pages with mostly the same text get SimHashes
+    that differ in a few bits, so near duplicates can be found by the Hamming distance.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return _simhash(_words(body), shingle_size)
+
+
+def _simhash(words, shingle_size):
+    if not words:
+        return None
+    shingles = {b' '.join(words[index:index + shingle_size])
+                for index in range(max(len(words) - shingle_size + 1, 1))}
+    data = b''.join(hashlib.blake2b(shingle, digest_size=8).digest() for shingle in shingles)
+    # The votes for each bit are counted in C, over the byte of that bit in every hash
+    half = len(shingles) / 2
+    result = 0
+    for position in range(8):
+        column = data[position::8]
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > half:
+                result |= 1 << (position * 8 + bit)
+    return result
+
+
+class DuplicateIndex:
+    """An index of page fingerprints that finds pages the crawl has already seen under another URL.
+
+    A page is an exact duplicate if its normalized body has the same hash as an earlier page, and a near duplicate
+    if the SimHash of its text is at most max_distance bits from the SimHash of an earlier page. Exact hashes are
+    kept in a FingerprintVisitedStore, and SimHashes in one array, chained per bucket of max_distance + 1 bands of
+    their bits: two SimHashes that differ in at most max_distance bits are equal in at least one band, so a lookup
+    only compares the few SimHashes in the buckets of its bands. The chains are arrays of page indexes, so the
+    index uses about 60 bytes per page, on top of a table of at most 256 KB per band, and is thread-safe.
+
+    Example:
+        crawler = WebCrawler(dedup=DuplicateIndex(max_distance=4))
+        crawler.crawl('https://example.com')
+        print(crawler.dedup.stats()['duplicate_rate'])
+    """
+
+    def __init__(self, find_near_duplicates=True, max_distance=3, shingle_size=3, min_words=20):
+        """
+        Initializes the index.
+
+        Args:
+            find_near_duplicates (bool, optional): Find near duplicates with SimHash, not only exact duplicates.
+                Defaults to True.
+            max_distance (int, optional): The largest number of differing SimHash bits of near duplicates.
+                Defaults to 3.
+            shingle_size (int, optional): The number of words per shingle of the SimHash. Defaults to 3.
+            min_words (int, optional): Pages with fewer words of text are only checked for exact duplicates,
+                their SimHash is not reliable. Defaults to 20.
+        """
+        self.find_near_duplicates = find_near_duplicates
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self._exact = FingerprintVisitedStore()
+        # Bands wider than 16 bits are bucketed by their low 16 bits, which only makes the chains longer
+        band_bits = 64 // (max_distance + 1)
+        mask = (1 << min(band_bits, 16)) - 1
+        self._bands = [(band * band_bits, mask) for band in range(max_distance + 1)]
+        self._fingerprints = array('Q')
+        # The index of the last SimHash in each bucket of a band, and for each SimHash the previous one in its
+        # bucket, or -1
+        self._heads = [array('i', [-1]) * (mask + 1) for _ in self._bands]
+        self._chains = [array('i') for _ in self._bands]
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _buckets(self, fingerprint):
+        return [fingerprint >> shift & mask for shift, mask in self._bands]
+
+    def check(self, body):
+        """Checks a page body against the index, and adds it if it is not a duplicate.
+
+        Args:
+            body (str or bytes): The page body.
+
+        Returns:
+            str or None: 'exact' or 'near' if the page is a duplicate of a page in the index, or None.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        exact = content_fingerprint(body)
+        fingerprint = None
+        if self.find_near_duplicates:
+            words = _words(body)
+            if len(words) >= self.min_words:
+                fingerprint = _simhash(words, self.shingle_size)
+        with self._lock:
+            self.pages += 1
+            if not self._exact.add_fingerprint(exact):
+                self.exact_duplicates += 1
+                return 'exact'
+            if fingerprint is None:
+                return None
+            buckets = self._buckets(fingerprint)
+            fingerprints = self._fingerprints
+            for heads, chain, bucket in zip(self._heads, self._chains, buckets):
+                index = heads[bucket]
+                while index >= 0:
+                    if (fingerprint ^ fingerprints[index]).bit_count() <= self.max_distance:
+                        self.near_duplicates += 1
+                        return 'near'
+                    index = chain[index]
+            index = len(fingerprints)
+            fingerprints.append(fingerprint)
+            for heads, chain, bucket in zip(self._heads, self._chains, buckets):
+                chain.append(heads[bucket])
+                heads[bucket] = index
+            return None
+
+    def memory_bytes(self):
+        """Returns the approximate number of bytes used by the index."""
+        with self._lock:
+            return (self._exact.memory_bytes() + sys.getsizeof(self._fingerprints)
+                    + sum(sys.getsizeof(values) for values in self._heads + self._chains))
+
+    def stats(self):
+        """Returns the number of checked 'pages', of 'exact_duplicates' and 'near_duplicates', the
+        'duplicate_rate' and the 'memory_bytes' of the index."""
+        memory_bytes = self.memory_bytes()
+        with self._lock:
+            duplicates = self.exact_duplicates + self.near_duplicates
+            return {'pages': self.pages, 'exact_duplicates': self.exact_duplicates,
+                    'near_duplicates': self.near_duplicates,
+                    'duplicate_rate': duplicates / self.pages if self.pages else 0.0, 'memory_bytes': memory_bytes}
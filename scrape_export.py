@@ -0,0 +1,175 @@
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, only needed for zstd compressed exports
+    zstandard = None
+
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def open_export_file(file_path, mode, compression=None):
+    """Opens a text file for export, optionally gzip or zstd compressed.
+
+    Appending to a compressed file adds a new compressed member (gzip) or frame (zstd), which readers of
+    both formats read as one continuous stream.
+
+    Args:
+        file_path (str): The path to the file.
+        mode (str): 'r', 'w' or 'a'.
+        compression (str, optional): None, 'gzip' or 'zstd'.
+
+    Raises:
+        ValueError: If the compression is unsupported or zstandard is not installed for zstd.
+    """
+    if compression is None:
+        return open(file_path, mode, newline='', encoding='utf-8')
+    if compression == 'gzip':
+        return gzip.open(file_path, mode + 't', newline='', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        raw = open(file_path, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class ExportSink:
+    """Streams rows to a CSV or JSON Lines file as they are scraped.
+
+    Rows are buffered and written in batches, so a long crawl never holds more than one batch in memory and
+    loses at most one batch on a crash. An existing file is appended to by default, so an interrupted export
+    can be resumed. When a batch has fields that are not in the CSV header yet, the whole file is rewritten with
+    the new columns, every time a batch adds columns, so give the known columns up front with fields on large
+    exports. JSON Lines rows can have any fields. The sink is thread-safe, so crawler workers can write to it
+    directly.
+
+    Example:
+        with ExportSink('products.csv.gz', batch_size=500) as sink:
+            web_store.scrape_products('.product', sink=sink)
+            sink.write({'name': 'Extra product', 'price': 10})
+    """
+
+    def __init__(self, file_path, format=None, compression=None, batch_size=100, append=True, fields=None):
+        """
+        Initializes the sink.
+
+        Args:
+            file_path (str): The path to the output file.
+            format (str, optional): 'csv' or 'jsonl'. Defaults to the format of the file extension.
+            compression (str, optional): None, 'gzip' or 'zstd'. Defaults to the compression of the file
+                extension ('.gz' or '.zst').
+            batch_size (int, optional): The number of rows to buffer before writing. Defaults to 100.
+            append (bool, optional): Append to an existing file instead of overwriting it. Defaults to True.
+            fields (list, optional): The first CSV columns. Fields of later rows are added after them, which
+                rewrites the file if its header has already been written.
+
+        Raises:
+            ValueError: If the format or compression is unsupported.
+        """
+        name, extension = os.path.splitext(file_path)
+        if compression is None:
+            compression = COMPRESSION_EXTENSIONS.get(extension)
+        if extension in COMPRESSION_EXTENSIONS:
+            extension = os.path.splitext(name)[1]
+        if format is None:
+            format = 'jsonl' if extension in ('.jsonl', '.json', '.ndjson') else 'csv'
+        if format not in ('csv', 'jsonl'):
+            raise ValueError(f"Unsupported export format: {format}")
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self.file_path = file_path
+        self.format = format
+        self.compression = compression
+        self.batch_size = batch_size
+        self.fields = list(fields or [])
+        self.rows_written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._header_written = False
+
+        exists = append and os.path.exists(file_path) and os.path.getsize(file_path) > 0
+        if exists and format == 'csv':
+            with open_export_file(file_path, 'r', compression) as file:
+                header = next(csv.reader(file), [])
+            self.fields = header + [field for field in self.fields if field not in header]
+            self._header_written = True
+            if self.fields != header:
+                self._rewrite(header)
+        self._file = open_export_file(file_path, 'a' if exists else 'w', compression)
+
+    def write(self, row):
+        """Adds a row (a dict) to the export."""
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def write_many(self, rows):
+        """Adds all rows from a list or iterator to the export."""
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Writes all buffered rows to the file."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        if self.format == 'jsonl':
+            self._file.writelines(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in rows)
+        else:
+            new_fields = [field for row in rows for field in row if field not in self.fields]
+            if new_fields:
+                old_fields = list(self.fields)
+                self.fields.extend(dict.fromkeys(new_fields))
+                if self._header_written:
+                    self._file.close()
+                    self._rewrite(old_fields)
+                    self._file = open_export_file(self.file_path, 'a', self.compression)
+            writer = csv.DictWriter(self._file, fieldnames=self.fields, restval='')
+            if not self._header_written:
+                writer.writeheader()
+                self._header_written = True
+            writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def _rewrite(self, old_fields):
+        """Rewrites the CSV file with the current fields as header, moving every row to the new columns."""
+        temp_path = self.file_path + '.tmp'
+        with open_export_file(self.file_path, 'r', self.compression) as source, \
+                open_export_file(temp_path, 'w', self.compression) as target:
+            reader = csv.reader(source)
+            next(reader, None)
+            writer = csv.writer(target)
+            writer.writerow(self.fields)
+            padding = [''] * (len(self.fields) - len(old_fields))
+            for values in reader:
+                writer.writerow(values + padding)
+        os.replace(temp_path, self.file_path)
+
+    def close(self):
+        """Writes the remaining rows and closes the file."""
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,203 @@
+import bisect
+import json
+import threading
+import time
+
+# Upper bounds in seconds of the histogram buckets, like the Prometheus client defaults
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The stages that are timed by the scrapers and crawlers
+STAGES = ('queue', 'connect', 'ttfb', 'download', 'decode', 'parse', 'extract', 'export')
+
+
+class Histogram:
+    """Counts observations in buckets and keeps their sum, count and maximum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else 0.0,
+                'max': self.max, 'buckets': buckets}
+
+
+class MetricsRegistry:
+    """Collects counters and timing histograms, in total and per host, and calls event hooks.
+
+    The crawlers and scrapers time every stage of a fetch (see STAGES), count requests, pages, bytes, links and
+    errors, and emit events like 'fetch', 'page' and 'error' to the hooks. The registry is thread-safe and can
+    be shared by everything in a crawl.
+
+    Example:
+        metrics = MetricsRegistry()
+        metrics.add_hook(print_hook)
+        crawler = WebCrawler(transport=HttpTransport(metrics=metrics), metrics=metrics)
+        crawler.crawl('https://example.com')
+        print(metrics.to_prometheus())
+    """
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='scrape'):
+        """
+        Initializes the registry.
+
+        Args:
+            buckets (tuple, optional): The upper bounds of the histogram buckets in seconds.
+            prefix (str, optional): The prefix of the metric names in the Prometheus output. Defaults to 'scrape'.
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.hooks = []
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Adds a callback that is called as hook(event, fields) for every event."""
+        self.hooks.append(hook)
+
+    def emit(self, event, **fields):
+        """Calls every hook with an event name and its fields."""
+        for hook in self.hooks:
+            hook(event, fields)
+
+    def clock(self):
+        """Returns a start time for observe_since."""
+        return time.perf_counter()
+
+    def inc(self, name, value=1, host=None):
+        """Adds value to a counter, in total and for host."""
+        with self._lock:
+            counter = self._counters.setdefault(name, {None: 0})
+            counter[None] += value
+            if host is not None:
+                counter[host] = counter.get(host, 0) + value
+
+    def observe(self, name, seconds, host=None):
+        """Adds an observation to a histogram, in total and for host."""
+        with self._lock:
+            histograms = self._histograms.get(name)
+            if histograms is None:
+                histograms = self._histograms[name] = {None: Histogram(self.buckets)}
+            histograms[None].observe(seconds)
+            if host is not None:
+                histogram = histograms.get(host)
+                if histogram is None:
+                    histogram = histograms[host] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    def observe_since(self, name, start, host=None):
+        """Adds the seconds since start, a time from clock(), to a histogram."""
+        self.observe(name, time.perf_counter() - start, host)
+
+    def counter(self, name, host=None):
+        """Returns the value of a counter, in total or for host."""
+        with self._lock:
+            return self._counters.get(name, {}).get(host, 0)
+
+    def histogram(self, name, host=None):
+        """Returns a histogram as a dict (see to_dict), in total or for host, or None if it is empty."""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(host)
+            return histogram.to_dict() if histogram is not None else None
+
+    def to_dict(self):
+        """Returns all metrics as {'counters': {...}, 'histograms': {...}}, with a 'total' and the 'hosts' of each."""
+        with self._lock:
+            return {
+                'counters': {name: {'total': values[None],
+                                    'hosts': {host: value for host, value in values.items() if host is not None}}
+                             for name, values in self._counters.items()},
+                'histograms': {name: {'total': values[None].to_dict(),
+                                      'hosts': {host: histogram.to_dict()
+                                                for host, histogram in values.items() if host is not None}}
+                               for name, values in self._histograms.items()},
+            }
+
+    def to_json(self, indent=None):
+        """Returns all metrics as a JSON string."""
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format.
+
+        Counters are named <prefix>_<name>_total and histograms <prefix>_<name>_seconds. Per host values have a
+        host label, the totals have none.
+        """
+        lines = []
+        metrics = self.to_dict()
+        for name, values in sorted(metrics['counters'].items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {values['total']}")
+            for host, value in sorted(values['hosts'].items()):
+                lines.append(f'{metric}{{host="{_escape(host)}"}} {value}')
+        for name, values in sorted(metrics['histograms'].items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            series = [('', values['total'])]
+            series += [(f'host="{_escape(host)}",', histogram) for host, histogram in sorted(values['hosts'].items())]
+            for labels, histogram in series:
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {count}')
+                suffix = f"{{{labels.rstrip(',')}}}" if labels else ''
+                lines.append(f"{metric}_sum{suffix} {histogram['sum']}")
+                lines.append(f"{metric}_count{suffix} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class NullMetrics:
+    """A registry that does nothing, used when no metrics are collected."""
+
+    enabled = False
+    hooks = ()
+
+    def add_hook(self, hook):
+        raise ValueError("Hooks need a MetricsRegistry")
+
+    def emit(self, event, **fields):
+        pass
+
+    def clock(self):
+        return 0.0
+
+    def inc(self, name, value=1, host=None):
+        pass
+
+    def observe(self, name, seconds, host=None):
+        pass
+
+    def observe_since(self, name, start, host=None):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def print_hook(event, fields):
+    """A hook that prints the progress of a crawl, like the crawlers used to do."""
+    if event == 'fetch':
+        print(f"Crawling {fields['url']} at depth {fields['depth']}")
+    elif event == 'error':
+        print(f"Error occurred while crawling {fields['url']}: {str(fields['error'])}")
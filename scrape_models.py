@@ -1,9 +1,18 @@
-from scrape import ElementSelector
+import concurrent.futures
+
+from scrape import Document, Element, ElementSelector, Fragment, WebScraper
+from scrape_schema import Schema
 
 
 class WebPage:
-    """ Represents a web page. """
-    
+    """ Represents a web page.
+
+    The attributes every page has are kept in slots, so the many pages of a large listing take little memory.
+    Additional attributes are stored in a dict that is only created when one is set.
+    """
+
+    __slots__ = ('name', 'url', 'html_content', '__dict__')
+
     def __init__(self, name, url, html_content, **kwargs):
         """
         Initializes a WebPage object with specified attributes and any additional keyword arguments.
@@ -26,6 +35,31 @@ class WebPage:
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    def to_row(self):
+        """Returns the page as a flat dict for exporting, with the scraper, list and dict attributes left out.
+
+        Example:
+            sink.write(page.to_row())
+        """
+        row = {}
+        for key, value in self._attributes():
+            if key in ('scraper', 'detail_fields') or key.startswith('_') or isinstance(value, (list, dict)):
+                continue
+            row[key] = value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+        return row
+
+    def _attributes(self):
+        """Yields the name and value of every attribute that is set, the slots first."""
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get('__slots__', ()):
+                if name == '__dict__':
+                    continue
+                try:
+                    yield name, object.__getattribute__(self, name)
+                except AttributeError:
+                    pass
+        yield from self.__dict__.items()
+
     @staticmethod
     def pretty_print_html(html_content, indent_size=4, initial_indent=0):
         """ Pretty prints the HTML content with indentation for better readability. 
@@ -56,48 +90,201 @@ class WebPage:
         print(formatted_html)
 
 
+class ListingItem(WebPage):
+    """An item of a listing page, like an article or a product, with a detail page that is loaded lazily.
+
+    The detail page at detail_url is fetched and parsed the first time one of the detail_fields (names mapped to
+    selectors) is used before it is set, and the detail fields are set as attributes from it. Attributes that
+    are set from the listing never fetch the page, and other missing attributes raise AttributeError as usual.
+
+    Example:
+        news_site.scrape_articles('.teaser', detail_fields={'title': 'h1', 'body': '.article-body'})
+        print(news_site.articles[0].title)  # Fetches the first article page
+    """
+
+    __slots__ = ('scraper', 'detail_url', 'detail_fields', 'detail_error', '_detail', '_details_loaded')
+
+    # Attributes that parse_details sets besides the detail fields
+    _detail_attributes = ()
+
+    def __init__(self, name, url, html_content, **kwargs):
+        self.scraper = None
+        self.detail_url = None
+        self.detail_fields = None
+        self.detail_error = None
+        self._detail = None
+        self._details_loaded = False
+        super().__init__(name, url, html_content, **kwargs)
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, so only the names the detail page sets can fetch it
+        if name.startswith('_') or self._details_loaded or self.detail_url is None or \
+                (name not in (self.detail_fields or ()) and name not in self._detail_attributes):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        self.load_details()
+        return getattr(self, name)
+
+    @property
+    def details_loaded(self):
+        """Whether the detail page has been loaded."""
+        return self._details_loaded
+
+    @property
+    def detail(self):
+        """The detail page as a Document, parsed when it is used, or None without a detail_url.
+
+        Only the HTML of a loaded page is kept, not its parsed tree.
+        """
+        if self.detail_url is not None and not self._details_loaded:
+            self.load_details()
+        if self._detail is None or isinstance(self._detail, Document):
+            return self._detail
+        return Document(self._detail, url=self.detail_url)
+
+    def load_details(self, html_content=None):
+        """Fetches and parses the detail page, and sets the detail fields as attributes.
+
+        Args:
+            html_content (str or Document, optional): The detail page, if it has already been fetched.
+
+        Raises:
+            HTTPStatusError: If the detail page could not be fetched.
+        """
+        if html_content is None:
+            html_content = self.scraper.scrape(self.detail_url, 'html')
+        self._detail = html_content
+        self._details_loaded = True
+        if not isinstance(html_content, Document):
+            html_content = Document(html_content, url=self.detail_url)
+        self.parse_details(html_content)
+
+    def parse_details(self, document):
+        """Sets the text of the first match of every detail field as an attribute, or None without a match."""
+        for name, selector in (self.detail_fields or {}).items():
+            elements = ElementSelector.extract_elements(document, selector)
+            setattr(self, name, elements[0].text.strip() if elements else None)
+
+
+def load_details(items, concurrency=8):
+    """Loads the detail pages of listing items on a thread pool.
+
+    The pages are fetched over the transport of each item's scraper, so with the shared default transport
+    the connections are reused. Items that are already loaded or have no detail_url are skipped. The pages are
+    fetched whether or not the returned iterator is used.
+
+    Args:
+        items (list): The ListingItems.
+        concurrency (int, optional): The number of pages fetched at the same time. Defaults to 8.
+
+    Returns:
+        iterator: The items, in the order their pages are loaded. Items whose page failed have the error as
+            detail_error.
+    """
+    pending = [item for item in items if item.detail_url is not None and not item.details_loaded]
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    futures = {executor.submit(item.load_details): item for item in pending}
+    executor.shutdown(wait=False)
+    return _loaded(futures)
+
+
+def _loaded(futures):
+    for future in concurrent.futures.as_completed(futures):
+        item = futures[future]
+        if future.exception() is not None:
+            item.detail_error = future.exception()
+        yield item
+
+
+def _scrape_listing(site, item_class, name, selector, detail_fields, sink):
+    """Scrapes the items of a listing page and writes them to sink.
+
+    The html_content of every item is a Fragment of the page source, so the parsed page is freed when this
+    returns, and the first link of every item is its detail_url. With a Schema as selector, the fields of
+    the schema are set as attributes of the items and the typed rows of the schema are written to sink.
+    """
+    html_content = site.scraper.scrape(site.url, 'html')
+    document = Document(html_content, url=site.url)
+    if isinstance(selector, Schema):
+        elements = selector.items(document)
+        rows = [selector.extract_item(element, document.base_url) for element in elements]
+    else:
+        elements = ElementSelector.extract_elements(document, selector)
+        rows = None
+    fragments = Fragment.from_elements(html_content, document, elements)
+    items = []
+    for index, (element, fragment) in enumerate(zip(elements, fragments)):
+        links = element.links()
+        item = item_class(name=name, url=site.url, scraper=site.scraper, html_content=fragment,
+                          detail_url=links[0] if links else None, detail_fields=detail_fields)
+        if rows is not None:
+            for field, value in rows[index].items():
+                setattr(item, field, value)
+        items.append(item)
+    if sink is not None:
+        sink.write_many(rows if rows is not None else (item.to_row() for item in items))
+    return items
 
 
 class NewsSite(WebPage):
     """Represents a news site."""
 
-    def __init__(self, name, url, scraper, **kwargs):
+    __slots__ = ('scraper', 'articles')
+
+    def __init__(self, name, url, scraper=None, **kwargs):
         """
         Initialize a NewsSite object.
 
         Args:
             name (str): The name of the news site.
             url (str): The URL of the news site.
-            scraper (WebScraper): The web scraper used for scraping.
+            scraper (WebScraper, optional): The web scraper used for scraping. Defaults to a WebScraper on the
+                shared default transport.
             **kwargs: Additional user-defined attributes.
 
         Example:
             news_site = NewsSite(name='Example News Site', url='https://example.com', scraper=scraper, attr1='value1', attr2='value2')
         """
-        super().__init__(name, url, scraper, **kwargs)
+        if scraper is None:
+            scraper = WebScraper()
+        super().__init__(name, url, "", **kwargs)
         self.scraper = scraper
         self.articles = []
 
         for attr_name, attr_value in kwargs.items():
             setattr(self, attr_name, attr_value)
 
-    def scrape_articles(self, selector):
-        """Scrapes articles from the news site based on the provided selector."""
+    def scrape_articles(self, selector, sink=None, detail_fields=None):
+        """Scrapes articles from the news site based on the provided selector.
 
-        html_content = self.scraper.scrape(self.url, 'html')
-        article_elements = ElementSelector.extract_elements(html_content, selector)
-        self.articles = [Article(name="Article", url=self.url, scraper=self.scraper, html_content=element) for element
-                         in article_elements]
+        The page is parsed once, and the html_content of every Article is a Fragment of the page source.
+        If a sink (like an ExportSink) is given, every article is written to it as a row.
+        The first link of every article is its detail_url. The article page is fetched when one of the
+        detail_fields (names mapped to selectors) is first used, or for all articles with load_details.
+        The selector can also be a Schema, whose fields are extracted from every article in the same pass and
+        written to the sink as typed rows.
+        """
+        self.articles = _scrape_listing(self, Article, "Article", selector, detail_fields, sink)
 
-    def scrape_articles2(self, selector):
+    def scrape_articles2(self, selector, sink=None, detail_fields=None):
         """Scrapes articles from the news site based on the provided selector."""
-        html_content = self.scraper.scrape(self.url, 'html')
-        article_elements = ElementSelector.extract_elements(html_content, selector)
-        self.articles = [Article(name="Article", url=self.url, scraper=self.scraper, html_content=element) for element
-                         in article_elements]
+        self.articles = _scrape_listing(self, Article, "Article", selector, detail_fields, sink)
+
+    def load_details(self, concurrency=8):
+        """Fetches the pages of all articles in parallel, see load_details.
+
+        Example:
+            news_site.scrape_articles('.teaser', detail_fields={'title': 'h1'})
+            for article in news_site.load_details(concurrency=16):
+                print(article.title)
+        """
+        return load_details(self.articles, concurrency)
 
-class Article(WebPage):
+
+class Article(ListingItem):
     """Represents an article on a news site."""
+
+    __slots__ = ()
+
     def __init__(self, name, url, scraper, **kwargs):
         """
         Initialize an Article object.
@@ -122,43 +309,70 @@ class Article(WebPage):
 class WebStore(WebPage):
     """Represents a web store."""
 
-    def __init__(self, name, url, scraper, **kwargs):
+    __slots__ = ('scraper', 'products')
+
+    def __init__(self, name, url, scraper=None, **kwargs):
         """
         Initialize a WebStore object.
 
         Args:
             name (str): The name of the web store.
             url (str): The URL of the web store.
-            scraper (WebScraper): The web scraper used for scraping.
+            scraper (WebScraper, optional): The web scraper used for scraping. Defaults to a WebScraper on the
+                shared default transport.
             **kwargs: Additional user-defined attributes.
 
         Example:
             web_store = WebStore(name='Example Web Store', url='https://example.com', scraper=scraper, attr1='value1', attr2='value2')
         """
-        super().__init__(name, url, scraper, **kwargs)
+        if scraper is None:
+            scraper = WebScraper()
+        super().__init__(name, url, "", **kwargs)
         self.scraper = scraper
         self.products = []
 
         for attr_name, attr_value in kwargs.items():
             setattr(self, attr_name, attr_value)
 
-    def scrape_products(self, selector):
+    def scrape_products(self, selector, sink=None, detail_fields=None):
         """Scrapes products from the web store based on the provided selector.
 
+        The page is parsed once, and the html_content of every Product is a Fragment of the page source.
+
         Args:
-            selector (str): The CSS selector or HTML tag for the product elements.
+            selector (str or Schema): The CSS selector or HTML tag for the product elements, or a Schema whose
+                fields are set as attributes of every product.
+            sink (ExportSink, optional): A sink that every product is written to as a row, or the typed rows
+                of the schema.
+            detail_fields (dict, optional): Names mapped to selectors that are set as attributes from the
+                product page, the first link of the product. The page is fetched when a field is first used.
 
         Example:
             web_store = WebStore(name='Example Web Store', url='https://example.com', scraper=scraper)
             web_store.scrape_products(selector='.product-item')
+            # OR
+            web_store.scrape_products(Schema('.product-item', {'title': 'h2', 'price': Field('.price', type=float)}))
+        """
+        self.products = _scrape_listing(self, Product, "Product", selector, detail_fields, sink)
+
+    def load_details(self, concurrency=8):
+        """Fetches the pages of all products in parallel, see load_details.
+
+        Example:
+            web_store.scrape_products('.product-item')
+            for product in web_store.load_details(concurrency=16):
+                print(product.description)
         """
-        html_content = self.scraper.scrape(self.url, 'html')
-        product_elements = ElementSelector.extract_elements(html_content, selector)
-        self.products = [Product(name="Product", url=self.url, scraper=self.scraper, html_content=element) for element in product_elements]
+        return load_details(self.products, concurrency)
 
 
-class Product(WebPage):
+class Product(ListingItem):
     """Represents a product on a webstore."""
+
+    __slots__ = ('content', 'description')
+
+    _detail_attributes = ('description',)
+
     def __init__(self, name, url, scraper, **kwargs):
         """
         Initialize a Product object.
@@ -184,7 +398,7 @@ class Product(WebPage):
         """Scrapes the description of the product.
 
         Args:
-            html_content (str): The HTML content of the product page.
+            html_content (str, Document, Element or Fragment): The HTML content of the product page.
             selector (str, optional): The XPath selector for the description element. Defaults to
                 '//div[@class="product-description"]'.
 
@@ -194,6 +408,15 @@ class Product(WebPage):
             # OR
             product.scrape_description(html_content, selector='//div[@class="custom-description"]')
         """
+        if isinstance(html_content, Fragment):
+            html_content = html_content.element
+        elif not isinstance(html_content, Element):
+            html_content = Document(html_content, url=self.url)
         description_elements = ElementSelector.extract_elements(html_content, selector)
         if description_elements:
             self.description = ' '.join(element.text.strip() for element in description_elements)
+
+    def parse_details(self, document):
+        """Sets the detail fields and the description from the product page."""
+        super().parse_details(document)
+        self.scrape_description(document)
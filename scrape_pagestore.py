@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from requests.structures import CaseInsensitiveDict
+
+from scrape import Document, decode_html
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, bodies are gzip compressed without it
+    zstandard = None
+
+
+def content_hash(body):
+    """Returns the hex digest of a page body that the page store uses to find identical pages."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _compress(body, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(body)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _decompress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class StoredPage:
+    """A page in a PageStore. The body is decompressed the first time it is used."""
+
+    def __init__(self, url, final_url, status, headers, fetched, depth, content_hash, compression, data):
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.headers = headers
+        self.fetched = fetched
+        self.depth = depth
+        self.content_hash = content_hash
+        self.compression = compression
+        self._data = data
+        self._body = None
+
+    @property
+    def body(self):
+        """The page body as bytes."""
+        if self._body is None:
+            self._body = _decompress(self._data, self.compression)
+        return self._body
+
+    @property
+    def text(self):
+        """The page body decoded with the declared or sniffed charset, see sniff_charset."""
+        return decode_html(self.body, self.headers.get('Content-Type'))
+
+    def document(self, backend=None):
+        """Returns the page parsed as a Document, for running selectors on it offline."""
+        return Document(self.text, url=self.final_url or self.url, backend=backend)
+
+
+class PageStore:
+    """Keeps fetched pages in an indexed SQLite file, with compressed bodies.
+
+    Every page is stored with its URL, final URL, status, headers, fetch time, depth, content hash and a gzip
+    or zstd compressed body. Pages are written in batches, one transaction per batch, and looked up by URL
+    through the primary key. A store can be read without network access, for extracting data from a crawl
+    later. The store is thread-safe, so crawler workers can add pages to it directly.
+
+    Example:
+        with PageStore('crawl.db') as store:
+            WebCrawler().crawl('https://example.com', page_store=store)
+
+        with PageStore('crawl.db') as store:
+            for page in store.iter_pages():
+                print(page.url, ElementSelector.extract_elements(page.document(), 'h1'))
+    """
+
+    def __init__(self, path, compression=None, batch_size=100):
+        """
+        Opens the store, creating the file if it does not exist.
+
+        Args:
+            path (str): The path to the SQLite file, or ':memory:'.
+            compression (str, optional): 'gzip' or 'zstd'. Defaults to zstd when zstandard is installed and
+                gzip otherwise. Pages written with either can always be read.
+            batch_size (int, optional): The number of pages to buffer before writing. Defaults to 100.
+
+        Raises:
+            ValueError: If the compression is unsupported or zstandard is not installed for zstd.
+        """
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression not in ('gzip', 'zstd'):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.path = path
+        self.compression = compression
+        self.batch_size = batch_size
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY, final_url TEXT, status INTEGER, headers TEXT, fetched REAL, depth INTEGER,
+            content_hash TEXT, compression TEXT, body BLOB)''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS pages_content_hash ON pages (content_hash)')
+        self._connection.commit()
+
+    def add(self, url, body, status=200, headers=None, depth=0, final_url=None, fetched=None):
+        """Adds a page, replacing a stored page with the same URL.
+
+        Args:
+            url (str): The requested URL.
+            body (bytes or str): The page body. A str is stored UTF-8 encoded.
+            status (int, optional): The status code. Defaults to 200.
+            headers (dict, optional): The response headers.
+            depth (int, optional): The crawl depth of the page. Defaults to 0.
+            final_url (str, optional): The URL after redirects. Defaults to url.
+            fetched (float, optional): The fetch time as a Unix timestamp. Defaults to now.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        row = (url, final_url or url, status, json.dumps(dict(headers or {})), fetched or time.time(), depth,
+               content_hash(body), self.compression, _compress(body, self.compression))
+        with self._lock:
+            self._buffer[url] = row
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        """Writes the buffered pages in one transaction."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = list(self._buffer.values()), {}
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def get(self, url):
+        """Returns the StoredPage for a URL, or None."""
+        with self._lock:
+            row = self._buffer.get(url)
+            if row is None:
+                row = self._connection.execute('SELECT * FROM pages WHERE url = ?', (url,)).fetchone()
+        return self._page(row) if row is not None else None
+
+    def iter_pages(self, min_depth=None, max_depth=None):
+        """Yields the stored pages in the order they were stored, optionally within a depth range.
+
+        The pages are read in batches, so the store can be far larger than memory.
+        """
+        self.flush()
+        query = 'SELECT rowid, * FROM pages WHERE rowid > ?'
+        arguments = []
+        if min_depth is not None:
+            query += ' AND depth >= ?'
+            arguments.append(min_depth)
+        if max_depth is not None:
+            query += ' AND depth <= ?'
+            arguments.append(max_depth)
+        query += ' ORDER BY rowid LIMIT 256'
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(query, [last] + arguments).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._page(row[1:])
+            last = rows[-1][0]
+
+    def urls(self):
+        """Returns the URLs of all stored pages."""
+        self.flush()
+        with self._lock:
+            return [url for url, in self._connection.execute('SELECT url FROM pages ORDER BY rowid')]
+
+    @staticmethod
+    def _page(row):
+        url, final_url, status, headers, fetched, depth, digest, compression, data = row
+        return StoredPage(url, final_url, status, CaseInsensitiveDict(json.loads(headers)), fetched, depth, digest,
+                          compression, data)
+
+    def __contains__(self, url):
+        with self._lock:
+            if url in self._buffer:
+                return True
+            return self._connection.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def close(self):
+        """Writes the remaining pages and closes the file."""
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,308 @@
+import re
+import threading
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import HTMLTranslator
+except ImportError:  # lxml and cssselect are optional, the lxml backend is only available with both
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional
+    LexborHTMLParser = None
+
+_XPATH_STEP = re.compile(r'(//|/)([\w*-]+)((?:\[[^\]]*\])*)')
+_XPATH_PREDICATE = re.compile(
+    r'\[\s*(?:@([\w-]+)\s*(?:=\s*(["\'])(.*?)\2)?|contains\(\s*@([\w-]+)\s*,\s*(["\'])(.*?)\5\s*\))\s*\]')
+_TEXT_SKIP_TAGS = ('script', 'style')
+
+
+def simple_xpath_to_css(selector):
+    """Translates a simple XPath selector into a CSS selector, for backends without an XPath engine.
+
+    Supports steps like //tag and /tag with [@attr], [@attr="value"] and [contains(@attr, "value")] predicates,
+    and selectors relative to the element they are run on: './/tag' for any tag below it, and './tag' for a child,
+    which becomes ':scope > tag'.
+
+    Raises:
+        ValueError: If the selector uses XPath features outside that subset.
+    """
+    css = []
+    position = 0
+    if selector.startswith('./'):
+        position = 1
+        if not selector.startswith('.//'):
+            css.append(':scope')
+    for step in _XPATH_STEP.finditer(selector):
+        if step.start() != position:
+            break
+        position = step.end()
+        axis, tag, predicates = step.groups()
+        if css:
+            css.append(' ' if axis == '//' else ' > ')
+        css.append(tag)
+        predicate_position = 0
+        for predicate in _XPATH_PREDICATE.finditer(predicates):
+            if predicate.start() != predicate_position:
+                break
+            predicate_position = predicate.end()
+            attr, _, value, contains_attr, _, contains_value = predicate.groups()
+            if contains_attr:
+                css.append(f'[{contains_attr}*="{contains_value}"]')
+            elif value is not None:
+                css.append(f'[{attr}="{value}"]')
+            else:
+                css.append(f'[{attr}]')
+        if predicate_position != len(predicates):
+            position = -1
+            break
+    if not css or position != len(selector):
+        raise ValueError(f"XPath selector needs the lxml backend: {selector}")
+    return ''.join(css)
+
+
+class SoupBackend:
+    """Parses HTML with BeautifulSoup and the pure-Python html.parser. Always available."""
+
+    name = 'soup'
+    real_xpath = False
+    source_line_limit = None
+
+    def parse(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def compile(self, kind, selector):
+        if kind == 'tag':
+            return lambda node: node.find_all(selector)
+        if kind == 'xpath':
+            selector = simple_xpath_to_css(selector)
+        return soupsieve.compile(selector).select
+
+    def tag_name(self, node):
+        return node.name
+
+    def text(self, node):
+        return node.get_text(strip=True)
+
+    def attr(self, node, name):
+        value = node.get(name)
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def html(self, node):
+        return str(node)
+
+    def hrefs(self, node):
+        return [tag['href'] for tag in node.find_all('a', href=True)]
+
+    def base_href(self, root):
+        base = root.find('base', href=True)
+        return base['href'] if base else None
+
+    def filter_by_attribute(self, node, attr_name, attr_value):
+        tags = node.find_all(attrs={attr_name: attr_value})
+        value = node.get(attr_name)
+        if value == attr_value or (isinstance(value, list) and attr_value in value):
+            tags.insert(0, node)
+        return tags
+
+    def node_id(self, node):
+        return id(node)
+
+    def source_positions(self, root, nodes):
+        # html.parser records the line and column of every start tag
+        return [(node.sourceline, node.sourcepos, None) if node.sourceline is not None else None for node in nodes]
+
+
+class _ThreadLocalXPath:
+    """A compiled XPath expression with one lxml evaluator per thread, so it can be shared between threads."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self._local = threading.local()
+        self._local.xpath = etree.XPath(expression)
+
+    def __call__(self, node):
+        xpath = getattr(self._local, 'xpath', None)
+        if xpath is None:
+            xpath = self._local.xpath = etree.XPath(self.expression)
+        return xpath(node)
+
+
+class LxmlBackend:
+    """Parses HTML with lxml's C parser, with a real XPath 1.0 engine and CSS selectors from cssselect."""
+
+    name = 'lxml'
+    real_xpath = True
+    # libxml2 stops counting lines here, later elements are all reported on this line
+    source_line_limit = 65535
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def parse(self, html):
+        if isinstance(html, bytes):
+            # libxml2 reads bytes without a declared charset as Latin-1, so they are decoded like fetched pages
+            from scrape import decode_html  # scrape imports this module
+            html = decode_html(html)
+        if not html or not html.strip():
+            html = '<html></html>'
+        try:
+            try:
+                return lxml.html.document_fromstring(html)
+            except ValueError:
+                # Unicode strings with an encoding declaration must be parsed from bytes, which are UTF-8 here
+                return lxml.html.document_fromstring(html.encode('utf-8'), parser=self._utf8_parser())
+        except etree.ParserError:
+            # A page with only a comment or a doctype has no elements
+            return lxml.html.document_fromstring('<html></html>')
+
+    def _utf8_parser(self):
+        # Parsers must not be used by two threads at once
+        parser = getattr(self._local, 'utf8_parser', None)
+        if parser is None:
+            parser = self._local.utf8_parser = lxml.html.HTMLParser(encoding='utf-8')
+        return parser
+
+    def compile(self, kind, selector):
+        if kind == 'tag':
+            return lambda node: list(node.iterdescendants(selector))
+        if kind == 'css':
+            selector = HTMLTranslator().css_to_xpath(selector, prefix='descendant::')
+        return _ThreadLocalXPath(selector)
+
+    def tag_name(self, node):
+        return node.tag
+
+    def text(self, node):
+        return ''.join(text.strip() for text in node.xpath('.//text()[not(ancestor::script|ancestor::style)]'))
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def html(self, node):
+        return lxml.html.tostring(node, encoding='unicode', with_tail=False)
+
+    def hrefs(self, node):
+        return node.xpath('.//a/@href')
+
+    def base_href(self, root):
+        hrefs = root.xpath('//base/@href')
+        return hrefs[0] if hrefs else None
+
+    def filter_by_attribute(self, node, attr_name, attr_value):
+        return [element for element in node.iter(etree.Element)
+                if element.get(attr_name) is not None
+                and (element.get(attr_name) == attr_value or attr_value in element.get(attr_name).split())]
+
+    def node_id(self, node):
+        return id(node)
+
+    def source_positions(self, root, nodes):
+        # libxml2 only records the line of an element, so it is found by how many elements with the same tag
+        # start before it on that line (or after source_line_limit, where libxml2 stops counting)
+        indexes = {}
+        for tag in {node.tag for node in nodes}:
+            counts = {}
+            for node in root.iter(tag):
+                indexes[node] = counts.get(node.sourceline, 0)
+                counts[node.sourceline] = indexes[node] + 1
+        return [(node.sourceline, None, indexes[node]) if node.sourceline is not None else None for node in nodes]
+
+
+class SelectolaxBackend:
+    """Parses HTML with selectolax's Lexbor engine, the fastest backend for CSS selectors.
+
+    Lexbor has no XPath engine, so XPath selectors are limited to the subset simple_xpath_to_css understands,
+    without the ':scope' of './tag' selectors.
+    """
+
+    name = 'selectolax'
+    real_xpath = False
+    source_line_limit = None
+
+    def parse(self, html):
+        if isinstance(html, bytes):
+            # Lexbor ignores a <meta charset>, so bytes are decoded like fetched pages
+            from scrape import decode_html  # scrape imports this module
+            html = decode_html(html)
+        return LexborHTMLParser(html).root
+
+    def compile(self, kind, selector):
+        if kind == 'xpath':
+            css = simple_xpath_to_css(selector)
+            if css.startswith(':scope'):
+                raise ValueError(f"XPath selector with a child step needs the lxml or soup backend: {selector}")
+            selector = css
+
+        def select(node):
+            node_id = node.mem_id
+            return [element for element in node.css(selector) if element.mem_id != node_id]
+        return select
+
+    def tag_name(self, node):
+        return node.tag
+
+    def text(self, node):
+        return ''.join(child.text_content.strip() for child in node.traverse(include_text=True)
+                       if child.tag == '-text' and child.parent.tag not in _TEXT_SKIP_TAGS)
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+    def html(self, node):
+        return node.html
+
+    def hrefs(self, node):
+        return [element.attributes['href'] for element in node.css('a[href]')]
+
+    def base_href(self, root):
+        base = root.css_first('base[href]')
+        return base.attributes['href'] if base else None
+
+    def filter_by_attribute(self, node, attr_name, attr_value):
+        return [element for element in node.traverse()
+                if element.attributes.get(attr_name) is not None
+                and (element.attributes[attr_name] == attr_value or attr_value in element.attributes[attr_name].split())]
+
+    def node_id(self, node):
+        return node.mem_id
+
+    def source_positions(self, root, nodes):
+        # Lexbor does not record where in the source an element starts
+        return [None] * len(nodes)
+
+
+BACKENDS = {'soup': SoupBackend()}
+if lxml is not None:
+    BACKENDS['lxml'] = LxmlBackend()
+if LexborHTMLParser is not None:
+    BACKENDS['selectolax'] = SelectolaxBackend()
+
+_default_backend = BACKENDS.get('lxml') or BACKENDS.get('selectolax') or BACKENDS['soup']
+
+
+def get_backend(name=None):
+    """Returns a parser backend by name, or the default backend if no name is given.
+
+    The default is the fastest installed backend that is available: lxml (with cssselect), then
+    selectolax, then BeautifulSoup's html.parser.
+
+    Raises:
+        ValueError: If the backend is unknown or its package is not installed.
+    """
+    if name is None:
+        return _default_backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unsupported or not installed parser backend: {name}")
+    return BACKENDS[name]
+
+
+def set_default_backend(name):
+    """Sets the parser backend used when none is given, by name ('lxml', 'selectolax' or 'soup')."""
+    global _default_backend
+    _default_backend = get_backend(name)
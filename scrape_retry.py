@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from scrape_throttle import parse_retry_after
+
+
+class HTTPStatusError(Exception):
+    """Raised when a request fails with a non-200 status code."""
+
+    def __init__(self, url, status_code):
+        super().__init__(f"Request failed: status code {status_code}")
+        self.url = url
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f} seconds")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Decides if and when a failed GET request is sent again.
+
+    Connection errors, timeouts and the status codes in retry_statuses are retried, up to max_retries times,
+    after an exponential backoff of backoff * 2 ** attempt seconds. With jitter the delay is drawn uniformly
+    between 0 and the backoff, so clients that failed together do not retry together. A Retry-After header
+    sets the minimum delay. The policy is thread-safe and counts the retries of everything that uses it.
+
+    Example:
+        scraper = Scraper(retry=RetryPolicy(max_retries=5, backoff=1))
+        scraper.scrape('https://example.com', 'html')
+        print(scraper.retry.stats())
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        """
+        Initializes the policy.
+
+        Args:
+            max_retries (int, optional): The maximum number of retries of a request. Defaults to 3.
+            backoff (float, optional): The delay before the first retry in seconds, doubled for every retry.
+                Defaults to 0.5.
+            max_backoff (float, optional): The longest delay in seconds, also for Retry-After. Defaults to 30.
+            jitter (bool, optional): Randomize the delays. Defaults to True.
+            retry_statuses (tuple, optional): The status codes that are retried. Defaults to 429, 500, 502, 503
+                and 504.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def is_retryable(self, status=None, error=None):
+        """Returns whether a response status or request error may be retried."""
+        if error is not None:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        return status in self.retry_statuses
+
+    def next_delay(self, attempt, status=None, retry_after=None, error=None):
+        """Returns the number of seconds to wait before retrying a failed request, or None to give up.
+
+        Args:
+            attempt (int): The number of retries of the request so far.
+            status (int, optional): The status code of the failed response.
+            retry_after (str, optional): The Retry-After header of the failed response.
+            error (Exception, optional): The error the request failed with.
+        """
+        if not self.is_retryable(status, error):
+            return None
+        with self._lock:
+            if attempt >= self.max_retries:
+                self.exhausted += 1
+                return None
+            self.retries += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_delay = parse_retry_after(retry_after)
+        if retry_delay is not None:
+            delay = max(delay, min(retry_delay, self.max_backoff))
+        return delay
+
+    def stats(self):
+        """Returns the number of 'retries' sent and of requests that failed after all retries ('exhausted')."""
+        with self._lock:
+            return {'retries': self.retries, 'exhausted': self.exhausted}
+
+
+class CircuitBreaker:
+    """Stops sending requests to a host after repeated failures.
+
+    Every host has a circuit that is closed while requests succeed. After failure_threshold failures in a row
+    it opens, and requests to the host fail at once with CircuitOpenError instead of taking up a worker for
+    the full timeout. After reset_timeout seconds the circuit is half-open: one trial request is let through,
+    which closes the circuit when it succeeds and opens it again when it fails.
+
+    Example:
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        crawler = WebCrawler(breaker=breaker)
+        crawler.crawl('https://example.com')
+        print(breaker.stats())
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Initializes the breaker.
+
+        Args:
+            failure_threshold (int, optional): The number of failures in a row that opens a circuit. Defaults to 5.
+            reset_timeout (float, optional): The number of seconds a circuit stays open. Defaults to 30.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.opened = 0
+        self.rejected = 0
+        self._failures = {}
+        self._opened_at = {}
+        self._trial = set()
+        self._lock = threading.Lock()
+
+    def allow(self, url):
+        """Checks that a request to the host of url may be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit of the host is open, or half-open with a trial request in flight.
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            retry_in = opened_at + self.reset_timeout - time.monotonic()
+            if retry_in <= 0 and host not in self._trial:
+                self._trial.add(host)
+                return
+            self.rejected += 1
+        raise CircuitOpenError(host, max(0.0, retry_in))
+
+    def record_success(self, url):
+        """Closes the circuit of the host of url."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial.discard(host)
+
+    def record_failure(self, url):
+        """Counts a failure of the host of url, opening its circuit at the threshold or after a failed trial."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._trial or (host not in self._opened_at and failures >= self.failure_threshold):
+                self._trial.discard(host)
+                self._opened_at[host] = time.monotonic()
+                self.opened += 1
+
+    def state(self, url):
+        """Returns 'closed', 'open' or 'half-open' for the host of url."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            return self._state(host)
+
+    def _state(self, host):
+        opened_at = self._opened_at.get(host)
+        if opened_at is None:
+            return 'closed'
+        if host in self._trial or time.monotonic() - opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def stats(self):
+        """Returns how often circuits were 'opened', how many requests were 'rejected' and the state of
+        every host with an open or half-open circuit ('hosts')."""
+        with self._lock:
+            return {'opened': self.opened, 'rejected': self.rejected,
+                    'hosts': {host: self._state(host) for host in self._opened_at}}
@@ -0,0 +1,167 @@
+import re
+from urllib.parse import urljoin
+
+from scrape import Document, Element, ElementSelector
+
+# The first number in a text, with thousands separators and a decimal comma or point
+_NUMBER = re.compile(r'[-+]?\d[\d\s.,\u00a0\u202f]*')
+_FALSE = frozenset(('', '0', 'false', 'no', 'off'))
+
+
+def _number(text):
+    """Returns the first number in a text as a float, like 1299.0 for '1 299,00 kr'."""
+    match = _NUMBER.search(text)
+    if match is None:
+        raise ValueError(f"No number in {text!r}")
+    number = re.sub(r'[\s\u00a0\u202f]', '', match.group()).rstrip('.,')
+    if ',' in number and '.' in number:
+        # The separator that comes last is the decimal separator
+        thousands = ',' if number.rfind('.') > number.rfind(',') else '.'
+        number = number.replace(thousands, '').replace(',', '.')
+    elif ',' in number:
+        whole, _, decimals = number.rpartition(',')
+        number = number.replace(',', '') if len(decimals) == 3 else whole.replace(',', '') + '.' + decimals
+    return float(number)
+
+
+def _coerce(value, type, base_url):
+    if type is str:
+        return value
+    if type is int:
+        return int(_number(value))
+    if type is float:
+        return _number(value)
+    if type is bool:
+        return value.strip().lower() not in _FALSE
+    if type == 'url':
+        return urljoin(base_url or '', value.strip())
+    return type(value)
+
+
+class Field:
+    """A field of an extraction Schema: where the value is found in an item and what type it has."""
+
+    def __init__(self, selector=None, attr=None, type=str, default=None, many=False):
+        """
+        Initializes the field.
+
+        Args:
+            selector (str, optional): A CSS selector, an HTML tag like '<h2>' or a relative XPath selector like
+                './/h2', matched below the item. Without lxml, XPath is limited to what simple_xpath_to_css
+                translates, and './h2' child steps also need the soup backend. Defaults to the item element itself.
+            attr (str, optional): The attribute to take the value from. Defaults to the text of the element,
+                and 'html' takes its HTML.
+            type (type, str or callable, optional): str, int, float, bool, 'url' for an absolute URL, or a
+                callable that converts the text. int and float take the first number in the text, so
+                '1 299,00 kr' becomes 1299. Defaults to str.
+            default (optional): The value when nothing matches or the conversion fails. Defaults to None.
+            many (bool, optional): Return a list with the value of every matching element. Defaults to False.
+
+        Example:
+            Field('.price', type=float)
+            Field('a', attr='href', type='url')
+            Field('.tags li', many=True)
+        """
+        self.selector = selector
+        self.attr = attr
+        self.type = type
+        self.default = default
+        self.many = many
+        self._selector = ElementSelector.compile(selector) if selector is not None else None
+
+    @staticmethod
+    def parse(spec):
+        """Returns a Field from a 'selector' or 'selector@attribute' string, or a Field unchanged.
+
+        Example:
+            Field.parse('h2')  # The text of the first <h2>
+            Field.parse('a@href')  # The href attribute of the first <a>
+            Field.parse('@data-id')  # The data-id attribute of the item itself
+        """
+        if isinstance(spec, Field):
+            return spec
+        if '@' not in spec or spec.startswith(('//', './')):
+            return Field(spec)
+        selector, _, attr = spec.rpartition('@')
+        return Field(selector or None, attr)
+
+    def value(self, element, base_url=None):
+        """Returns the typed value of the field for an item element."""
+        elements = self._selector.select(element) if self._selector is not None else [element]
+        values = []
+        for match in elements:
+            if isinstance(match, str):
+                raw = match
+            elif self.attr is None:
+                raw = match.text
+            elif self.attr == 'html':
+                raw = match.html
+            else:
+                raw = match.attr(self.attr, None)
+            if raw is None:
+                continue
+            try:
+                values.append(_coerce(raw, self.type, base_url))
+            except (TypeError, ValueError):
+                continue
+            if not self.many:
+                break
+        if self.many:
+            return values
+        return values[0] if values else self.default
+
+
+class Schema:
+    """A declarative description of the items on a page and the fields to extract from each of them.
+
+    The selectors are compiled once. A page is parsed once, the item containers are found in one pass over
+    it, and the field selectors only search below their item, so no field walks the whole page. Every item
+    becomes a typed row that can be written to an ExportSink as it is.
+
+    Example:
+        schema = Schema('.product-item', {
+            'title': 'h2',
+            'price': Field('.price', type=float),
+            'link': Field('a', attr='href', type='url'),
+            'id': Field(attr='data-id', type=int),
+        })
+        rows = schema.extract(web_scraper.scrape('https://example.com', 'html'), url='https://example.com')
+        # Or with a WebStore:
+        web_store.scrape_products(schema, sink=sink)
+    """
+
+    def __init__(self, container, fields, backend=None):
+        """
+        Compiles the schema.
+
+        Args:
+            container (str): The selector of the item elements.
+            fields (dict): Field names mapped to a Field, or to a 'selector' or 'selector@attribute' string.
+            backend (str, optional): The parser backend to compile for. Defaults to the default backend.
+        """
+        self.container = container
+        self.fields = {name: Field.parse(spec) for name, spec in fields.items()}
+        self.backend = backend
+        self._container = ElementSelector.compile(container, backend)
+
+    def items(self, document):
+        """Returns the item elements of a parsed Document."""
+        return self._container.select(document)
+
+    def extract_item(self, element, base_url=None):
+        """Returns the row of one item element."""
+        return {name: field.value(element, base_url) for name, field in self.fields.items()}
+
+    def extract(self, html, url=None):
+        """Extracts the rows of all items on a page.
+
+        Args:
+            html (str, bytes, Document or Element): The page, or an already parsed Document.
+            url (str, optional): The URL of the page, used for 'url' fields.
+
+        Returns:
+            list: A dict per item, with the fields in the order of the schema.
+        """
+        document = html if isinstance(html, Element) else Document(html, url=url, backend=self.backend)
+        base_url = document.document.base_url or url
+        return [self.extract_item(element, base_url) for element in self.items(document)]
@@ -0,0 +1,186 @@
+import fnmatch
+import functools
+import re
+
+# The extensions of files that are not web pages, lowercase and with the dot
+BINARY_EXTENSIONS = frozenset((
+    '.7z', '.apk', '.avi', '.bin', '.bmp', '.bz2', '.deb', '.dmg', '.doc', '.docx', '.eot', '.epub', '.exe',
+    '.flac', '.flv', '.gif', '.gz', '.ico', '.iso', '.jar', '.jpeg', '.jpg', '.m4a', '.m4v', '.mkv', '.mov',
+    '.mp3', '.mp4', '.mpeg', '.msi', '.ogg', '.otf', '.pdf', '.png', '.ppt', '.pptx', '.rar', '.rpm', '.svg',
+    '.tar', '.tgz', '.tif', '.tiff', '.ttf', '.wav', '.webm', '.webp', '.wmv', '.woff', '.woff2', '.xls',
+    '.xlsx', '.xz', '.zip',
+))
+
+_ORIGIN = r'[^:/?#]+://[^/?#]*'
+# The scheme and the host of a URL, without the user info and port, faster than urlsplit for this
+_SCHEME_HOST = re.compile(r'(?:([^:/?#]*):)?(?://(?:[^@/?#]*@)?(\[[^\]/?#]*\]|[^:/?#]*))?')
+_ALLOW = 'allow'
+_DENY = 'deny'
+# Backreferences, conditionals and named groups in a user pattern, which would refer to the wrong group or clash
+# with the groups of other patterns inside the combined regex. An escaped backslash before a digit also matches,
+# which only costs that pattern a regex of its own.
+_GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?\(')
+
+
+class _DomainTrie:
+    """A trie of domain labels from the top-level domain down, so a host is matched against every rule in the
+    number of its labels. A rule for a domain also matches its subdomains, and the most specific rule wins."""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, domain, rule):
+        node = self.root
+        for label in reversed(domain.lower().lstrip('*').strip('.').split('.')):
+            node = node.setdefault(label, {})
+        node[''] = rule
+
+    def match(self, host):
+        """Returns the rule of the most specific domain that host is in, or None."""
+        node = self.root
+        rule = None
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            rule = node.get('', rule)
+        return rule
+
+
+def _rule_pattern(paths=(), patterns=(), globs=(), extensions=()):
+    """Returns the alternatives of a combined regex that matches a whole URL from its start."""
+    alternatives = []
+    if paths:
+        alternatives.append(_ORIGIN + '(?:' + '|'.join(re.escape(path) for path in paths) + ')')
+    if patterns:
+        alternatives.append('.*?(?:' + '|'.join(f'(?:{pattern})' for pattern in patterns) + ')')
+    alternatives += [fnmatch.translate(glob) for glob in globs]
+    if extensions:
+        names = '|'.join(re.escape(extension.lstrip('.')) for extension in sorted(extensions))
+        alternatives.append(rf'{_ORIGIN}/[^?#]*\.(?i:{names})(?=[?#]|\Z)')
+    return '|'.join(alternatives)
+
+
+def _split_patterns(patterns):
+    """Returns the patterns that can go into the combined regex, and the compiled patterns that refer to their
+    own groups and are searched for on their own."""
+    combined, separate = [], []
+    for pattern in patterns or ():
+        if _GROUP_REFERENCE.search(pattern):
+            separate.append(re.compile(pattern, re.DOTALL))
+        else:
+            combined.append(pattern)
+    return combined, separate
+
+
+class CrawlScope:
+    """The rules that decide which discovered links a crawl follows.
+
+    The rules are compiled once: the allowed and denied domains into a trie of domain labels, and the path
+    prefixes, regular expressions, globs and skipped extensions into one combined regex, so checking a link
+    costs a URL split, a cached trie lookup and a single regex match however many rules there are. Regular
+    expressions with backreferences or named groups, like r'/(\d+)/\1', are the exception: their group numbers
+    would shift inside the combined regex, so each of them is searched for on its own. Deny rules win over allow
+    rules, and when there are allow rules a link has to match one of them.
+
+    A scope is called with each URL and returns the URL to crawl, with the stripped query parameters removed,
+    or None for links that are out of scope, so it can be used as the url_filter of a CrawlFrontier.
+
+    Example:
+        scope = CrawlScope(allow_domains=['example.com'], deny_domains=['ads.example.com'],
+                           deny_paths=['/login', '/cart'], deny_globs=['*/print/*'],
+                           strip_params=['utm_*', 'sessionid'], max_pages_per_host=10000)
+        crawler.crawl('https://example.com', scope=scope)
+    """
+
+    def __init__(self, allow_domains=None, deny_domains=None, allow_paths=None, deny_paths=None,
+                 allow_patterns=None, deny_patterns=None, allow_globs=None, deny_globs=None, strip_params=None,
+                 max_pages_per_host=None, skip_extensions=BINARY_EXTENSIONS, schemes=('http', 'https')):
+        """
+        Compiles the scope.
+
+        Args:
+            allow_domains (list, optional): The domains to crawl, each with its subdomains, like 'example.com'.
+                Defaults to all domains.
+            deny_domains (list, optional): Domains that are never crawled, with their subdomains. A more specific
+                domain overrides the rule of its parent, so 'shop.example.com' can be allowed inside a denied
+                'example.com' and the other way around.
+            allow_paths (list, optional): Path prefixes to crawl, like '/blog/'.
+            deny_paths (list, optional): Path prefixes that are never crawled.
+            allow_patterns (list, optional): Regular expressions searched for in the URL, links have to match one.
+            deny_patterns (list, optional): Regular expressions searched for in the URL of links to skip.
+            allow_globs (list, optional): Glob patterns matched against the whole URL, like '*/2024/*'.
+            deny_globs (list, optional): Glob patterns of URLs to skip.
+            strip_params (list or bool, optional): Names or glob patterns of query parameters to remove, like
+                'utm_*', or True to remove the whole query. Defaults to keeping the query.
+            max_pages_per_host (int, optional): The most URLs admitted per host. Defaults to no limit.
+            skip_extensions (frozenset, optional): Path extensions of links to skip. Defaults to
+                BINARY_EXTENSIONS.
+            schemes (tuple, optional): The URL schemes to crawl. Defaults to ('http', 'https'), which skips
+                links like mailto: and javascript:.
+        """
+        self.max_pages_per_host = max_pages_per_host
+        self.schemes = frozenset(schemes) if schemes is not None else None
+        self._domains = None
+        self._allow_all_domains = not allow_domains
+        if allow_domains or deny_domains:
+            self._domains = _DomainTrie()
+            for domain in allow_domains or ():
+                self._domains.add(domain, _ALLOW)
+            for domain in deny_domains or ():
+                self._domains.add(domain, _DENY)
+        self._host_allowed = functools.lru_cache(maxsize=65536)(self._match_host)
+
+        deny_patterns, self._deny_patterns = _split_patterns(deny_patterns)
+        allow_patterns, self._allow_patterns = _split_patterns(allow_patterns)
+        deny = _rule_pattern(deny_paths or (), deny_patterns, deny_globs or (), skip_extensions or ())
+        allow = _rule_pattern(allow_paths or (), allow_patterns, allow_globs or ())
+        self._require_allow = bool(allow or self._allow_patterns)
+        # The deny group comes first, so a URL that matches both kinds of rules matches as denied
+        self._rules = None
+        if deny or allow:
+            self._rules = re.compile(f'(?P<{_DENY}>{deny or "(?!)"})|(?P<{_ALLOW}>{allow or "(?!)"})', re.DOTALL)
+
+        self._strip_query = strip_params is True
+        self._strip_params = None
+        if strip_params and strip_params is not True:
+            self._strip_params = re.compile('|'.join(fnmatch.translate(name) for name in strip_params))
+
+    def _match_host(self, host):
+        if self._domains is None:
+            return True
+        rule = self._domains.match(host)
+        return rule == _ALLOW or (rule is None and self._allow_all_domains)
+
+    def _strip(self, url):
+        url, hash_sign, fragment = url.partition('#')
+        url, _, query = url.partition('?')
+        if not self._strip_query:
+            params = [param for param in query.split('&')
+                      if param and not self._strip_params.match(param.partition('=')[0])]
+            if params:
+                url += '?' + '&'.join(params)
+        return url + hash_sign + fragment
+
+    def filter(self, url):
+        """Returns the URL to crawl for a link, with the stripped query parameters removed, or None if the link is
+        out of scope. The page limit per host is not checked here, it is applied by the CrawlFrontier."""
+        if self.schemes is not None or self._domains is not None:
+            scheme, host = _SCHEME_HOST.match(url).groups()
+            if self.schemes is not None and (scheme or '').lower() not in self.schemes:
+                return None
+            if self._domains is not None and not self._host_allowed((host or '').strip('[]').lower()):
+                return None
+        if (self._strip_query or self._strip_params is not None) and '?' in url:
+            url = self._strip(url)
+        match = self._rules.match(url) if self._rules is not None else None
+        if match is not None and match.group(_DENY) is not None:
+            return None
+        if self._deny_patterns and any(pattern.search(url) for pattern in self._deny_patterns):
+            return None
+        if self._require_allow and match is None and not any(pattern.search(url) for pattern in self._allow_patterns):
+            return None
+        return url
+
+    def __call__(self, url):
+        return self.filter(url)
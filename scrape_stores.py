@@ -0,0 +1,235 @@
+import hashlib
+import math
+import sys
+from array import array
+
+
+def url_fingerprint(url):
+    """Returns a 64-bit fingerprint of a URL."""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class ExactVisitedStore:
+    """Stores visited URLs as strings in a set. Exact, but uses the most memory per URL."""
+
+    def __init__(self):
+        self.urls = set()
+        self._string_bytes = 0
+
+    def add(self, url):
+        """Adds a URL to the store.
+
+        Returns:
+            bool: True if the URL was not in the store before.
+        """
+        if url in self.urls:
+            return False
+        self.urls.add(url)
+        self._string_bytes += sys.getsizeof(url)
+        return True
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def memory_bytes(self):
+        """Returns the approximate number of bytes used by the store."""
+        return sys.getsizeof(self.urls) + self._string_bytes
+
+    def bytes_per_entry(self):
+        """Returns the approximate number of bytes used per stored URL."""
+        return self.memory_bytes() / max(len(self), 1)
+
+
+class FingerprintVisitedStore:
+    """Stores 64-bit URL fingerprints in an open-addressing hash table backed by an array.
+
+    Uses about 16-32 bytes per URL. Two different URLs share a fingerprint with a probability of
+    about n / 2**64, which is negligible even for billions of URLs.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initializes the store.
+
+        Args:
+            capacity (int, optional): The number of URLs to allocate room for up front. Defaults to 1024.
+        """
+        slots = 8
+        while slots < capacity * 2:
+            slots *= 2
+        self._slots = array('Q', bytes(8 * slots))
+        self._mask = slots - 1
+        self._count = 0
+
+    def add(self, url):
+        """Adds a URL to the store.
+
+        Returns:
+            bool: True if the URL was not in the store before.
+        """
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fingerprint):
+        """Adds a 64-bit fingerprint to the store, so it can also hold fingerprints of other things than URLs.
+
+        Returns:
+            bool: True if the fingerprint was not in the store before.
+        """
+        fingerprint = fingerprint or 1
+        slots, mask = self._slots, self._mask
+        index = fingerprint & mask
+        while slots[index]:
+            if slots[index] == fingerprint:
+                return False
+            index = (index + 1) & mask
+        slots[index] = fingerprint
+        self._count += 1
+        if self._count * 2 > len(slots):
+            self._grow()
+        return True
+
+    def __contains__(self, url):
+        fingerprint = url_fingerprint(url) or 1
+        slots, mask = self._slots, self._mask
+        index = fingerprint & mask
+        while slots[index]:
+            if slots[index] == fingerprint:
+                return True
+            index = (index + 1) & mask
+        return False
+
+    def _grow(self):
+        old_slots = self._slots
+        self._slots = array('Q', bytes(16 * len(old_slots)))
+        self._mask = len(self._slots) - 1
+        slots, mask = self._slots, self._mask
+        for fingerprint in old_slots:
+            if fingerprint:
+                index = fingerprint & mask
+                while slots[index]:
+                    index = (index + 1) & mask
+                slots[index] = fingerprint
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        """Returns the approximate number of bytes used by the store."""
+        return sys.getsizeof(self._slots)
+
+    def bytes_per_entry(self):
+        """Returns the approximate number of bytes used per stored URL."""
+        return self.memory_bytes() / max(len(self), 1)
+
+
+class _BloomFilter:
+    """A fixed-size Bloom filter using double hashing of a 128-bit BLAKE2 digest."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        bits = self.bits
+        for position in self._positions(url):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, url):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(url))
+
+
+class BloomVisitedStore:
+    """Stores visited URLs in a scalable Bloom filter.
+
+    Uses a few bits per URL, at the cost of treating a small fraction of new URLs as already
+    visited. When the filter is full, a new filter twice the size with a tighter error rate is
+    added, so the overall false positive rate stays below error_rate however many URLs are added.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        """
+        Initializes the store.
+
+        Args:
+            capacity (int, optional): The number of URLs the first filter is sized for. Defaults to 1000000.
+            error_rate (float, optional): The target false positive rate. Defaults to 0.001.
+
+        Raises:
+            ValueError: If error_rate is not between 0 and 1.
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.error_rate = error_rate
+        self._filters = [_BloomFilter(capacity, error_rate / 2)]
+        self._count = 0
+
+    def add(self, url):
+        """Adds a URL to the store.
+
+        Returns:
+            bool: True if the URL was (probably) not in the store before.
+        """
+        if url in self:
+            return False
+        bloom_filter = self._filters[-1]
+        if bloom_filter.count >= bloom_filter.capacity:
+            bloom_filter = _BloomFilter(bloom_filter.capacity * 2, bloom_filter.error_rate / 2)
+            self._filters.append(bloom_filter)
+        bloom_filter.add(url)
+        self._count += 1
+        return True
+
+    def __contains__(self, url):
+        return any(url in bloom_filter for bloom_filter in self._filters)
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        """Returns the approximate number of bytes used by the store."""
+        return sum(sys.getsizeof(bloom_filter.bits) for bloom_filter in self._filters)
+
+    def bytes_per_entry(self):
+        """Returns the approximate number of bytes used per stored URL."""
+        return self.memory_bytes() / max(len(self), 1)
+
+
+VISITED_STORES = {
+    'exact': ExactVisitedStore,
+    'fingerprint': FingerprintVisitedStore,
+    'bloom': BloomVisitedStore,
+}
+
+
+def make_visited_store(store='exact'):
+    """Returns a visited store for the given name, or the store itself if one is given.
+
+    Args:
+        store (str or object, optional): 'exact', 'fingerprint', 'bloom' or a store instance. Defaults to 'exact'.
+
+    Raises:
+        ValueError: If an unsupported store name is provided.
+    """
+    if not isinstance(store, str):
+        return store
+    if store not in VISITED_STORES:
+        raise ValueError(f"Unsupported visited store: {store}")
+    return VISITED_STORES[store]()
@@ -0,0 +1,208 @@
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header.
+
+    Args:
+        value (str): The header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        float or None: The number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_time.timestamp() - time.time())
+
+
+class TokenBucket:
+    """A thread-safe token bucket that allows rate requests per second with bursts of up to burst requests."""
+
+    def __init__(self, rate, burst=1):
+        """
+        Initializes the bucket, full.
+
+        Args:
+            rate (float): The number of tokens added per second.
+            burst (int, optional): The maximum number of tokens in the bucket. Defaults to 1.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Takes a token if there is one.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds until the next token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Takes a token, waiting for one if the bucket is empty."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class _HostState:
+    def __init__(self, limit, bucket):
+        self.limit = limit
+        self.in_flight = 0
+        self.bucket = bucket
+        self.blocked_until = 0.0
+        self.latency = None
+        self.best_latency = None
+
+
+class HostLimiter:
+    """Limits the request rate and adapts the number of concurrent requests for every host.
+
+    Each host gets a token bucket for its request rate and a concurrency limit that is adjusted with AIMD
+    (additive increase, multiplicative decrease). Every successful response raises the limit by 1 / limit,
+    about one more parallel request per round of responses, as long as the smoothed latency stays within
+    latency_tolerance times the best smoothed latency seen for the host. A 429 or 5xx response, a timeout
+    or a connection error multiplies the limit by backoff, and a Retry-After header pauses the host.
+
+    A limiter is thread-safe and can be shared by scrapers and crawlers.
+
+    Example:
+        limiter = HostLimiter(rate=5, max_concurrency=8)
+        crawler = WebCrawler(limiter=limiter)
+        crawler.crawl('https://example.com', num_threads=32)
+        print(limiter.limits())
+    """
+
+    def __init__(self, rate=None, burst=1, host_rates=None, initial_concurrency=2, min_concurrency=1,
+                 max_concurrency=16, backoff=0.5, latency_tolerance=2.0):
+        """
+        Initializes the limiter.
+
+        Args:
+            rate (float, optional): The maximum number of requests per second to each host. Defaults to no limit.
+            burst (int, optional): The number of requests that may be sent at once before rate applies.
+                Defaults to 1.
+            host_rates (dict, optional): Request rates for specific hosts (like 'example.com'), overriding rate.
+            initial_concurrency (int, optional): The concurrency limit of a new host. Defaults to 2.
+            min_concurrency (int, optional): The lowest concurrency limit. Defaults to 1.
+            max_concurrency (int, optional): The highest concurrency limit. Defaults to 16.
+            backoff (float, optional): The factor the limit is multiplied with on overload. Defaults to 0.5.
+            latency_tolerance (float, optional): How many times the best latency the latency may grow before
+                the limit stops growing. Defaults to 2.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = {host.lower(): host_rate for host, host_rate in (host_rates or {}).items()}
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            rate = self.host_rates.get(host, self.rate)
+            bucket = TokenBucket(rate, self.burst) if rate else None
+            state = self._hosts[host] = _HostState(float(self.initial_concurrency), bucket)
+        return state
+
+    def _try_acquire(self, host):
+        state = self._state(host)
+        now = time.monotonic()
+        if state.blocked_until > now:
+            return state.blocked_until - now
+        if state.in_flight >= int(state.limit):
+            return None
+        wait = state.bucket.try_acquire() if state.bucket is not None else 0.0
+        if not wait:
+            state.in_flight += 1
+        return wait
+
+    def try_acquire(self, url):
+        """Takes a request slot for the host of url if one is free, without waiting.
+
+        Returns:
+            float or None: 0 if a request may be sent now, which must be followed by a release. Otherwise the
+                number of seconds until the host may be tried again, or None if it waits for a request in flight.
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._condition:
+            return self._try_acquire(host)
+
+    def acquire(self, url):
+        """Waits until a request to the host of url may be sent. Every acquire must be followed by a release."""
+        host = urlsplit(url).netloc.lower()
+        with self._condition:
+            while True:
+                wait = self._try_acquire(host)
+                if wait == 0:
+                    return
+                self._condition.wait(wait)
+
+    def release(self, url, latency=None, status=None, retry_after=None, error=False):
+        """Reports the outcome of a request to the host of url and adjusts its concurrency limit.
+
+        Args:
+            url (str): The requested URL.
+            latency (float, optional): The number of seconds until the response arrived.
+            status (int, optional): The status code of the response.
+            retry_after (str, optional): The Retry-After header of the response.
+            error (bool, optional): The request timed out or the connection failed. Defaults to False.
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._condition:
+            state = self._state(host)
+            state.in_flight -= 1
+            delay = parse_retry_after(retry_after)
+            if delay:
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            if error or delay or (status is not None and (status == 429 or status >= 500)):
+                state.limit = max(self.min_concurrency, state.limit * self.backoff)
+            elif latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                if state.best_latency is None or state.latency < state.best_latency:
+                    state.best_latency = state.latency
+                if state.latency <= state.best_latency * self.latency_tolerance:
+                    state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+            self._condition.notify_all()
+
+    def limits(self):
+        """Returns the current state of every host.
+
+        Returns:
+            dict: Hosts mapped to dicts with their 'concurrency' limit, the requests 'in_flight', the 'rate'
+                limit (None if unlimited), the smoothed 'latency' in seconds and the seconds the host is
+                'paused' for after a Retry-After.
+        """
+        with self._condition:
+            now = time.monotonic()
+            return {host: {'concurrency': int(state.limit),
+                           'in_flight': state.in_flight,
+                           'rate': state.bucket.rate if state.bucket is not None else None,
+                           'latency': state.latency,
+                           'paused': max(0.0, state.blocked_until - now)}
+                    for host, state in self._hosts.items()}
@@ -0,0 +1,168 @@
+import fnmatch
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track where a visitor came from and never change the page
+TRACKING_PARAMS = ('utm_*', 'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_ga', '_gl',
+                   'igshid', 'twclid', 'wickedid', 'ttclid', 'srsltid')
+
+_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+_UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+# The characters that keep their meaning in a path, a query and a fragment, everything else is percent-encoded
+_PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+_QUERY_SAFE = "/?:@!$&'()*+,;=-._~%"
+_UNSAFE = re.compile(r"[^A-Za-z0-9/?:@!$&'()*+,;=\-._~%]")
+
+
+def _unescape(match):
+    character = chr(int(match.group(1), 16))
+    return character if character in _UNRESERVED else '%' + match.group(1).upper()
+
+
+def _normalize_escapes(text, safe):
+    """Percent-encodes the characters that need it, decodes escaped unreserved characters and upper cases the
+    hex digits of the other escapes, so equal strings are written one way."""
+    if _UNSAFE.search(text) is not None:
+        text = quote(text, safe=safe)
+    return _ESCAPE.sub(_unescape, text) if '%' in text else text
+
+
+def remove_dot_segments(path):
+    """Resolves the '.' and '..' segments of a path, like '/a/./b/../c' to '/a/c', see RFC 3986 5.2.4."""
+    if '.' not in path:
+        return path
+    segments = path.split('/')
+    if '.' not in segments and '..' not in segments:
+        return path
+    output = []
+    for segment in segments:
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    if len(output) == 1 and output[0] == '':
+        return '/'
+    return '/'.join(output)
+
+
+class UrlCanonicalizer:
+    """Rewrites URLs that name the same page to one canonical URL, so the page is fetched and stored once.
+
+    The scheme and host are lower cased, default ports, dot segments and the fragment are removed, percent
+    escapes are normalized, tracking parameters are removed and the query parameters are sorted. So '/a',
+    '/a#top', '/a?utm_source=x', 'HTTP://Host/a' and '/./a' all become 'http://host/a'.
+
+    Pages link to the same URLs over and over, so the canonical URLs are kept in an LRU cache. The canonicalizer
+    is thread-safe, and it counts the links that were only admitted once because of it, see stats.
+
+    Example:
+        canonicalizer = UrlCanonicalizer(strip_params=TRACKING_PARAMS + ('sessionid',))
+        canonicalizer('HTTP://Example.com:80/a/./b/../c?b=2&a=1&utm_source=mail#top')
+        # 'http://example.com/a/c?a=1&b=2'
+    """
+
+    def __init__(self, strip_params=TRACKING_PARAMS, sort_query=True, remove_fragment=True, cache_size=65536):
+        """
+        Initializes the canonicalizer.
+
+        Args:
+            strip_params (tuple, optional): Names or glob patterns of query parameters to remove. Defaults to
+                TRACKING_PARAMS.
+            sort_query (bool, optional): Sort the query parameters by name, keeping the order of repeated names.
+                Defaults to True.
+            remove_fragment (bool, optional): Remove the '#fragment', which is never sent to the server.
+                Defaults to True.
+            cache_size (int, optional): The number of URLs kept in the LRU cache, 0 disables it. Defaults to 65536.
+        """
+        self.sort_query = sort_query
+        self.remove_fragment = remove_fragment
+        self.cache_size = cache_size
+        self._strip_params = None
+        if strip_params:
+            self._strip_params = re.compile('|'.join(fnmatch.translate(name) for name in strip_params))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rewritten = 0
+        self.saved_fetches = 0
+
+    def canonicalize(self, url):
+        """Returns the canonical form of an absolute URL."""
+        return self.lookup(url)[0]
+
+    def __call__(self, url):
+        return self.lookup(url)[0]
+
+    def lookup(self, url):
+        """Returns the canonical form of a URL, and whether the URL was in the LRU cache."""
+        if self.cache_size:
+            with self._lock:
+                canonical = self._cache.get(url)
+                if canonical is not None:
+                    self._cache.move_to_end(url)
+                    self.hits += 1
+                    return canonical, True
+        canonical = self._canonicalize(url)
+        with self._lock:
+            self.misses += 1
+            if canonical != url:
+                self.rewritten += 1
+            if self.cache_size:
+                self._cache[url] = canonical
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return canonical, False
+
+    def duplicate(self):
+        """Records that a link was not admitted because its canonical URL was seen before, as a saved fetch."""
+        with self._lock:
+            self.saved_fetches += 1
+
+    def _canonicalize(self, url):
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc
+        if netloc:
+            host = parts.hostname or ''
+            if ':' in host:
+                host = f'[{host}]'
+            try:
+                port = parts.port
+            except ValueError:
+                port = None
+            if port is not None and port != DEFAULT_PORTS.get(scheme):
+                host += f':{port}'
+            userinfo, at, _ = netloc.rpartition('@')
+            netloc = userinfo + at + host
+
+        path = remove_dot_segments(_normalize_escapes(parts.path, _PATH_SAFE))
+        if not path and netloc:
+            path = '/'
+
+        query = parts.query
+        if query:
+            params = [param for param in _normalize_escapes(query, _QUERY_SAFE).split('&') if param]
+            if self._strip_params is not None:
+                params = [param for param in params if not self._strip_params.match(param.partition('=')[0])]
+            if self.sort_query:
+                params.sort(key=lambda param: param.partition('=')[0])
+            query = '&'.join(params)
+
+        fragment = '' if self.remove_fragment else _normalize_escapes(parts.fragment, _QUERY_SAFE)
+        return urlunsplit((scheme, netloc, path, query, fragment))
+
+    def stats(self):
+        """Returns the cache 'hits' and 'misses', the number of 'rewritten' URLs and of 'saved_fetches': links that
+        were not admitted because another spelling of their URL was, and would have been fetched again without
+        canonicalization. A link evicted from the cache and found again can be counted twice."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'rewritten': self.rewritten,
+                    'saved_fetches': self.saved_fetches, 'cached': len(self._cache)}
@@ -1,6 +1,11 @@
+import itertools
+import json
 import pytest
+import threading
+import time
 from unittest.mock import patch
 from scrape import *
+from scrape_parsers import BACKENDS
 
 # Mock for JSON responses
 mock_json = {
@@ -115,6 +120,30 @@ def test_extract_elements_by_xpath():
     assert elements == expected_elements
 
 
+# Test that backends without an XPath engine translate XPath predicates instead of matching the tag with a regex
+@pytest.mark.parametrize("backend", ["soup", "selectolax"])
+def test_extract_elements_by_xpath_without_lxml(backend, monkeypatch):
+    if backend not in BACKENDS:
+        pytest.skip(f"{backend} is not installed")
+    monkeypatch.setattr('scrape_parsers._default_backend', BACKENDS[backend])
+    html = '<div class="a"><p>1</p></div><div class="b"><p>2</p></div>'
+    assert ElementSelector.extract_elements_by_xpath(html, '//div[@class="b"]//p') == ['<p>2</p>']
+
+
+# Test that non-ASCII bytes are read as UTF-8 on every backend
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_extract_elements_from_bytes(backend, monkeypatch):
+    monkeypatch.setattr('scrape_parsers._default_backend', BACKENDS[backend])
+    assert ElementSelector.extract_elements('<p>café</p>'.encode('utf-8'), 'p') == ['<p>café</p>']
+
+
+# Test that pages with only a comment or a doctype have no elements instead of failing
+def test_extract_elements_from_pages_without_elements():
+    assert ElementSelector.extract_elements('<!-- only a comment -->', 'p') == []
+    assert ElementSelector.extract_elements('<!DOCTYPE html>', '//p') == []
+    assert extract_urls('<!-- only a comment -->', 'https://test.no') == []
+
+
 def test_extract_elements_by_tag():
     html = '<div class="container"><h1>Title</h1><p>Content</p></div>'
     selector = "<p>"
@@ -167,7 +196,369 @@ def test_extract_elements():
 
 
 
+# Test that a shared HttpTransport keeps connections alive between requests
+def test_transport_reuses_connections(local_server):
+    local_server.add('/', '<html><body>Hello</body></html>')
+    with HttpTransport(headers={'User-Agent': 'ScrapePy-test'}) as transport:
+        scraper = Scraper(transport)
+        for _ in range(5):
+            assert scraper.scrape(local_server.url + '/', 'html') == b'<html><body>Hello</body></html>'
+    assert len(local_server.connections) == 1, "All requests should go over one kept-alive connection"
+    assert all(headers['User-Agent'] == 'ScrapePy-test' for _, headers in local_server.requests)
+
+
+# Test that the crawler's worker threads share one transport
+def test_crawler_uses_shared_transport(local_server):
+    local_server.add('/', '<a href="/1">1</a><a href="/2">2</a>')
+    local_server.add('/1', '<a href="/">home</a>')
+    local_server.add('/2', '<a href="/1">1</a>')
+    with HttpTransport(pool_maxsize=2) as transport:
+        crawler = WebCrawler(transport=transport)
+        crawled_urls = crawler.crawl(local_server.url + '/', max_depth=2, num_threads=2)
+    assert sorted(crawled_urls) == [local_server.url + path for path in ('/', '/1', '/2')]
+    assert len(local_server.connections) <= 2, "Workers should reuse pooled connections"
+
+
+
+# Test that the frontier admits every URL only once, even from many threads
+def test_frontier_admits_urls_once():
+    frontier = CrawlFrontier()
+    admitted = []
+
+    def add_all():
+        admitted.extend(url for url in (f"https://test.no/{i}" for i in range(200)) if frontier.add(url, 1))
+
+    threads = [threading.Thread(target=add_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 200 and len(frontier) == 200
+
+
+# Test that the frontier alternates between hosts and holds back a host until its crawl delay has passed
+def test_frontier_schedules_hosts_politely():
+    frontier = CrawlFrontier(crawl_delay=0.0, host_delays={'slow.no': 0.2})
+    for i in range(3):
+        frontier.add(f"https://slow.no/{i}", 1)
+    frontier.add("https://fast.no/1", 1)
+    frontier.add("https://fast.no/2", 1)
+
+    order = []
+    start = time.monotonic()
+    while True:
+        item = frontier.get()
+        if item is None:
+            break
+        order.append((item[0], time.monotonic() - start))
+        frontier.task_done()
+
+    urls = [url for url, _ in order]
+    assert urls[:3] == ["https://fast.no/1", "https://slow.no/0", "https://fast.no/2"]
+    slow_times = [elapsed for url, elapsed in order if url.startswith("https://slow.no")]
+    assert slow_times[1] - slow_times[0] >= 0.19 and slow_times[2] - slow_times[1] >= 0.19
+
+
+# Test that get() returns None once the frontier has drained and nothing is in progress
+def test_frontier_completes_when_drained():
+    frontier = CrawlFrontier()
+    frontier.add("https://test.no", 0)
+    assert frontier.get() == ("https://test.no", 0)
+    frontier.task_done()
+    assert frontier.get() is None
+
+
+
+# Test that a Document answers several queries against one parsed tree and returns element handles
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_document_queries(backend):
+    html = """<html><head><base href="https://test.no/shop/"></head><body>
+        <div class="product" data-id="1"><h2>Book</h2><a href="book">Buy</a></div>
+        <div class="product" data-id="2"><h2>Pen</h2><a href="/pen">Buy</a></div>
+    </body></html>"""
+    with patch.object(BACKENDS[backend], 'parse', wraps=BACKENDS[backend].parse) as parse_mock:
+        document = Document(html, url="https://test.no", backend=backend)
+        products = document.select(".product")
+        names = [product.select_one("h2").text for product in products]
+        ids = [Scraper.extract_attribute(product, "data-id") for product in products]
+        links = document.links()
+    assert parse_mock.call_count == 1, "The page should only be parsed once"
+    assert names == ["Book", "Pen"] and ids == ["1", "2"]
+    assert links == ["https://test.no/shop/book", "https://test.no/pen"]
+    assert str(products[1].select("<h2>")[0]) == "<h2>Pen</h2>"
+
+
+# Test that ElementSelector returns handles when given a Document
+def test_extract_elements_from_document():
+    document = Document('<div class="container"><h1>Title</h1><p class="content">Content</p></div>')
+    elements = ElementSelector.extract_elements(document, ".container p")
+    assert elements == [document.select_one("p")]
+    assert ElementSelector.filter_elements_by_attribute(document.select("div"), "class", "content") == elements
+    assert Scraper.extract_text(elements[0]) == "Content"
+
+
+# Test that fragments are offsets into the page source, with copies only where the source position is unknown
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_fragments_of_page_source(backend):
+    html = ('<html><body>\n<DIV class="p"><a href="/x">A</a><div>in</div></DIV><div class="p"><img src=x></div>\n'
+            '<ul><li class="p">one<li class="p">two</ul>\n</body></html>')
+    document = Document(html, url="https://test.no/", backend=backend)
+    fragments = Fragment.from_elements(html, document, document.select(".p"))
+    assert [fragment.text for fragment in fragments] == ["Ain", "", "one", "two"]
+    assert fragments[0].select_one("a").text == "A" and fragments[0].links() == ["https://test.no/x"]
+    assert fragments[0].name == "div" and fragments[1].attr("class") == "p"
+    if backend != 'selectolax':
+        assert fragments[0].source is html
+        assert str(fragments[0]) == '<DIV class="p"><a href="/x">A</a><div>in</div></DIV>'
+        assert str(fragments[1]) == '<div class="p"><img src=x></div>'
+    # The first <li> has no end tag, so it is copied
+    assert fragments[2].source is not html
+
+    source = html.encode('utf-8')
+    assert str(Fragment.from_elements(source, document, document.select(".p"))[1]) == str(fragments[1])
+
+
+# Test that tags in scripts, styles and comments on the same line are not taken for the selected elements
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_fragments_skip_scripts_and_comments(backend):
+    html = ('<div><!-- <p class="x">comment</p> --><script>document.write("<p class=\'x\'>fake</p>")</script>'
+            '<p class="x">one<style>p {}</style></p><p class="x">two</p></div>')
+    document = Document(html, backend=backend)
+    fragments = Fragment.from_elements(html, document, document.select(".x"))
+    assert [fragment.text for fragment in fragments] == ["one", "two"]
+    if backend != 'selectolax':
+        assert [str(fragment) for fragment in fragments] == ['<p class="x">one<style>p {}</style></p>',
+                                                             '<p class="x">two</p>']
+
+
+# Test that elements after the last line libxml2 counts are found
+def test_fragments_of_long_pages():
+    html = '<html><body>\n' + ''.join(f'<p class="item">{number}</p><p>x</p>\n' for number in range(70000))
+    document = Document(html)
+    fragments = Fragment.from_elements(html, document, document.select(".item"))
+    assert all(fragment.source is html for fragment in fragments)
+    assert str(fragments[-1]) == '<p class="item">69999</p>'
+
+
+# Test that fragments are accepted wherever an element is, and are parsed once
+def test_fragments_stand_in_for_elements():
+    fragment = Fragment('<div class="p" data-id="7"><a href="/x" class="l">A</a></div>', url="https://test.no/")
+    assert fragment.element is fragment.element
+    assert Scraper.extract_text(fragment) == "A"
+    assert Scraper.extract_attribute(fragment, "data-id") == "7"
+    assert [element.text for element in ElementSelector.extract_elements(fragment, "a")] == ["A"]
+    assert [element.name for element in ElementSelector.filter_elements_by_attribute([fragment], "class", "l")] == ["a"]
+
+
+
+# Test that compiled selectors are cached and counted
+def test_compiled_selector_cache():
+    ElementSelector.clear_cache()
+    compiled = ElementSelector.compile(".container p")
+    assert ElementSelector.compile(".container p") is compiled
+    ElementSelector.extract_elements('<div class="container"><p>Content</p></div>', ".container p")
+    info = ElementSelector.cache_info()
+    assert info.hits == 2 and info.misses == 1
+    assert compiled.select('<div class="container"><p>Content</p></div>') == ['<p>Content</p>']
+
+
+# Test that the cache stays bounded
+def test_compiled_selector_cache_is_bounded():
+    ElementSelector.set_cache_size(4)
+    try:
+        for i in range(10):
+            ElementSelector.compile(f".item-{i}")
+        assert ElementSelector.cache_info().currsize == 4
+    finally:
+        ElementSelector.set_cache_size(256)
+
+
+# Test that one compiled selector can be shared by many threads
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_compiled_selector_is_thread_safe(backend):
+    compiled = ElementSelector.compile('//div[@class="item"]', backend)
+    html = "".join(f'<div class="item">{i}</div>' for i in range(50))
+    results = []
+
+    def select():
+        results.append([element.text for element in compiled.select(Document(html, backend=backend))])
+
+    threads = [threading.Thread(target=select) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[str(i) for i in range(50)]] * 8
+
+
+
+# Test that the link extractor gives the same URLs however the page is split into chunks
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_link_extractor_handles_chunks(chunk_size):
+    html = ("<html><head><base href='https://cdn.test.no/docs/'></head><body>"
+            "<a href=\"page?a=1&amp;b=2\">1</a><A class=x HREF='/root'>2</A>"
+            "<a name=anchor>no link</a><a href=unquoted>3</a><abbr href=\"/no\"></abbr>"
+            "<a data-href=\"/no\" href=\"https://test.no/ø\">4</a><a data-x=\"1<2\" href=\"/q\">5</a>"
+            "</body></html>").encode("utf-8")
+    extractor = LinkExtractor("https://test.no")
+    urls = []
+    for start in range(0, len(html), chunk_size):
+        urls.extend(extractor.feed(html[start:start + chunk_size]))
+    urls.extend(extractor.close())
+    assert urls == ["https://cdn.test.no/docs/page?a=1&b=2", "https://cdn.test.no/root",
+                    "https://cdn.test.no/docs/unquoted", "https://test.no/ø", "https://cdn.test.no/q"]
+
+
+# Test that a '<' in an attribute value is not taken for the start of the tag kept between chunks
+def test_link_extractor_keeps_tag_with_less_than_in_attribute():
+    extractor = LinkExtractor("https://test.no")
+    assert extractor.feed('<p>x</p><a data-x="1<2" hr') == []
+    assert extractor.feed('ef="/q">q</a>') + extractor.close() == ["https://test.no/q"]
+
+
+# Test that parse_html no longer loops forever on anchors without href
+def test_parse_html_skips_anchors_without_href():
+    html_content = '<a name="top">Top</a><a href="/1">1</a>'
+    assert parse_html("https://test.no", html_content) == ["https://test.no/1"]
+
+
+# Test that the crawler can extract links while pages are streamed
+def test_streaming_crawl(local_server):
+    local_server.add('/', '<a href="/1">1</a>' + 'x' * 200000 + '<a href="/2">2</a>')
+    local_server.add('/1', '<a href="/2">2</a>')
+    local_server.add('/2', 'leaf')
+    crawler = WebCrawler()
+    crawled_urls = crawler.crawl(local_server.url + '/', max_depth=1, num_threads=2, streaming=True)
+    assert sorted(crawled_urls) == [local_server.url + path for path in ('/', '/1', '/2')]
+
+
+# Test that the pipeline engine parses pages on a process pool and writes fields with every row
+def test_pipeline_crawl(local_server, tmp_path):
+    local_server.add('/', '<title>Home</title><a href="/1">1</a><a href="/2">2</a>')
+    local_server.add('/1', '<title>One</title><a href="/2">2</a><a href="/missing">x</a>')
+    local_server.add('/2', '<title>Two</title><a href="/">home</a>')
+    crawler = WebCrawler()
+    with ExportSink(str(tmp_path / "pages.jsonl")) as sink:
+        crawled_urls = crawler.crawl(local_server.url + '/', max_depth=2, num_threads=3, engine='pipeline',
+                                     parse_workers=2, queue_size=1, sink=sink, fields={'title': 'title'})
+    assert sorted(crawled_urls) == [local_server.url + path for path in ('/', '/1', '/2')]
+    rows = [json.loads(line) for line in (tmp_path / "pages.jsonl").read_text().splitlines()]
+    assert sorted((row['url'], row['title']) for row in rows) == [
+        (local_server.url + '/', 'Home'), (local_server.url + '/1', 'One'), (local_server.url + '/2', 'Two')]
+
+
+def test_pipeline_crawl_error_handling():
+    crawler = WebCrawler()
+    with patch.object(crawler, 'scrape', side_effect=Exception("Scrape error")):
+        assert crawler.crawl('https://test.no', max_depth=1, engine='pipeline', parse_workers=1) == []
+
+
 
 # Run the tests
 if __name__ == "__main__":
     pytest.main()
+
+
+# Test that scrape_many runs a bounded number of requests at a time and yields results as they complete
+def test_scrape_many(local_server):
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def route(delay):
+        def handle(handler):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(delay)
+            with lock:
+                in_flight.pop()
+            return 200, {}, f'<p>{delay}</p>'
+        return handle
+
+    local_server.routes['/slow'] = route(0.3)
+    for number in range(8):
+        local_server.routes[f'/{number}'] = route(0.01)
+    local_server.add('/api', '{"id": 1}', headers={'Content-Type': 'application/json'})
+    urls = [local_server.url + path for path in ['/slow'] + [f'/{number}' for number in range(8)] + ['/missing']]
+
+    results = list(WebScraper().scrape_many(iter(urls), 'html', concurrency=3))
+    assert [url for url, _ in results][-1] == local_server.url + '/slow'
+    assert dict(results)[local_server.url + '/0'] == '<p>0.01</p>'
+    assert dict(results)[local_server.url + '/missing'].status_code == 404
+    assert max(peak) <= 3
+
+    ordered = list(Scraper().scrape_many(urls, 'html', concurrency=4, ordered=True))
+    assert [url for url, _ in ordered] == urls and ordered[0][1] == b'<p>0.3</p>'
+    assert list(Scraper().scrape_many([local_server.url + '/api'], 'json')) == [(local_server.url + '/api', {'id': 1})]
+
+    # Only a bounded number of URLs is taken from an endless iterator
+    endless = (local_server.url + '/0' for _ in iter(int, 1))
+    scraped = Scraper().scrape_many(endless, 'html', concurrency=2)
+    assert [result for _, result in itertools.islice(scraped, 5)] == [b'<p>0.01</p>'] * 5
+    scraped.close()
+    with pytest.raises(ValueError):
+        Scraper().scrape_many(urls, 'xml')
+
+
+# Test that bodies are rejected by their size and content type before they are read
+# Test that scrape can still be called on the class, as when it was a static method
+def test_scrape_on_the_class(local_server):
+    local_server.add('/', '<p>home</p>')
+    local_server.add('/api', '{"id": 1}', headers={'Content-Type': 'application/json'})
+    assert Scraper.scrape(local_server.url + '/', 'html') == b'<p>home</p>'
+    assert Scraper.scrape(local_server.url + '/api', 'json') == {'id': 1}
+
+
+def test_max_body_size_and_content_types(local_server):
+    local_server.add('/small', '<p>small</p>')
+    local_server.add('/big', 'x' * 5000)
+    local_server.add('/api', '{"id": 1}', headers={'Content-Type': 'application/json'})
+    scraper = Scraper(max_body_size=1000, content_types=HTML_CONTENT_TYPES)
+    assert scraper.scrape(local_server.url + '/small', 'html') == b'<p>small</p>'
+    with pytest.raises(BodyTooLargeError) as error:
+        scraper.fetch(local_server.url + '/big')
+    assert error.value.size == 5000 and error.value.limit == 1000
+    with pytest.raises(UnsupportedContentTypeError) as error:
+        list(scraper.scrape_links(local_server.url + '/api'))
+    assert error.value.content_type == 'application/json'
+    assert Scraper().scrape(local_server.url + '/api', 'json') == {'id': 1}
+
+
+# Test that the crawler never requests binary links and skips pages that are not HTML or too large
+def test_crawl_skips_binary_and_non_html(local_server):
+    local_server.add('/', '<a href="/1">1</a><a href="/report.pdf">pdf</a><a href="/logo.PNG?v=2">logo</a>'
+                          '<a href="/api">api</a><a href="/big">big</a>')
+    local_server.add('/1', '<a href="/">home</a>')
+    local_server.add('/api', '{"id": 1}', headers={'Content-Type': 'application/json'})
+    local_server.add('/big', 'x' * 5000)
+    metrics = MetricsRegistry()
+    crawler = WebCrawler(metrics=metrics, max_body_size=1000)
+    for engine in ('threads', 'pipeline', 'asyncio'):
+        local_server.requests.clear()
+        crawled_urls = crawler.crawl(local_server.url + '/', max_depth=1, num_threads=2, engine=engine,
+                                     parse_workers=1)
+        assert sorted(crawled_urls) == [local_server.url + '/', local_server.url + '/1']
+        assert sorted(path for path, _ in local_server.requests) == ['/', '/1', '/api', '/big']
+    assert metrics.counter('skipped') == 6 and metrics.counter('errors') == 6
+
+
+@pytest.mark.parametrize("body, content_type, expected", [
+    ('<p>Blåbær</p>'.encode('latin-1'), 'text/html; charset=ISO-8859-1', 'iso8859-1'),
+    ('<meta charset="windows-1252"><p>Blåbær</p>'.encode('cp1252'), 'text/html', 'cp1252'),
+    ('<meta http-equiv="Content-Type" content="text/html; charset=latin-1">'.encode(), None, 'iso8859-1'),
+    (b'\xef\xbb\xbf<p>bom</p>', 'text/html; charset=latin-1', 'utf-8-sig'),
+    (b'<p>plain</p>', None, 'utf-8'),
+    (b'<p>unknown</p>', 'text/html; charset=x-unknown', 'utf-8'),
+])
+def test_sniff_charset(body, content_type, expected):
+    assert sniff_charset(body, content_type) == expected
+
+
+def test_web_scraper_decodes_declared_charset(local_server):
+    local_server.add('/latin', '<p>Blåbær</p>'.encode('latin-1'), headers={'Content-Type': 'text/html; charset=latin-1'})
+    local_server.add('/meta', '<meta charset="cp1252"><p>Blåbær</p>'.encode('cp1252'),
+                     headers={'Content-Type': 'text/html'})
+    web_scraper = WebScraper()
+    assert web_scraper.scrape(local_server.url + '/latin', 'html') == '<p>Blåbær</p>'
+    assert web_scraper.scrape(local_server.url + '/meta', 'html').endswith('<p>Blåbær</p>')
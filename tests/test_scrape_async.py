@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from scrape import HttpTransport, WebCrawler
+from scrape_async import *
+from scrape_throttle import HostLimiter
+
+
+# Test that the async crawler follows links up to max_depth and stops when the frontier drains
+def test_async_crawl_respects_max_depth():
+    pages = {
+        'https://test.no': '<a href="https://test.no/1">1</a>',
+        'https://test.no/1': '<a href="https://test.no/2">2</a>',
+        'https://test.no/2': '<a href="https://test.no/3">3</a>',
+    }
+    crawler = AsyncWebCrawler(concurrency=10)
+    with patch.object(crawler, 'scrape', AsyncMock(side_effect=lambda url: pages[url])):
+        crawled_urls = crawler.crawl('https://test.no', max_depth=1)
+    assert sorted(crawled_urls) == ['https://test.no', 'https://test.no/1']
+
+
+# Test that each URL is fetched only once even when many pages link to it
+def test_async_crawl_fetches_each_url_once():
+    crawler = AsyncWebCrawler(concurrency=50)
+    html = ''.join(f'<a href="https://test.no/{i}">{i}</a>' for i in range(20))
+    scrape_mock = AsyncMock(return_value=html)
+    with patch.object(crawler, 'scrape', scrape_mock):
+        crawled_urls = crawler.crawl('https://test.no', max_depth=3)
+    assert len(crawled_urls) == 21
+    assert scrape_mock.await_count == 21
+
+
+# Test that errors are reported and the crawl still finishes
+def test_async_crawl_error_handling():
+    crawler = AsyncWebCrawler()
+    with patch.object(crawler, 'scrape', AsyncMock(side_effect=Exception("Scrape error"))):
+        crawled_urls = crawler.crawl('https://test.no', max_depth=1)
+    assert crawled_urls == []
+
+
+# Test the asyncio engine of WebCrawler against a local server
+def test_web_crawler_asyncio_engine(local_server):
+    local_server.add('/', '<a href="/1">1</a><a href="/2">2</a>')
+    local_server.add('/1', '<a href="/2">2</a>')
+    local_server.add('/2', '<a href="/">home</a>')
+    crawled_urls = WebCrawler().crawl(local_server.url + '/', max_depth=2, num_threads=4, engine='asyncio')
+    assert sorted(crawled_urls) == [local_server.url + path for path in ('/', '/1', '/2')]
+
+
+# Test that the aiohttp session sends the headers and uses the timeouts of the transport
+def test_async_crawl_uses_transport_headers_and_timeout(local_server):
+    local_server.add('/', 'home')
+    transport = HttpTransport(headers={'User-Agent': 'ScrapePy/1.0', 'X-Token': 'a'}, timeout=(2, 5))
+    WebCrawler(transport=transport).crawl(local_server.url + '/', max_depth=0, engine='asyncio')
+    headers = local_server.requests[0][1]
+    assert headers['User-Agent'] == 'ScrapePy/1.0' and headers['X-Token'] == 'a'
+    timeout = AsyncWebCrawler(transport=transport, timeout=60)._client_timeout()
+    assert (timeout.total, timeout.connect, timeout.sock_read) == (60, 2, 5)
+    assert AsyncWebCrawler()._client_timeout().total == 30
+
+
+# Test that the asyncio engine waits for the limiter, so no more requests are in flight than it allows
+def test_async_crawl_honors_limiter(local_server):
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def page(handler):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return 200, {}, ''.join(f'<a href="/{number}">{number}</a>' for number in range(8))
+    local_server.routes.update({f'/{number}': page for number in range(8)})
+    local_server.routes['/'] = page
+    limiter = HostLimiter(initial_concurrency=1, max_concurrency=1)
+    crawled_urls = WebCrawler(limiter=limiter).crawl(local_server.url + '/', max_depth=1, num_threads=8,
+                                                     engine='asyncio')
+    assert len(crawled_urls) == 9 and in_flight[1] == 1
+    assert limiter.limits()[local_server.url.split('//')[1]]['in_flight'] == 0
+
+
+# Test that the asyncio engine keeps the crawl delay between two fetches from the same host
+def test_async_crawl_honors_crawl_delay(local_server):
+    times = []
+
+    def page(handler):
+        times.append(time.monotonic())
+        return 200, {}, '<a href="/1">1</a><a href="/2">2</a><a href="/3">3</a>'
+    local_server.routes.update({path: page for path in ('/', '/1', '/2', '/3')})
+    crawled_urls = WebCrawler(crawl_delay=0.05).crawl(local_server.url + '/', max_depth=1, num_threads=4,
+                                                      engine='asyncio')
+    assert len(crawled_urls) == 4
+    assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.04
+
+
+# Test that the crawler falls back to the shared transport when aiohttp is not installed
+def test_async_crawl_without_aiohttp(local_server, monkeypatch):
+    monkeypatch.setattr('scrape_async.aiohttp', None)
+    local_server.add('/', '<a href="/1">1</a>')
+    local_server.add('/1', 'leaf')
+    crawled_urls = AsyncWebCrawler(concurrency=2).crawl(local_server.url + '/', max_depth=1)
+    assert sorted(crawled_urls) == [local_server.url + '/', local_server.url + '/1']
+
+
+def test_web_crawler_rejects_unknown_engine():
+    with pytest.raises(ValueError):
+        WebCrawler().crawl('https://test.no', engine='gevent')
@@ -0,0 +1,110 @@
+import os
+import time
+import pytest
+from scrape import BodyTooLargeError, Scraper, UnsupportedContentTypeError, WebCrawler, WebScraper
+from scrape_cache import *
+from scrape_models import NewsSite
+
+
+def conditional(body, etag=None, last_modified=None, cache_control=None):
+    """Returns a route that answers 304 when the request has matching validators."""
+    def route(handler):
+        headers = {}
+        if etag:
+            headers['ETag'] = etag
+        if last_modified:
+            headers['Last-Modified'] = last_modified
+        if cache_control:
+            headers['Cache-Control'] = cache_control
+        if (etag and handler.headers.get('If-None-Match') == etag) or \
+                (last_modified and handler.headers.get('If-Modified-Since') == last_modified):
+            return 304, headers, b''
+        return 200, headers, body
+    return route
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Example.com:443?q=1#top') == 'https://example.com/?q=1'
+    assert normalize_url('http://example.com:8080/a') == 'http://example.com:8080/a'
+    assert parse_cache_control('public, max-age="60", no-cache') == {'public': None, 'max-age': '60', 'no-cache': None}
+
+
+def test_fresh_responses_are_served_from_cache(local_server, tmp_path):
+    local_server.add('/', '<a href="/1">1</a>', headers={'Cache-Control': 'max-age=60'})
+    local_server.add('/api', '{"id": 1}', headers={'Cache-Control': 'max-age=60', 'Content-Type': 'application/json'})
+    path = str(tmp_path / "cache.db")
+    with ResponseCache(path) as cache:
+        scraper = Scraper(cache=cache)
+        assert scraper.scrape(local_server.url + '/', 'html') == b'<a href="/1">1</a>'
+        assert scraper.scrape(local_server.url + '/', 'html') == b'<a href="/1">1</a>'
+        assert scraper.scrape(local_server.url + '/api', 'json') == {'id': 1}
+        assert list(scraper.scrape_links(local_server.url + '/')) == [local_server.url + '/1']
+        assert len(local_server.requests) == 2
+        assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+    # The cache is persistent
+    with ResponseCache(path) as cache:
+        assert WebScraper(cache=cache).scrape(local_server.url + '/', 'html') == '<a href="/1">1</a>'
+        assert len(local_server.requests) == 2 and len(cache) == 2
+
+
+@pytest.mark.parametrize("validators", [{'etag': '"v1"'}, {'last_modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}])
+def test_stale_responses_are_revalidated(local_server, validators):
+    local_server.routes['/'] = conditional(b'<p>page</p>', **validators)
+    with ResponseCache(':memory:') as cache:
+        scraper = Scraper(cache=cache)
+        assert scraper.scrape(local_server.url + '/', 'html') == b'<p>page</p>'
+        assert scraper.scrape(local_server.url + '/', 'html') == b'<p>page</p>'
+        assert len(local_server.requests) == 2
+        assert ('If-None-Match' if 'etag' in validators else 'If-Modified-Since') in local_server.requests[1][1]
+        assert cache.stats()['revalidated'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_no_store_and_errors_are_not_cached(local_server):
+    local_server.add('/private', 'secret', headers={'Cache-Control': 'no-store, max-age=60'})
+    local_server.add('/missing', 'gone', status=404)
+    with ResponseCache(':memory:') as cache:
+        scraper = Scraper(cache=cache)
+        scraper.scrape(local_server.url + '/private', 'html')
+        with pytest.raises(Exception):
+            scraper.scrape(local_server.url + '/missing', 'html')
+        assert len(cache) == 0
+
+
+# Test that a cache miss goes through the size limit and the content type check, and rejected bodies are not stored
+def test_rejected_responses_are_not_cached(local_server):
+    local_server.add('/report', b'%PDF' + b'x' * 100000,
+                     headers={'Content-Type': 'application/pdf', 'Cache-Control': 'max-age=60'})
+    with ResponseCache(':memory:') as cache:
+        with pytest.raises(BodyTooLargeError):
+            Scraper(cache=cache, max_body_size=1000).fetch(local_server.url + '/report')
+        with pytest.raises(UnsupportedContentTypeError):
+            list(Scraper(cache=cache, content_types=('text/html',)).scrape_links(local_server.url + '/report'))
+        assert cache.get(local_server.url + '/report') is None
+        assert Scraper(cache=cache).fetch(local_server.url + '/report').content.startswith(b'%PDF')
+        assert cache.get(local_server.url + '/report') is not None
+
+
+def test_lru_eviction():
+    with ResponseCache(':memory:', max_size=2500) as cache:
+        for i in range(3):
+            url = f'https://test.no/{i}'
+            cache.store(url, CachedResponse(url, {}, os.urandom(1000), time.time() + 60))
+            time.sleep(0.01)
+            # A fresh hit marks the first response as recently used
+            cache.fetch('https://test.no/0', send=None)
+        assert cache.get('https://test.no/1') is None, "The least recently used response is evicted"
+        assert cache.get('https://test.no/0') is not None and cache.get('https://test.no/2') is not None
+        assert cache.stats()['evictions'] == 1 and cache.size <= 2500
+
+
+# Test that models and crawlers use the cache through their scraper
+def test_cache_from_models_and_crawler(local_server):
+    local_server.add('/', '<article><a href="/1">One</a></article>', headers={'Cache-Control': 'max-age=60'})
+    local_server.add('/1', '<article>Two</article>', headers={'Cache-Control': 'max-age=60'})
+    with ResponseCache(':memory:') as cache:
+        WebCrawler(cache=cache).crawl(local_server.url + '/', max_depth=1, num_threads=1)
+        news_site = NewsSite(name='News', url=local_server.url + '/', scraper=WebScraper(cache=cache))
+        news_site.scrape_articles('article')
+        assert len(news_site.articles) == 1
+        assert len(local_server.requests) == 2 and cache.stats()['hits'] == 1
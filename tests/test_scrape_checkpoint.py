@@ -0,0 +1,81 @@
+import pytest
+from scrape import WebCrawler
+from scrape_checkpoint import *
+from scrape_scope import CrawlScope
+
+
+def test_checkpoint_records_and_torn_tail(tmp_path):
+    path = str(tmp_path / "crawl.ckpt")
+    checkpoint = CrawlCheckpoint(path, flush_interval=0.01)
+    checkpoint.open()
+    checkpoint.added('https://test.no', 0)
+    checkpoint.added('https://test.no/1', 1)
+    checkpoint.added('https://test.no/2', 1)
+    checkpoint.crawled('https://test.no')
+    checkpoint.failed('https://test.no/2')
+    checkpoint.close()
+
+    state, size = read_checkpoint(path)
+    assert state.pending == {'https://test.no/1': 1}
+    assert state.crawled == ['https://test.no'] and state.failed == ['https://test.no/2']
+
+    # A record cut off by a crash, and one with a wrong checksum, are ignored
+    with open(path, 'ab') as file:
+        file.write(b'A\x01\x00\x00\x00\xff')
+    assert read_checkpoint(path)[1] == size
+    with open(path, 'r+b') as file:
+        file.seek(size - 1)
+        file.write(b'\x00')
+    assert read_checkpoint(path)[0].failed == []
+
+
+# Test that a crawl cut off at any point is resumed without fetching crawled pages again
+@pytest.mark.parametrize("engine", ["threads", "pipeline"])
+def test_crawl_resume(local_server, tmp_path, engine):
+    for i in range(15):
+        local_server.add(f'/{i}', f'<a href="/{2 * i + 1}">a</a><a href="/{2 * i + 2}">b</a>')
+    path = str(tmp_path / "crawl.ckpt")
+    crawler = WebCrawler()
+    all_urls = crawler.crawl(local_server.url + '/0', max_depth=5, num_threads=1, checkpoint=path, engine=engine,
+                             parse_workers=1)
+    assert len(all_urls) == 15 and len(read_checkpoint(path)[0].pending) == 0
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:len(data) // 2 + 3])
+    state, _ = read_checkpoint(path)
+    assert 0 < len(state.crawled) < 15 and state.pending
+
+    local_server.requests.clear()
+    resumed_urls = crawler.crawl(local_server.url + '/0', max_depth=5, num_threads=2, checkpoint=path, resume=True,
+                                 engine=engine, parse_workers=1)
+    assert sorted(resumed_urls) == sorted(all_urls)
+    requested = {local_server.url + path for path, _ in local_server.requests}
+    assert requested and not requested & set(state.crawled + state.failed)
+    assert crawler.crawl(local_server.url + '/0', checkpoint=path, resume=True) == resumed_urls
+
+
+def test_asyncio_engine_rejects_checkpoint(tmp_path):
+    with pytest.raises(ValueError):
+        WebCrawler().crawl('https://test.no', engine='asyncio', checkpoint=str(tmp_path / "crawl.ckpt"))
+
+
+# Test that the page limit per host counts the pages admitted before a resume
+@pytest.mark.parametrize("engine", ["threads", "pipeline"])
+def test_resume_keeps_max_pages_per_host(local_server, tmp_path, engine):
+    for i in range(10):
+        local_server.add(f'/{i}', ''.join(f'<a href="/{j}">{j}</a>' for j in range(10)))
+    path = str(tmp_path / "crawl.ckpt")
+    checkpoint = CrawlCheckpoint(path)
+    checkpoint.open()
+    for i in range(3):
+        checkpoint.added(local_server.url + f'/{i}', 0)
+    checkpoint.crawled(local_server.url + '/0')
+    checkpoint.crawled(local_server.url + '/1')
+    checkpoint.close()
+
+    crawled_urls = WebCrawler().crawl(local_server.url + '/0', max_depth=1, num_threads=1, checkpoint=path,
+                                      resume=True, engine=engine, parse_workers=1,
+                                      scope=CrawlScope(max_pages_per_host=4))
+    assert len(crawled_urls) == 4
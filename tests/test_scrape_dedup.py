@@ -0,0 +1,69 @@
+import pytest
+from scrape import MetricsRegistry, WebCrawler
+from scrape_dedup import *
+from scrape_export import ExportSink
+
+ARTICLE = ' '.join(f'word{number}' for number in range(300))
+
+
+def test_content_fingerprint_ignores_formatting():
+    assert content_fingerprint('<p>Hello  world</p>\n') == content_fingerprint(b'<p>Hello world</p><!-- cached -->')
+    assert content_fingerprint('<p>Hello world</p>') != content_fingerprint('<p>Hello there</p>')
+
+
+def test_simhash_distance():
+    page = f'<html><body><nav>Menu</nav><p>{ARTICLE}</p></body></html>'
+    print_view = f'<html><body><script>print()</script><p>{ARTICLE}</p></body></html>'
+    other = '<p>' + ' '.join(f'other{number}' for number in range(60)) + '</p>'
+    assert (simhash(page) ^ simhash(print_view)).bit_count() <= 3
+    assert (simhash(page) ^ simhash(other)).bit_count() > 10
+    assert simhash('<p></p>') is None
+
+
+def test_duplicate_index():
+    index = DuplicateIndex()
+    assert index.check(f'<p>{ARTICLE}</p><a href="/next?sid=1">next</a>') is None
+    assert index.check(f'<p>{ARTICLE}</p><a href="/next?sid=1">next</a>') == 'exact'
+    assert index.check(f'<p>{ARTICLE}</p><a href="/next?sid=2">next</a>') == 'near'
+    assert index.check('<p>A short page</p>') is None
+    assert index.check('<p>A short  page</p>') == 'exact'
+    assert index.check('<p>A shorter page</p>') is None
+    stats = index.stats()
+    assert stats['pages'] == 6 and stats['exact_duplicates'] == 2 and stats['near_duplicates'] == 1
+    assert stats['duplicate_rate'] == 0.5 and stats['memory_bytes'] > 0
+
+    assert DuplicateIndex(find_near_duplicates=False).check(f'<p>{ARTICLE}</p>') is None
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 7])
+def test_duplicate_index_memory_per_page(max_distance):
+    index = DuplicateIndex(max_distance=max_distance)
+    empty = index.memory_bytes()
+    pages = 2000
+    assert index.check(f'<p>{ARTICLE}</p><a href="/next?sid=1">next</a>') is None
+    for page in range(1, pages):
+        assert index.check(' '.join(f'page{page}word{number}' for number in range(20))) is None
+    assert (index.memory_bytes() - empty) / pages < 100
+    assert index.check(f'<p>{ARTICLE}</p><a href="/next?sid=2">next</a>') == 'near'
+
+
+@pytest.mark.parametrize("engine", ['threads', 'pipeline', 'asyncio'])
+def test_crawl_skips_duplicate_pages(local_server, tmp_path, engine):
+    local_server.add('/', '<a href="/a?sid=1">a</a><a href="/a?sid=2">a</a><a href="/print/a">print</a>')
+    for sid in (1, 2):
+        local_server.add(f'/a?sid={sid}', f'<p>{ARTICLE}</p><a href="/next?sid={sid}">next</a>')
+        local_server.add(f'/next?sid={sid}', '<p>Next</p>')
+    local_server.add('/print/a', f'<html><body><p>{ARTICLE}</p></body></html>')
+    metrics = MetricsRegistry()
+    crawler = WebCrawler(metrics=metrics, dedup=True)
+    path = str(tmp_path / 'pages.csv')
+    with ExportSink(path) as sink:
+        crawled_urls = crawler.crawl(local_server.url + '/', max_depth=2, num_threads=1, engine=engine,
+                                     parse_workers=1, sink=sink)
+    assert len(crawled_urls) == 5
+    with open(path) as file:
+        assert len(file.read().splitlines()) == 1 + 3
+    requested = [path for path, _ in local_server.requests]
+    assert len([path for path in requested if path.startswith('/next')]) == 1
+    assert metrics.counter('duplicates') == 2
+    assert crawler.dedup.stats()['duplicate_rate'] == 2 / 5
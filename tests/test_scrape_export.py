@@ -0,0 +1,99 @@
+import csv
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from scrape import Scraper, WebCrawler
+from scrape_models import WebStore
+from scrape_export import *
+
+
+def read_csv(path, compression=None):
+    with open_export_file(str(path), 'r', compression) as file:
+        return list(csv.DictReader(file))
+
+
+# Test that rows are buffered until the batch is full
+def test_sink_writes_in_batches(tmp_path):
+    path = tmp_path / "rows.csv"
+    sink = ExportSink(str(path), batch_size=3)
+    sink.write({"name": "a"})
+    sink.write({"name": "b"})
+    assert path.read_text() == ""
+    sink.write({"name": "c"})
+    assert read_csv(path) == [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+    sink.write({"name": "d"})
+    sink.close()
+    assert sink.rows_written == 4 and len(read_csv(path)) == 4
+
+
+# Test that new fields are added as columns to rows that were already written
+def test_sink_schema_evolution(tmp_path):
+    path = tmp_path / "rows.csv"
+    with ExportSink(str(path), batch_size=1) as sink:
+        sink.write({"name": "a", "price": 1})
+        sink.write({"name": "b", "stock": 5})
+    assert read_csv(path) == [{"name": "a", "price": "1", "stock": ""}, {"name": "b", "price": "", "stock": "5"}]
+
+
+# Test that an export can be resumed by appending to the existing file
+@pytest.mark.parametrize("file_name", ["rows.csv", "rows.csv.gz"] + (["rows.csv.zst"] if zstandard else []))
+def test_sink_append_resume(tmp_path, file_name):
+    path = tmp_path / file_name
+    with ExportSink(str(path)) as sink:
+        sink.write_many({"name": name, "price": 1} for name in "ab")
+    with ExportSink(str(path)) as sink:
+        sink.write({"price": 2, "name": "c"})
+    compression = COMPRESSION_EXTENSIONS.get(path.suffix)
+    assert [row["name"] for row in read_csv(path, compression)] == ["a", "b", "c"]
+    assert read_csv(path, compression)[2] == {"name": "c", "price": "2"}
+
+
+def test_sink_json_lines(tmp_path):
+    path = tmp_path / "rows.jsonl.gz"
+    with ExportSink(str(path)) as sink:
+        sink.write({"name": "a"})
+        sink.write({"name": "b", "tags": ["x"]})
+    with open_export_file(str(path), 'r', 'gzip') as file:
+        assert [json.loads(line) for line in file] == [{"name": "a"}, {"name": "b", "tags": ["x"]}]
+
+
+def test_sink_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ExportSink(str(tmp_path / "rows.xml"), format='xml')
+
+
+# Test that the crawler and web store write rows as they go
+def test_crawler_and_web_store_write_to_sink(tmp_path):
+    crawler = WebCrawler()
+    with ExportSink(str(tmp_path / "pages.csv")) as sink, \
+            patch.object(crawler, 'scrape', return_value='<a href="https://test.no/1">1</a>'):
+        crawler.crawl('https://test.no', max_depth=1, num_threads=2, sink=sink)
+    assert sorted(row["url"] for row in read_csv(tmp_path / "pages.csv")) == ['https://test.no', 'https://test.no/1']
+
+    scraper = MagicMock()
+    scraper.scrape.return_value = "<div class='item'>1</div><div class='item'>2</div>"
+    web_store = WebStore(name="Store", url="https://test.no", scraper=scraper)
+    with ExportSink(str(tmp_path / "products.jsonl")) as sink:
+        web_store.scrape_products(".item", sink=sink)
+    rows = [json.loads(line) for line in (tmp_path / "products.jsonl").read_text().splitlines()]
+    assert [row["html_content"] for row in rows] == ["<div class='item'>1</div>", "<div class='item'>2</div>"]
+
+
+# Test that export_to_file streams rows from an iterator
+def test_export_to_file_streams_iterators(tmp_path):
+    path = tmp_path / "rows.csv"
+    Scraper.export_to_file(({"id": i} for i in range(250)), str(path))
+    assert [row["id"] for row in read_csv(path)] == [str(i) for i in range(250)]
+
+
+# Test that export_to_file writes iterators in the format of the file extension, with fields as the first columns
+@pytest.mark.parametrize("name", ["rows.jsonl", "rows.json", "rows.jsonl.gz"])
+def test_export_to_file_iterators_follow_the_extension(tmp_path, name):
+    path = tmp_path / name
+    Scraper.export_to_file(({"id": i, "name": f"Row {i}"} for i in range(3)), str(path))
+    with open_export_file(str(path), 'r', 'gzip' if name.endswith('.gz') else None) as file:
+        assert [json.loads(line) for line in file] == [{"id": i, "name": f"Row {i}"} for i in range(3)]
+
+    path = tmp_path / "rows.csv"
+    Scraper.export_to_file(iter([{"id": 1, "name": "Row", "price": "2.99"}]), str(path), fields=["name"])
+    assert path.read_text().splitlines()[0] == "name,id,price"
@@ -0,0 +1,51 @@
+import json
+from scrape import HttpTransport, WebCrawler
+from scrape_export import ExportSink
+from scrape_metrics import *
+
+
+def test_registry_counters_and_histograms():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    metrics.inc('pages', host='a.no')
+    metrics.inc('pages', 2, host='b.no')
+    metrics.observe('parse', 0.05, 'a.no')
+    metrics.observe('parse', 2.0, 'b.no')
+    assert metrics.counter('pages') == 3 and metrics.counter('pages', 'b.no') == 2
+    assert metrics.histogram('parse')['buckets'] == {'0.1': 1, '1.0': 1, '+Inf': 2}
+    assert metrics.histogram('parse', 'b.no')['max'] == 2.0
+    assert json.loads(metrics.to_json())['counters']['pages'] == {'total': 3, 'hosts': {'a.no': 1, 'b.no': 2}}
+
+    lines = metrics.to_prometheus().splitlines()
+    assert '# TYPE scrape_pages_total counter' in lines
+    assert 'scrape_pages_total{host="a.no"} 1' in lines
+    assert 'scrape_parse_seconds_bucket{le="0.1"} 1' in lines
+    assert 'scrape_parse_seconds_bucket{host="b.no",le="+Inf"} 1' in lines
+    assert 'scrape_parse_seconds_count 2' in lines and 'scrape_parse_seconds_sum{host="a.no"} 0.05' in lines
+
+
+# Test that a crawl records every stage per host and calls the hooks
+def test_crawl_metrics_and_hooks(local_server, tmp_path, capsys):
+    local_server.add('/', '<a href="/1">1</a><a href="/missing">2</a>')
+    local_server.add('/1', 'leaf')
+    metrics = MetricsRegistry()
+    events = []
+    metrics.add_hook(lambda event, fields: events.append((event, fields['url'])))
+    metrics.add_hook(print_hook)
+    with HttpTransport(metrics=metrics) as transport, ExportSink(str(tmp_path / "pages.csv")) as sink:
+        WebCrawler(transport, metrics=metrics).crawl(local_server.url + '/', max_depth=1, num_threads=2, sink=sink)
+
+    host = local_server.url.split('//')[1]
+    assert metrics.counter('pages', host) == 2 and metrics.counter('errors', host) == 1
+    assert metrics.counter('requests') == 3 and metrics.counter('links') == 2
+    for stage in STAGES:
+        if stage != 'parse':
+            assert metrics.histogram(stage, host)['count'] > 0, stage
+    assert ('error', local_server.url + '/missing') in events
+    assert sorted(url for event, url in events if event == 'page') == [local_server.url + '/', local_server.url + '/1']
+    assert f"Crawling {local_server.url}/ at depth 0" in capsys.readouterr().out
+
+
+def test_crawl_without_metrics_is_quiet(local_server, capsys):
+    local_server.add('/', 'leaf')
+    assert WebCrawler().crawl(local_server.url + '/', max_depth=1, num_threads=1) == [local_server.url + '/']
+    assert capsys.readouterr().out == ''
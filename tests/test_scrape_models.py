@@ -67,3 +67,63 @@ def test_web_store_product_scraping(scraper_mock):
     assert web_store.products[0].name == "Product"
     assert web_store.products[0].url == "https://test.no"
     assert web_store.products[0].scraper == scraper_mock
+
+
+def test_scraped_products_are_fragments_of_the_page(scraper_mock):
+    page = "<html><div class='product-item'><h2>Item 1</h2></div></html>"
+    scraper_mock.scrape.return_value = page
+    web_store = WebStore(name="Example Web Store", url="https://test.no", scraper=scraper_mock)
+    web_store.scrape_products(".product-item")
+    fragment = web_store.products[0].html_content
+    assert fragment.source is page
+    assert str(fragment) == "<div class='product-item'><h2>Item 1</h2></div>"
+    assert fragment.select_one("h2").text == "Item 1"
+    assert web_store.products[0].to_row()['html_content'] == str(fragment)
+
+
+def test_models_use_slots():
+    product = Product(name="Product", url="https://test.no", scraper=None, color="red")
+    assert vars(product) == {'color': 'red'}
+    assert product.to_row() == {'name': 'Product', 'url': 'https://test.no', 'html_content': '',
+                                'detail_url': None, 'detail_error': None, 'content': '', 'color': 'red'}
+
+
+def test_product_scrape_description(scraper_mock):
+    product = Product(name="Product 1", url="https://test.no/product1", scraper=scraper_mock)
+    product.scrape_description("<div class='product-description'> A fine product </div>", selector=".product-description")
+    assert product.description == "A fine product"
+
+
+def test_article_details_are_loaded_lazily(local_server):
+    local_server.add('/', '<div class="teaser"><a href="/a1">One</a></div><div class="teaser"><a href="/a2">Two</a></div>')
+    local_server.add('/a1', '<h1>First article</h1>')
+    news_site = NewsSite(name="News", url=local_server.url + '/')
+    news_site.scrape_articles('.teaser', detail_fields={'title': 'h1', 'author': '.author'})
+    assert news_site.articles[0].detail_url == local_server.url + '/a1'
+    assert news_site.articles[0].name == "Article" and len(local_server.requests) == 1
+    # Names that the detail page does not set never fetch it
+    assert not hasattr(news_site.articles[0], 'missing') and not hasattr(news_site.articles[0], '__html__')
+    assert not news_site.articles[0].details_loaded and len(local_server.requests) == 1
+
+    assert news_site.articles[0].title == 'First article'
+    assert news_site.articles[0].author is None
+    assert news_site.articles[0].details_loaded and len(local_server.requests) == 2
+    with pytest.raises(AttributeError):
+        news_site.articles[0].missing
+    assert len(local_server.requests) == 2
+
+
+def test_load_details_in_parallel(local_server):
+    listing = ''.join(f'<div class="product-item"><a href="/p{number}">{number}</a></div>' for number in range(20))
+    local_server.add('/', listing)
+    for number in range(19):
+        local_server.add(f'/p{number}', f'<h2>Product {number}</h2><div class="product-description">Nice</div>')
+    web_store = WebStore(name="Store", url=local_server.url + '/')
+    web_store.scrape_products('.product-item', detail_fields={'title': 'h2'})
+
+    loaded = list(web_store.load_details(concurrency=5))
+    assert len(loaded) == 20
+    assert web_store.products[3].title == 'Product 3' and web_store.products[3].description == 'Nice'
+    assert web_store.products[19].detail_error.status_code == 404
+    # Loaded products are not fetched again
+    assert list(web_store.load_details()) == [web_store.products[19]]
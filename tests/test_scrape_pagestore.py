@@ -0,0 +1,79 @@
+import pytest
+from scrape import ElementSelector, WebCrawler
+from scrape_pagestore import *
+
+
+def test_add_and_get_pages(tmp_path):
+    with PageStore(str(tmp_path / "pages.db"), batch_size=2) as store:
+        store.add('https://example.com/', '<h1>Home</h1>', headers={'Content-Type': 'text/html; charset=utf-8'})
+        assert 'https://example.com/' in store
+        page = store.get('https://example.com/')
+        assert page.body == b'<h1>Home</h1>' and page.text == '<h1>Home</h1>'
+        assert page.headers['content-type'] == 'text/html; charset=utf-8'
+        assert page.final_url == 'https://example.com/' and page.status == 200
+        assert page.content_hash == content_hash(b'<h1>Home</h1>')
+        assert store.get('https://example.com/missing') is None
+
+        store.add('https://example.com/1', b'<h1>One</h1>', depth=1, final_url='https://example.com/one')
+        assert store.get('https://example.com/1').final_url == 'https://example.com/one'
+        assert len(store) == 2
+
+
+def test_iter_pages_by_depth(tmp_path):
+    with PageStore(str(tmp_path / "pages.db")) as store:
+        for number in range(600):
+            store.add(f'https://example.com/{number}', f'<p>{number}</p>', depth=number % 3)
+        assert len(list(store.iter_pages())) == 600
+        assert [page.url for page in store.iter_pages(min_depth=1, max_depth=1)][:2] == \
+            ['https://example.com/1', 'https://example.com/4']
+        assert store.urls()[0] == 'https://example.com/0'
+
+
+@pytest.mark.parametrize("compression", ['gzip', 'zstd'])
+def test_pages_persist_compressed(tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    path = str(tmp_path / "pages.db")
+    body = b'<p>repeated</p>' * 1000
+    with PageStore(path, compression=compression) as store:
+        store.add('https://example.com/', body)
+
+    # Pages written with one compression can be read by a store that uses another
+    with PageStore(path, compression='gzip') as store:
+        page = store.get('https://example.com/')
+        assert page.compression == compression
+        assert len(page._data) < len(body) // 10
+        assert page.body == body
+
+
+def test_unsupported_compression():
+    with pytest.raises(ValueError):
+        PageStore(':memory:', compression='brotli')
+
+
+def test_crawl_into_page_store_and_extract_offline(local_server):
+    local_server.add('/', '<title>Home</title><a href="/1">1</a>')
+    local_server.add('/1', '<title>One</title><h1>First</h1>', headers={'Content-Type': 'text/html; charset=latin-1'})
+    with PageStore(':memory:') as store:
+        crawler = WebCrawler()
+        for engine in ('threads', 'pipeline'):
+            crawled_urls = crawler.crawl(local_server.url + '/', max_depth=1, num_threads=2, engine=engine,
+                                         parse_workers=1, page_store=store)
+            assert sorted(crawled_urls) == [local_server.url + '/', local_server.url + '/1']
+        assert len(store) == 2
+        requests = len(local_server.requests)
+
+        page = store.get(local_server.url + '/1')
+        assert page.depth == 1 and page.headers['Content-Type'] == 'text/html; charset=latin-1'
+        assert [element.text for element in ElementSelector.extract_elements(page.document(), 'h1')] == ['First']
+        assert len(local_server.requests) == requests
+
+        # The crawl works on the page decoded with its charset, while the store keeps the raw bytes
+        local_server.add('/2', '<h1>Caf\xe9</h1>'.encode('latin-1'), headers={'Content-Type': 'text/html; charset=latin-1'})
+        assert crawler._fetch_page(local_server.url + '/2', 0, store) == '<h1>Caf\xe9</h1>'
+        assert store.get(local_server.url + '/2').body == '<h1>Caf\xe9</h1>'.encode('latin-1')
+
+        with pytest.raises(ValueError):
+            crawler.crawl(local_server.url + '/', page_store=store, streaming=True)
+        with pytest.raises(ValueError):
+            crawler.crawl(local_server.url + '/', page_store=store, engine='asyncio')
@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import MagicMock
+from scrape import Document
+from scrape_models import Product
+from scrape_parsers import *
+
+HTML = """<html><body>
+    <div class="product"><h2>Book</h2><p>Paper</p><p>Blue</p><script>track()</script></div>
+    <div class="product-description">  A fine <b>book</b> </div>
+    <a href="/1">1</a><a href="https://test.no/2">2</a>
+</body></html>"""
+
+
+@pytest.mark.parametrize("selector, css", [
+    ('//div', 'div'),
+    ('//div[@class="product-description"]', 'div[class="product-description"]'),
+    ("//div[@id]//p", 'div[id] p'),
+    ('//ul/li[contains(@class, "item")]', 'ul > li[class*="item"]'),
+    ('.//h2', 'h2'),
+    ('./div/p[@class]', ':scope > div > p[class]'),
+])
+def test_simple_xpath_to_css(selector, css):
+    assert simple_xpath_to_css(selector) == css
+
+
+def test_simple_xpath_to_css_rejects_full_xpath():
+    with pytest.raises(ValueError):
+        simple_xpath_to_css('//div[count(p) > 1]')
+
+
+# Test that every installed backend gives the same answers
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backends_agree(backend):
+    document = Document(HTML, url="https://test.no", backend=backend)
+    product = document.select_one(".product")
+    assert product.select_one("h2").text == "Book"
+    assert [p.text for p in document.select("<p>")] == ["Paper", "Blue"]
+    assert product.text == "BookPaperBlue"
+    assert document.links() == ["https://test.no/1", "https://test.no/2"]
+    assert [e.text for e in document.select('//div[@class="product-description"]')] == ["A finebook"]
+    assert [e.text for e in product.select('.//p')] == ["Paper", "Blue"]
+    assert str(document.select_one("h2")) == "<h2>Book</h2>"
+
+
+# Test that the default XPath selector of Product.scrape_description matches now
+def test_product_description_default_selector():
+    product = Product(name="Book", url="https://test.no/book", scraper=MagicMock())
+    product.scrape_description(HTML)
+    assert product.description == "A finebook"
+
+
+@pytest.mark.skipif('lxml' not in BACKENDS, reason="lxml is not installed")
+def test_lxml_backend_runs_real_xpath():
+    document = Document(HTML, backend='lxml')
+    assert [e.text for e in document.select('//div[count(p) > 1]/h2')] == ["Book"]
+    assert document.select('//a/@href') == ["/1", "https://test.no/2"]
+
+
+def test_get_backend():
+    assert get_backend('soup').name == 'soup'
+    with pytest.raises(ValueError):
+        get_backend('html5lib')
+
+
+# Test that bytes without a declared charset are read as UTF-8, and a declared charset is honored
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backends_decode_bytes(backend):
+    assert Document('<p>café</p>'.encode('utf-8'), backend=backend).text == "café"
+    latin1 = '<html><head><meta charset="iso-8859-1"></head><body><p>café</p></body></html>'.encode('latin-1')
+    assert Document(latin1, backend=backend).select_one('p').text == "café"
+    if backend == 'lxml':
+        declared = '<?xml version="1.0" encoding="iso-8859-1"?><p>café</p>'
+        assert Document(declared, backend=backend).select_one('p').text == "café"
+
+
+# Test that pages without elements are empty documents
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("html", ['', '<!-- only a comment -->', '<!DOCTYPE html>', b'<!DOCTYPE html>'])
+def test_backends_parse_pages_without_elements(backend, html):
+    assert Document(html, backend=backend).select('p') == []
+    assert Document(html, backend=backend).links() == []
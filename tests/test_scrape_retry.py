@@ -0,0 +1,114 @@
+import time
+import pytest
+import requests
+from scrape import Scraper, WebCrawler
+from scrape_retry import *
+
+
+def flaky(failures, status=503, headers=None):
+    """Returns a route that fails the first failures requests."""
+    calls = []
+
+    def route(handler):
+        calls.append(handler.path)
+        if len(calls) <= failures:
+            return status, headers or {}, 'failed'
+        return 200, {}, 'ok'
+    route.calls = calls
+    return route
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(max_retries=2, backoff=1, jitter=False)
+    assert [policy.next_delay(attempt, status=503) for attempt in range(3)] == [1, 2, None]
+    assert policy.next_delay(0, status=404) is None
+    assert policy.next_delay(0, status=429, retry_after='5') == 5
+    assert policy.next_delay(0, error=requests.ConnectionError()) == 1
+    assert policy.next_delay(0, error=requests.TooManyRedirects()) is None
+    assert policy.stats() == {'retries': 4, 'exhausted': 1}
+
+    jittered = RetryPolicy(backoff=1, max_backoff=3)
+    assert all(0 <= jittered.next_delay(attempt, status=500) <= 3 for attempt in range(3))
+
+
+def test_scrape_retries_failures(local_server):
+    route = local_server.routes['/'] = flaky(2)
+    scraper = Scraper(retry=RetryPolicy(max_retries=2, backoff=0.01))
+    assert scraper.scrape(local_server.url + '/', 'html') == b'ok'
+    assert len(route.calls) == 3 and scraper.retry.stats() == {'retries': 2, 'exhausted': 0}
+
+    local_server.routes['/'] = flaky(5, status=500)
+    with pytest.raises(HTTPStatusError) as error:
+        scraper.scrape(local_server.url + '/', 'html')
+    assert error.value.status_code == 500 and scraper.retry.stats()['exhausted'] == 1
+
+    local_server.add('/missing', 'nothing here', status=404)
+    with pytest.raises(HTTPStatusError):
+        scraper.scrape(local_server.url + '/missing', 'html')
+    assert scraper.retry.stats()['retries'] == 4, "404 is not retried"
+
+
+def test_scrape_timeout(local_server):
+    local_server.routes['/slow'] = lambda handler: (time.sleep(0.5), (200, {}, 'late'))[1]
+    scraper = Scraper(timeout=(1, 0.1), retry=RetryPolicy(max_retries=1, backoff=0.01))
+    with pytest.raises(requests.Timeout):
+        scraper.scrape(local_server.url + '/slow', 'html')
+    assert scraper.retry.stats() == {'retries': 1, 'exhausted': 1}
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    url = 'https://test.no/'
+    breaker.allow(url)
+    breaker.record_failure(url)
+    breaker.record_failure(url)
+    assert breaker.state(url) == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.allow(url)
+    breaker.allow('https://other.no/')
+
+    time.sleep(0.06)
+    assert breaker.state(url) == 'half-open'
+    breaker.allow(url)
+    # Only one trial request is let through
+    with pytest.raises(CircuitOpenError):
+        breaker.allow(url)
+    breaker.record_failure(url)
+    assert breaker.state(url) == 'open'
+
+    time.sleep(0.06)
+    breaker.allow(url)
+    breaker.record_success(url)
+    assert breaker.state(url) == 'closed'
+    assert breaker.stats() == {'opened': 2, 'rejected': 2, 'hosts': {}}
+
+
+# Test that a crawl stops requesting a host once its circuit is open
+def test_crawler_with_circuit_breaker(local_server):
+    local_server.add('/', ''.join(f'<a href="/{i}">{i}</a>' for i in range(10)))
+    for i in range(10):
+        local_server.add(f'/{i}', 'down', status=503)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    crawler = WebCrawler(breaker=breaker)
+    assert crawler.crawl(local_server.url + '/', max_depth=1, num_threads=1) == [local_server.url + '/']
+    assert len(local_server.requests) == 4
+    assert breaker.stats()['rejected'] == 7
+
+
+# Test that the asyncio engine retries failures and makes requests to a failing host fail at once
+def test_async_crawl_retries_and_breaks(local_server):
+    route = local_server.routes['/'] = flaky(2)
+    retry = RetryPolicy(max_retries=2, backoff=0.01)
+    crawler = WebCrawler(retry=retry)
+    assert crawler.crawl(local_server.url + '/', max_depth=0, engine='asyncio') == [local_server.url + '/']
+    assert len(route.calls) == 3 and retry.stats() == {'retries': 2, 'exhausted': 0}
+
+    local_server.add('/', '<a href="/a">a</a><a href="/b">b</a><a href="/c">c</a>')
+    for path in ('/a', '/b', '/c'):
+        local_server.add(path, 'failed', status=500)
+    local_server.requests.clear()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    crawled_urls = WebCrawler(breaker=breaker).crawl(local_server.url + '/', max_depth=1, num_threads=1,
+                                                    engine='asyncio')
+    assert crawled_urls == [local_server.url + '/'] and len(local_server.requests) == 3
+    assert breaker.stats()['rejected'] == 1
@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import MagicMock
+from scrape import Document
+from scrape_export import ExportSink
+from scrape_models import NewsSite, WebStore
+from scrape_parsers import BACKENDS
+from scrape_schema import *
+
+LISTING = """<html><body>
+<div class="product-item" data-id="17"><a href="/p/17"><h2> Chair </h2></a><span class="price">1 299,50 kr</span>
+  <ul class="tags"><li>wood</li><li>oak</li></ul><span class="stock">yes</span></div>
+<div class="product-item" data-id="unknown"><a href="/p/18"><h2>Table</h2></a><span class="price">n/a</span></div>
+</body></html>"""
+
+SCHEMA = {
+    'id': Field(attr='data-id', type=int, default=-1),
+    'title': 'h2',
+    'link': Field('a', attr='href', type='url'),
+    'price': Field('.price', type=float),
+    'tags': Field('.tags li', many=True),
+    'in_stock': Field('.stock', type=bool, default=False),
+    'image': 'img@src',
+}
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_schema_extracts_typed_rows(backend):
+    schema = Schema('.product-item', SCHEMA, backend=backend)
+    rows = schema.extract(LISTING, url='https://shop.no/chairs/')
+    assert rows == [
+        {'id': 17, 'title': 'Chair', 'link': 'https://shop.no/p/17', 'price': 1299.5, 'tags': ['wood', 'oak'],
+         'in_stock': True, 'image': None},
+        {'id': -1, 'title': 'Table', 'link': 'https://shop.no/p/18', 'price': None, 'tags': [],
+         'in_stock': False, 'image': None},
+    ]
+    # An already parsed document is not parsed again
+    assert schema.extract(Document(LISTING, url='https://shop.no/', backend=backend))[1]['link'] == 'https://shop.no/p/18'
+
+
+def test_field_specs_and_numbers():
+    assert Field.parse('a@href').selector == 'a' and Field.parse('a@href').attr == 'href'
+    assert Field.parse('@data-id').selector is None
+    assert Field.parse('//a[@class="x"]').attr is None
+    assert [Field('.n', type=int).value(Document(f'<p class="n">{text}</p>'))
+            for text in ('1,299', '1.299,00', '$4.99', 'none')] == [1299, 1299, 4, None]
+
+
+def test_web_store_and_news_site_accept_schemas(tmp_path):
+    scraper = MagicMock()
+    scraper.scrape.return_value = LISTING
+    web_store = WebStore(name="Store", url="https://shop.no/", scraper=scraper)
+    with ExportSink(str(tmp_path / "products.jsonl")) as sink:
+        web_store.scrape_products(Schema('.product-item', SCHEMA), sink=sink)
+    assert web_store.products[0].price == 1299.5 and web_store.products[0].title == 'Chair'
+    assert web_store.products[0].detail_url == 'https://shop.no/p/17'
+    assert (tmp_path / "products.jsonl").read_text().splitlines()[0].startswith('{"id": 17, "title": "Chair"')
+
+    news_site = NewsSite(name="News", url="https://shop.no/", scraper=scraper)
+    news_site.scrape_articles(Schema('.product-item', {'headline': 'h2'}))
+    assert [article.headline for article in news_site.articles] == ['Chair', 'Table']
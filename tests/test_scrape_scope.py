@@ -0,0 +1,81 @@
+import pytest
+from scrape import MetricsRegistry, WebCrawler
+from scrape_scope import *
+
+
+def test_domain_rules():
+    scope = CrawlScope(allow_domains=['example.com', '*.example.org'], deny_domains=['ads.example.com'])
+    assert scope('https://example.com/') == 'https://example.com/'
+    assert scope('https://www.Example.com:8080/a')
+    assert scope('https://example.org/') and scope('https://blog.example.org/')
+    assert scope('https://ads.example.com/banner') is None
+    assert scope('https://x.ads.example.com/') is None
+    assert scope('https://notexample.com/') is None
+    assert scope('https://example.net/') is None
+
+    # A more specific domain overrides its parent
+    scope = CrawlScope(deny_domains=['example.com'], allow_domains=['shop.example.com'])
+    assert scope('https://shop.example.com/') and scope('https://example.com/') is None
+
+
+def test_schemes_and_extensions():
+    scope = CrawlScope()
+    assert scope('mailto:someone@example.com') is None and scope('javascript:void(0)') is None
+    assert scope('https://example.com/report.PDF') is None
+    assert scope('https://example.com/logo.png?v=2#top') is None
+    assert scope('https://example.zip/') and scope('https://example.com/v1.2/docs')
+    assert CrawlScope(skip_extensions=None)('https://example.com/report.pdf')
+
+
+def test_path_regex_and_glob_rules():
+    scope = CrawlScope(allow_paths=['/blog/', '/news'], deny_paths=['/blog/drafts'],
+                       deny_patterns=[r'[?&]page=\d{3,}'], deny_globs=['*/print/*'])
+    assert scope('https://example.com/blog/post')
+    assert scope('https://example.com/news?page=12')
+    assert scope('https://example.com/news?page=120') is None
+    assert scope('https://example.com/blog/drafts/1') is None
+    assert scope('https://example.com/blog/print/1') is None
+    assert scope('https://example.com/shop') is None
+    assert scope('https://example.com/?next=/blog/') is None
+
+    scope = CrawlScope(allow_patterns=[r'/\d{4}/'], allow_globs=['*.html'])
+    assert scope('https://example.com/2024/post') and scope('https://example.com/post.html')
+    assert scope('https://example.com/post') is None
+
+
+def test_patterns_with_backreferences():
+    scope = CrawlScope(allow_patterns=[r'/(\d+)/\1', r'/blog/'], deny_patterns=[r'/(?P<id>\d+)/(?P=id)/edit'])
+    assert scope('https://a/1/1') == 'https://a/1/1' and scope('https://a/blog/')
+    assert scope('https://a/1/2') is None
+    assert scope('https://a/7/7/edit') is None
+
+    scope = CrawlScope(deny_patterns=[r'/(\w+)/\1\b', r'(?P<x>\.tmp)$'], allow_patterns=[r'(?P<x>/a)'])
+    assert scope('https://example.com/ab/b') and scope('https://example.com/a/b/b/') is None
+    assert scope('https://example.com/a.tmp') is None and scope('https://example.com/b') is None
+
+
+@pytest.mark.parametrize("strip_params, expected", [
+    (['utm_*', 'sessionid'], 'https://example.com/a?id=1&sort=name#top'),
+    (True, 'https://example.com/a#top'),
+    (None, 'https://example.com/a?utm_source=x&id=1&sessionid=abc&sort=name#top'),
+])
+def test_strip_params(strip_params, expected):
+    scope = CrawlScope(strip_params=strip_params)
+    assert scope('https://example.com/a?utm_source=x&id=1&sessionid=abc&sort=name#top') == expected
+    assert CrawlScope(strip_params=['utm_*'])('https://example.com/a?utm_source=x') == 'https://example.com/a'
+
+
+@pytest.mark.parametrize("engine", ['threads', 'pipeline', 'asyncio'])
+def test_crawl_within_scope(local_server, engine):
+    links = ''.join(f'<a href="/page/{number}?utm_source=home">{number}</a>' for number in range(5))
+    local_server.add('/', links + '<a href="/private/1">private</a><a href="https://other.example/">other</a>')
+    for number in range(5):
+        local_server.add(f'/page/{number}', '<a href="/">home</a>')
+    scope = CrawlScope(allow_domains=['127.0.0.1'], deny_paths=['/private'], strip_params=['utm_*'],
+                       max_pages_per_host=4)
+    metrics = MetricsRegistry()
+    crawled_urls = WebCrawler(metrics=metrics).crawl(local_server.url + '/', max_depth=2, num_threads=2,
+                                                     engine=engine, parse_workers=1, scope=scope)
+    assert sorted(crawled_urls) == [local_server.url + path for path in ('/', '/page/0', '/page/1', '/page/2')]
+    assert sorted(path for path, _ in local_server.requests) == ['/', '/page/0', '/page/1', '/page/2']
+    assert metrics.counter('skipped') == 4
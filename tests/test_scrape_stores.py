@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch
+from scrape import WebCrawler
+from scrape_stores import *
+
+
+@pytest.mark.parametrize("store", [ExactVisitedStore(), FingerprintVisitedStore(capacity=4), BloomVisitedStore(capacity=100)])
+def test_visited_store_admits_urls_once(store):
+    urls = [f"https://test.no/{i}" for i in range(1000)]
+    assert all(store.add(url) for url in urls)
+    assert not any(store.add(url) for url in urls)
+    assert all(url in store for url in urls)
+    assert len(store) == 1000
+
+
+# Test that the Bloom filter keeps its false positive rate below the configured rate as it grows
+def test_bloom_store_false_positive_rate():
+    store = BloomVisitedStore(capacity=1000, error_rate=0.01)
+    for i in range(5000):
+        store.add(f"https://test.no/{i}")
+    false_positives = sum(f"https://other.no/{i}" in store for i in range(20000))
+    assert false_positives / 20000 < 0.01
+
+
+def test_compact_stores_use_less_memory_per_entry():
+    stores = [ExactVisitedStore(), FingerprintVisitedStore(), BloomVisitedStore(capacity=10000)]
+    for store in stores:
+        for i in range(10000):
+            store.add(f"https://test.no/some/long/path/to/a/page/{i}")
+    exact, fingerprint, bloom = (store.bytes_per_entry() for store in stores)
+    assert exact > fingerprint > bloom
+
+
+def test_make_visited_store():
+    assert isinstance(make_visited_store('bloom'), BloomVisitedStore)
+    store = FingerprintVisitedStore()
+    assert make_visited_store(store) is store
+    with pytest.raises(ValueError):
+        make_visited_store('btree')
+
+
+# Test that the crawler records visited URLs in the configured store
+def test_crawler_uses_visited_store():
+    crawler = WebCrawler(visited_store='fingerprint')
+    with patch.object(crawler, 'scrape', return_value='<a href="https://test.no/1">1</a>'):
+        crawled_urls = crawler.crawl('https://test.no', max_depth=2, num_threads=2)
+    assert sorted(crawled_urls) == ['https://test.no', 'https://test.no/1']
+    assert isinstance(crawler.visited_urls, FingerprintVisitedStore)
+    assert 'https://test.no/1' in crawler.visited_urls
+
+
+# Test that the asyncio engine records visited URLs in the configured store too
+def test_async_crawler_uses_visited_store(local_server):
+    local_server.add('/', '<a href="/1">1</a>')
+    local_server.add('/1', '<a href="/">home</a>')
+    crawler = WebCrawler(visited_store='fingerprint')
+    crawled_urls = crawler.crawl(local_server.url + '/', max_depth=2, engine='asyncio')
+    assert sorted(crawled_urls) == [local_server.url + '/', local_server.url + '/1']
+    assert isinstance(crawler.visited_urls, FingerprintVisitedStore)
+    assert local_server.url + '/1' in crawler.visited_urls
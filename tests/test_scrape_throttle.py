@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+from scrape import Scraper, WebCrawler
+from scrape_throttle import *
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after(None) is None and parse_retry_after('soon') is None
+    assert 50 < parse_retry_after(time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))) <= 60
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09, "Two tokens are free, the other five take 1/50 second each"
+
+
+# Test that the limit grows while latency is flat and is cut on overload
+def test_limiter_aimd():
+    limiter = HostLimiter(initial_concurrency=2, max_concurrency=4)
+    url = 'https://test.no/page'
+    for _ in range(20):
+        limiter.acquire(url)
+        limiter.release(url, latency=0.01, status=200)
+    assert limiter.limits()['test.no']['concurrency'] == 4
+    limiter.acquire(url)
+    limiter.release(url, latency=0.01, status=429)
+    assert limiter.limits()['test.no']['concurrency'] == 2
+    limiter.acquire(url)
+    limiter.release(url, error=True)
+    assert limiter.limits()['test.no']['concurrency'] == 1
+
+    # Latency far above the best latency stops the growth
+    for _ in range(20):
+        limiter.acquire(url)
+        limiter.release(url, latency=1.0, status=200)
+    assert limiter.limits()['test.no']['concurrency'] == 1
+
+
+def test_limiter_retry_after_pauses_host():
+    limiter = HostLimiter()
+    limiter.acquire('https://test.no/')
+    limiter.release('https://test.no/', status=503, retry_after='1')
+    assert limiter.limits()['test.no']['paused'] > 0.5
+    start = time.monotonic()
+    limiter.acquire('https://other.no/')
+    assert time.monotonic() - start < 0.5, "Other hosts are not paused"
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = HostLimiter(initial_concurrency=2, max_concurrency=2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        limiter.acquire('https://test.no/')
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.pop()
+        limiter.release('https://test.no/', latency=0.02, status=200)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+
+# Test that the scraper and crawler report responses to the limiter
+def test_scraper_and_crawler_feed_limiter(local_server):
+    local_server.add('/', '<a href="/1">1</a><a href="/busy">busy</a>')
+    local_server.add('/1', 'leaf')
+    local_server.add('/busy', 'slow down', status=429)
+    limiter = HostLimiter(initial_concurrency=4)
+    crawler = WebCrawler(limiter=limiter)
+    crawled_urls = crawler.crawl(local_server.url + '/', max_depth=1, num_threads=4)
+    assert sorted(crawled_urls) == [local_server.url + '/', local_server.url + '/1']
+    host = local_server.url.split('//')[1]
+    assert limiter.limits()[host]['concurrency'] < 4 and limiter.limits()[host]['in_flight'] == 0
+
+    with pytest.raises(Exception):
+        Scraper(limiter=limiter).scrape(local_server.url + '/busy', 'html')
+    assert limiter.limits()[host]['concurrency'] == 1
@@ -0,0 +1,62 @@
+import pytest
+from scrape import MetricsRegistry, WebCrawler
+from scrape_urls import *
+
+
+@pytest.mark.parametrize("url, expected", [
+    ('HTTP://Example.COM/a', 'http://example.com/a'),
+    ('https://example.com:443/a', 'https://example.com/a'),
+    ('https://example.com:8443/a', 'https://example.com:8443/a'),
+    ('https://example.com', 'https://example.com/'),
+    ('https://example.com/a#top', 'https://example.com/a'),
+    ('https://example.com/./a/b/../c/.', 'https://example.com/a/c/'),
+    ('https://example.com/../../a', 'https://example.com/a'),
+    ('https://example.com/%7euser/a%2fb', 'https://example.com/~user/a%2Fb'),
+    ('https://example.com/a b/blåbær', 'https://example.com/a%20b/bl%C3%A5b%C3%A6r'),
+    ('https://example.com/a?b=2&a=1&b=1', 'https://example.com/a?a=1&b=2&b=1'),
+    ('https://example.com/a?utm_source=x&id=1&fbclid=y&', 'https://example.com/a?id=1'),
+    ('https://example.com/a?utm_medium=x', 'https://example.com/a'),
+    ('https://user@Example.com:80/a', 'https://user@example.com:80/a'),
+    ('http://[::1]:80/a', 'http://[::1]/a'),
+])
+def test_canonicalize(url, expected):
+    assert UrlCanonicalizer().canonicalize(url) == expected
+
+
+def test_remove_dot_segments():
+    assert remove_dot_segments('/a/./b/../c') == '/a/c'
+    assert remove_dot_segments('/a/..') == '/'
+    assert remove_dot_segments('/v1.2/docs') == '/v1.2/docs'
+
+
+def test_configurable_rules():
+    canonicalizer = UrlCanonicalizer(strip_params=['session*'], sort_query=False, remove_fragment=False)
+    assert canonicalizer('https://example.com/a?b=1&sessionid=x&utm_source=y#Top') == \
+        'https://example.com/a?b=1&utm_source=y#Top'
+
+
+def test_lru_cache():
+    canonicalizer = UrlCanonicalizer(cache_size=2)
+    for url in ('https://example.com/a#1', 'https://example.com/a#1', 'https://example.com/b', 'https://example.com/c',
+                'https://example.com/a#1'):
+        canonicalizer(url)
+    assert canonicalizer.stats() == {'hits': 1, 'misses': 4, 'rewritten': 2, 'saved_fetches': 0, 'cached': 2}
+
+
+@pytest.mark.parametrize("engine", ['threads', 'asyncio'])
+def test_crawl_fetches_each_page_once(local_server, engine):
+    local_server.add('/', '<a href="/a">a</a><a href="/a#top">a</a><a href="/./a?utm_source=home">a</a>'
+                          '<a href="/b?y=2&x=1">b</a>')
+    local_server.add('/a', '<a href="/b?x=1&y=2">b</a><a href="/">home</a><a href="/#top">home</a>')
+    local_server.add('/b?x=1&y=2', '<a href="/a">a</a>')
+    metrics = MetricsRegistry()
+    crawler = WebCrawler(metrics=metrics)
+    crawled_urls = crawler.crawl(local_server.url, max_depth=3, num_threads=2, engine=engine)
+    assert sorted(crawled_urls) == [local_server.url, local_server.url + '/a', local_server.url + '/b?x=1&y=2']
+    assert sorted(path for path, _ in local_server.requests) == ['/', '/a', '/b?x=1&y=2']
+    assert crawler.canonicalizer.stats()['saved_fetches'] == metrics.counter('saved_fetches') == 3
+
+    # Without canonicalization every spelling is fetched
+    local_server.requests.clear()
+    WebCrawler(canonicalizer=False).crawl(local_server.url, max_depth=1, num_threads=2, engine=engine)
+    assert len(local_server.requests) == 5